@@ -1,5 +1,6 @@
 import os
 import sys
+import multiprocessing
 
 # 获取应用程序路径
 base_path = os.path.dirname(os.path.abspath(__file__))
@@ -9,32 +10,48 @@ if hasattr(sys, '_MEIPASS'):
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QFileDialog,
-    QMessageBox, QGroupBox, QFrame
+    QMessageBox, QGroupBox, QFrame, QCheckBox, QDoubleSpinBox
 )
 from PyQt5.QtGui import QFont, QIcon
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from src import draw_image, window_detection
+from src.checkpoint import has_checkpoint
 
 
 class DrawingThread(QThread):
     """绘制任务线程，用于在后台执行绘制操作"""
     finished_signal = pyqtSignal(bool, str)  # 完成信号
 
-    def __init__(self, image_path):
+    def __init__(self, image_path=None, resume=False, verify=False, budget=None):
+        """
+        Args:
+            image_path: 要绘制的图像路径（继续绘制时不需要）
+            resume: 从上次中断的位置继续绘制
+            verify: 继续前截图检查已画出的部分
+            budget: 绘制时间限制（秒），None 表示不限
+        """
         super().__init__()
         self.image_path = image_path
+        self.resume = resume
+        self.verify = verify
+        self.budget = budget
 
     def run(self):
         """线程运行函数"""
         try:
-            draw_image.main(self.image_path)
+            if self.resume:
+                draw_image.resume_drawing(self.verify)
+            else:
+                draw_image.main(self.image_path, budget=self.budget)
             self.finished_signal.emit(True, "绘制完成！")
         except Exception as e:
             self.finished_signal.emit(False, f"绘制过程中发生错误: {str(e)}")
 
     def stop(self):
-        """停止线程"""
-        self.terminate()
+        """停止线程：先像 ESC 一样通知绘制停止（保存进度检查点），超时仍未结束再强制终止"""
+        draw_image.should_exit = True
+        if not self.wait(5000):
+            self.terminate()
 
 
 class DrawingApp(QMainWindow):
@@ -87,6 +104,17 @@ class DrawingApp(QMainWindow):
         image_layout.addWidget(self.select_image_btn, 1)
         settings_layout.addLayout(image_layout)
 
+        # 时间限制：预计超时时只画较重要的笔画
+        budget_layout = QHBoxLayout()
+        budget_layout.addWidget(QLabel("时间限制"))
+        self.budget_spin = QDoubleSpinBox()
+        self.budget_spin.setRange(0, 3600)
+        self.budget_spin.setDecimals(0)
+        self.budget_spin.setSuffix(" 秒")
+        self.budget_spin.setSpecialValueText("不限")
+        budget_layout.addWidget(self.budget_spin, 1)
+        settings_layout.addLayout(budget_layout)
+
         main_layout.addWidget(settings_group)
 
         # 开始按钮
@@ -96,6 +124,17 @@ class DrawingApp(QMainWindow):
         self.start_btn.clicked.connect(self.start_drawing)
         main_layout.addWidget(self.start_btn)
 
+        # 继续上次中断的绘制
+        resume_layout = QHBoxLayout()
+        self.resume_btn = QPushButton("继续上次绘制")
+        self.resume_btn.setFont(QFont("Arial", 12))
+        self.resume_btn.clicked.connect(self.resume_drawing)
+        resume_layout.addWidget(self.resume_btn, 2)
+        self.verify_check = QCheckBox("先检查已绘制部分")
+        resume_layout.addWidget(self.verify_check, 1)
+        main_layout.addLayout(resume_layout)
+        self.resume_btn.setEnabled(has_checkpoint())
+
         # 移除了进度条
 
         # 初始状态
@@ -118,20 +157,36 @@ class DrawingApp(QMainWindow):
             return
 
         # 开始绘制（无确认弹窗）
-        self.start_btn.setEnabled(False)
-        self.select_image_btn.setEnabled(False)
+        budget = self.budget_spin.value() or None
+        self.launch_drawing(DrawingThread(self.selected_image, budget=budget))
+
+    def resume_drawing(self):
+        """从上次中断的位置继续绘制"""
+        if not has_checkpoint():
+            QMessageBox.information(self, "提示", "没有可以继续的绘制进度")
+            self.resume_btn.setEnabled(False)
+            return
+        self.launch_drawing(DrawingThread(resume=True, verify=self.verify_check.isChecked()))
+
+    def set_controls_enabled(self, enabled):
+        self.start_btn.setEnabled(enabled)
+        self.select_image_btn.setEnabled(enabled)
+        self.resume_btn.setEnabled(enabled and has_checkpoint())
+
+    def launch_drawing(self, drawing_thread):
+        """检测窗口后启动绘制线程"""
+        self.set_controls_enabled(False)
 
         # 首先执行窗口检测
         try:
             window_detection.main()
         except Exception as e:
-            self.start_btn.setEnabled(True)
-            self.select_image_btn.setEnabled(True)
+            self.set_controls_enabled(True)
             QMessageBox.critical(self, "错误", f"窗口检测失败: {str(e)}")
             return
 
         # 启动绘制线程
-        self.drawing_thread = DrawingThread(self.selected_image)
+        self.drawing_thread = drawing_thread
         # 移除了进度条信号连接
         self.drawing_thread.finished_signal.connect(self.drawing_finished)
         self.drawing_thread.start()
@@ -144,8 +199,7 @@ class DrawingApp(QMainWindow):
     def drawing_finished(self, success, message):
         """绘制完成处理（无弹窗）"""
         # 恢复界面状态
-        self.start_btn.setEnabled(True)
-        self.select_image_btn.setEnabled(True)
+        self.set_controls_enabled(True)
         
         # 重新显示窗口
         self.show()
@@ -178,4 +232,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的程序使用进程池（按连通分量并行提取笔画）时需要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
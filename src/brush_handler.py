@@ -1,15 +1,36 @@
 import os
-import pyautogui
-import time
 import json
 from .config import config_manager
+from .input_backends import get_input_backend
+from .calibration import load_pacing
 
 class BrushHandler:
     """画笔处理器，用于处理画笔大小检测和切换"""
     
-    def __init__(self):
+    def __init__(self, input_backend=None, pacing=None):
+        """
+        Args:
+            input_backend: 输入后端，None 表示默认后端
+            pacing: 事件节奏 Pacing，None 表示第一次切换画笔时按校准结果或默认节奏
+        """
+        self._input_backend = input_backend
+        self._pacing = pacing
         self.config_path = config_manager.get_config_path()
         self.slider_positions_file = self._get_slider_positions_file()
+
+    @property
+    def input_backend(self):
+        """输入后端，未指定时在第一次使用时取默认后端"""
+        if self._input_backend is None:
+            self._input_backend = get_input_backend()
+        return self._input_backend
+
+    @property
+    def pacing(self):
+        """事件节奏，与注入调度器使用同一份校准结果（只读取一次）"""
+        if self._pacing is None:
+            self._pacing = load_pacing()
+        return self._pacing
     
     def _get_slider_positions_file(self):
         """获取画笔滑块位置文件路径"""
@@ -117,7 +138,7 @@ class BrushHandler:
         if size_index in slider_positions:
             x, y = slider_positions[size_index]
             # 点击滑块位置
-            pyautogui.click(x, y)
-            time.sleep(0.1)  # 等待切换完成
+            self.input_backend.click(x, y)
+            self.input_backend.wait(self.pacing.brush_settle)  # 等待切换完成
             return True
         return False
\ No newline at end of file
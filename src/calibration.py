@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import numpy as np
+from .config import config_manager
+from .injection_scheduler import default_pacing
+from .velocity_profile import VelocityProfile
+
+# 时序配置文件（保存在配置目录）
+TIMING_PROFILE_FILE = 'timing_profile.json'
+
+# 校准的等待时间及其搜索范围（秒）：落笔后、抬笔后、相邻移动之间、点击画笔滑块后
+CALIBRATION_RANGES = {
+    'down_settle': (0.0, 0.1),
+    'up_settle': (0.0, 0.2),
+    'move_interval': (0.0002, 0.01),
+    'brush_settle': (0.0, 1.0),
+}
+
+# 截图中与画布原有内容相差超过该灰度值的像素视为笔迹
+INK_THRESHOLD = 40
+
+
+def timing_profile_path():
+    return os.path.join(config_manager.get_config_path(), TIMING_PROFILE_FILE)
+
+
+def load_timing_profile(path=None):
+    """
+    读取校准得到的时序配置
+
+    Returns:
+        {参数名: 秒} 字典（只含 CALIBRATION_RANGES 中的参数），没有配置或文件无效时为 None
+    """
+    path = path or timing_profile_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {key: float(data[key]) for key in CALIBRATION_RANGES if key in data}
+    except (OSError, ValueError, TypeError) as e:
+        print(f"⚠️ 读取时序配置 {path} 失败: {e}")
+        return None
+
+
+def save_timing_profile(profile, path=None, **metadata):
+    """
+    保存时序配置（先写临时文件再改名）
+
+    Args:
+        profile: {参数名: 秒}
+        metadata: 一并写入的说明信息，如输入后端名称、校准时间
+    """
+    path = path or timing_profile_path()
+    data = dict(metadata)
+    data.update({key: round(float(value), 6) for key, value in profile.items()})
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+    print(f"💾 时序配置已保存到 {path}")
+    return path
+
+
+def pacing_from_profile(profile):
+    """
+    由时序配置生成绘制节奏：落笔、切换画笔后的等待直接使用配置值，抬笔后的等待不再按线宽分段；
+    速度规划在转角处的最长移动间隔取校准的移动间隔
+
+    Args:
+        profile: load_timing_profile 的返回值，None 表示默认节奏
+    """
+    pacing = default_pacing()
+    if not profile:
+        return pacing
+    if 'down_settle' in profile:
+        pacing.down_settle = profile['down_settle']
+    if 'up_settle' in profile:
+        pacing.stroke_gaps = ((None, profile['up_settle']),)
+    if 'brush_settle' in profile:
+        pacing.brush_settle = profile['brush_settle']
+    if 'move_interval' in profile:
+        interval = profile['move_interval']
+        pacing.move_interval = interval
+        pacing.velocity = VelocityProfile(min_interval=min(pacing.velocity.min_interval, interval),
+                                          max_interval=interval)
+    return pacing
+
+
+def load_pacing():
+    """绘制使用的节奏：配置目录中有校准结果时按其生成，否则为默认节奏"""
+    return pacing_from_profile(load_timing_profile())
+
+
+class Calibrator:
+    """
+    在画布上画测试笔画并截图检查，二分查找各项等待时间的最小安全值
+
+    画布被划分为若干方格，每次试验使用一个新方格，试验前后各截一次图比较，
+    只看新出现的笔迹，与画笔颜色和画布原有内容无关。每个候选值重复 trials 次，
+    全部通过才算安全；结果再乘以 margin 作为余量。画布上的方格不够时减少重复次数，
+    方格用完时停止并返回已完成的各项。校准会在画布上留下测试笔画。
+    """
+
+    def __init__(self, backend, canvas_top_left, canvas_size, slider_positions=None, screenshot=None,
+                 trials=2, margin=1.5, cell_size=60):
+        """
+        Args:
+            backend: InputBackend
+            canvas_top_left: 画布左上角屏幕坐标
+            canvas_size: 画布尺寸 (width, height)
+            slider_positions: 画笔滑块 5 个档位的屏幕坐标，None 时跳过画笔切换的校准
+            screenshot: 截图函数 f((left, top, width, height)) -> RGB 数组，None 表示使用
+                后端的 screenshot（模拟画布）或 pyautogui.screenshot
+            trials: 每个候选值的重复次数
+            margin: 结果的余量倍数
+            cell_size: 测试方格边长（像素）
+        """
+        self.backend = backend
+        self.canvas_top_left = tuple(int(v) for v in canvas_top_left)
+        self.canvas_size = tuple(int(v) for v in canvas_size)
+        self.slider_positions = slider_positions if slider_positions and len(slider_positions) >= 5 else None
+        self.screenshot = screenshot or getattr(backend, 'screenshot', None) or pyautogui_screenshot
+        self.trials = trials
+        self.margin = margin
+        self.cell_size = cell_size
+        self._next_cell = 0
+        self.trial_count = 0
+
+    @property
+    def cells(self):
+        """画布上的测试方格总数"""
+        return (self.canvas_size[0] // self.cell_size) * (self.canvas_size[1] // self.cell_size)
+
+    @property
+    def cells_left(self):
+        return max(0, self.cells - self._next_cell)
+
+    def _cell(self):
+        """下一个空白测试方格的左上角屏幕坐标"""
+        columns = self.canvas_size[0] // self.cell_size
+        if self._next_cell >= self.cells:
+            raise RuntimeError("画布上的测试方格已用完，请清空画布后重新校准")
+        row, column = divmod(self._next_cell, columns)
+        self._next_cell += 1
+        return (self.canvas_top_left[0] + column * self.cell_size, self.canvas_top_left[1] + row * self.cell_size)
+
+    def _capture(self, cell):
+        image = np.asarray(self.screenshot((cell[0], cell[1], self.cell_size, self.cell_size)))
+        if image.ndim == 3:
+            image = image[..., :3].mean(axis=2)
+        return image.astype(np.int16)
+
+    def _trial(self, draw):
+        """在新方格中执行 draw(方格左上角)，返回新出现的笔迹掩码（方格坐标）"""
+        cell = self._cell()
+        before = self._capture(cell)
+        draw(cell)
+        # 留足时间让目标程序处理完事件并刷新画面
+        self.backend.wait(0.3)
+        self.trial_count += 1
+        return np.abs(self._capture(cell) - before) > INK_THRESHOLD
+
+    def _stroke(self, points, interval=0.01, down_settle=0.05, travel_settle=0.05, up_settle=0.25):
+        """用宽松的等待画一条测试笔画"""
+        backend = self.backend
+        backend.move(*points[0])
+        backend.flush()
+        backend.wait(travel_settle)
+        backend.down()
+        backend.wait(down_settle)
+        for x, y in points[1:]:
+            backend.move(x, y)
+            backend.wait(interval)
+        backend.up()
+        backend.flush()
+        backend.wait(up_settle)
+
+    def _line(self, cell, y, start=10, end=None, step=4):
+        end = self.cell_size - 10 if end is None else end
+        return [(cell[0] + x, cell[1] + y) for x in range(start, end + 1, step)]
+
+    def test_down_settle(self, seconds):
+        """落笔后等待 seconds 再移动，笔画开头不缺失"""
+        def draw(cell):
+            # 第二个点离起点 8 像素，起点附近有笔迹说明落笔在移动前已生效
+            points = self._line(cell, self.cell_size // 2, step=8)
+            self._stroke(points, down_settle=seconds)
+        ink = self._trial(draw)
+        row = self.cell_size // 2
+        return bool(ink[row - 2:row + 3, 6:14].any())
+
+    def test_up_settle(self, seconds):
+        """抬笔后等待 seconds 再移到下一笔起点，不画出连线"""
+        def draw(cell):
+            backend = self.backend
+            top = self._line(cell, 10)
+            backend.move(*top[0])
+            backend.flush()
+            backend.wait(0.05)
+            backend.down()
+            backend.wait(0.05)
+            for x, y in top[1:]:
+                backend.move(x, y)
+                backend.wait(0.01)
+            backend.up()
+            backend.flush()
+            backend.wait(seconds)
+            # 从右上角移到左下角的下一笔起点（抬笔未生效时会画出穿过方格中心的连线）
+            self._stroke(self._line(cell, self.cell_size - 10, end=self.cell_size // 2))
+        ink = self._trial(draw)
+        center = self.cell_size // 2
+        return not ink[center - 8:center + 9, center - 8:center + 9].any()
+
+    def test_move_interval(self, seconds):
+        """以 seconds 为间隔画锯齿线，每个拐点都被画出"""
+        top, bottom = 12, self.cell_size - 12
+        vertices = [(x, top if i % 2 == 0 else bottom) for i, x in enumerate(range(10, self.cell_size - 9, 5))]
+
+        def draw(cell):
+            self._stroke([(cell[0] + x, cell[1] + y) for x, y in vertices], interval=seconds)
+        ink = self._trial(draw)
+        return all(ink[max(0, y - 2):y + 3, max(0, x - 2):x + 3].any() for x, y in vertices)
+
+    def _line_thickness(self, ink, x=14):
+        """方格中第 x 列（靠近测试线起点）的笔迹像素数"""
+        return int(ink[:, x].sum())
+
+    def test_brush_settle(self, seconds, tier=3, reference=None):
+        """点击画笔滑块后等待 seconds 再画线，线宽已变为新档位（reference 为充分等待时的线宽）"""
+        def draw(cell):
+            backend = self.backend
+            backend.click(*self.slider_positions[tier - 1])
+            backend.wait(seconds)
+            # 切换后与绘制时一样很快开始画线（移到起点、落笔只做短暂等待）
+            self._stroke(self._line(cell, self.cell_size // 2), travel_settle=0.005, down_settle=0.01)
+            # 恢复最细档位，并充分等待
+            backend.click(*self.slider_positions[0])
+            backend.wait(CALIBRATION_RANGES['brush_settle'][1])
+        thickness = self._line_thickness(self._trial(draw))
+        if reference is None:
+            return thickness
+        return thickness >= 0.75 * reference
+
+    @staticmethod
+    def search_rounds(low, high, tolerance=0.1, resolution=0.0005):
+        """search 最多测试的候选值个数（每个候选值重复 trials 次）：上下限各一次，加上二分次数"""
+        rounds = 2
+        # 每次都通过时上限一直向下限收缩，停止条件最严，二分次数最多
+        while high - low > max(resolution, tolerance * high):
+            high = (low + high) / 2
+            rounds += 1
+        return rounds
+
+    def search(self, test, low, high, tolerance=0.1, resolution=0.0005, trials=None):
+        """
+        二分查找使 test 通过的最小值（假设等待越长越安全）
+
+        Args:
+            test: 函数 f(秒) -> 是否通过
+            low / high: 搜索范围（秒）
+            tolerance: 相对精度，区间缩小到 high 的该比例以内时停止
+            resolution: 绝对精度（秒）
+            trials: 每个候选值的重复次数，None 表示 self.trials
+
+        Returns:
+            最小安全值（未乘余量），high 也不通过时为 None
+        """
+        trials = trials or self.trials
+
+        def passes(value):
+            return all(test(value) for _ in range(trials))
+
+        if not passes(high):
+            return None
+        if passes(low):
+            return low
+        while high - low > max(resolution, tolerance * high):
+            middle = (low + high) / 2
+            if passes(middle):
+                high = middle
+            else:
+                low = middle
+        return high
+
+    def run(self, names=None):
+        """
+        依次校准各项等待时间
+
+        Args:
+            names: 要校准的参数名，None 表示全部（没有画笔滑块位置时跳过 brush_settle）
+
+        Returns:
+            {参数名: 秒}（已乘余量），某项在搜索范围上限也不通过或方格用完未校准时不包含该项
+        """
+        tests = {
+            'down_settle': self.test_down_settle,
+            'up_settle': self.test_up_settle,
+            'move_interval': self.test_move_interval,
+        }
+        profile = {}
+        try:
+            if self.slider_positions is not None and (names is None or 'brush_settle' in names):
+                reference = self.test_brush_settle(CALIBRATION_RANGES['brush_settle'][1])
+                thin = self._line_thickness(self._trial(
+                    lambda cell: self._stroke(self._line(cell, self.cell_size // 2))))
+                if reference > thin:
+                    tests['brush_settle'] = lambda seconds: self.test_brush_settle(seconds, reference=reference)
+                else:
+                    print("⚠️ 切换画笔前后线宽没有变化，跳过画笔切换等待的校准")
+            selected = [name for name in tests if names is None or name in names]
+            for index, name in enumerate(selected):
+                low, high = CALIBRATION_RANGES[name]
+                # 按剩余方格数和其余各项最多需要的试验次数确定本项的重复次数
+                rounds = sum(self.search_rounds(*CALIBRATION_RANGES[rest]) for rest in selected[index:])
+                trials = max(1, min(self.trials, self.cells_left // rounds))
+                if trials < self.trials:
+                    print(f"⚠️ 画布上剩余 {self.cells_left} 个测试方格，{name} 每个候选值只测试 {trials} 次")
+                start = time.perf_counter()
+                value = self.search(tests[name], low, high, trials=trials)
+                if value is None:
+                    print(f"❌ {name}: 等待 {high * 1e3:g}ms 仍不通过，保留默认值")
+                    continue
+                profile[name] = max(value * self.margin, low)
+                print(f"✅ {name}: 最小安全值 {value * 1e3:.2f}ms，加余量后 {profile[name] * 1e3:.2f}ms"
+                      f"（用时 {time.perf_counter() - start:.1f}s）")
+        except RuntimeError as e:
+            print(f"⚠️ {e}；已完成的 {len(profile)} 项校准结果仍然有效")
+        print(f"📐 共进行 {self.trial_count} 次测试笔画")
+        return profile
+
+
+def pyautogui_screenshot(region):
+    """用 pyautogui 截取屏幕区域 (left, top, width, height)，返回 RGB 数组"""
+    import pyautogui
+    return np.asarray(pyautogui.screenshot(region=tuple(int(v) for v in region)))
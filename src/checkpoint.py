@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import struct
+import numpy as np
+from .config import config_manager
+from .stroke_set import StrokeSet
+from .plan_format import StrokePlan
+
+# 检查点目录（在配置目录下），以及其中的会话信息和进度记录文件
+CHECKPOINT_DIR = 'checkpoint'
+SESSION_FILE = 'session.json'
+PROGRESS_FILE = 'progress.log'
+
+# 进度记录：下一条要画的笔画序号、该笔画已画出的点数（小端 u8 + u4，定长追加）
+PROGRESS_RECORD = struct.Struct('<QI')
+
+
+def checkpoint_path():
+    return os.path.join(config_manager.get_config_path(), CHECKPOINT_DIR)
+
+
+def _write_json(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+class DrawingCheckpoint:
+    """
+    绘制会话的检查点：中断（ESC、异常或强制结束线程）后可从上次的位置继续
+
+    会话开始时清空检查点目录并写入 session.json（计划来源、画布等）；绘制的每批计划
+    按顺序写成 batch-NNNNN.xcplan，全部批次写完后在 session.json 中标记规划完成。
+    进度只追加定长记录到 progress.log，每条记录一次 write 系统调用，不重写文件；
+    读取时取最后一条完整记录。绘制完成后删除整个会话。
+    """
+
+    def __init__(self, directory=None, interval=0.5):
+        """
+        Args:
+            directory: 检查点目录，None 表示配置目录下的 checkpoint
+            interval: 绘制中记录进度的最短间隔（秒）
+        """
+        self.directory = directory or checkpoint_path()
+        self.interval = interval
+        self.session = None
+        self.strokes = 0
+        self._fd = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def begin(self, source=None, **info):
+        """
+        开始新会话（清除之前的检查点）
+
+        Args:
+            source: 计划来源（图像或计划文件路径），继续绘制时用于提示和重新规划
+            info: 一并写入 session.json 的说明信息
+        """
+        self.clear()
+        os.makedirs(self.directory, exist_ok=True)
+        self.session = dict(info, source=source, started_at=time.strftime('%Y-%m-%d %H:%M:%S'),
+                            batches=0, strokes=0, points=0, planned=False)
+        self.strokes = 0
+        _write_json(self._path(SESSION_FILE), self.session)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0)
+        self._fd = os.open(self._path(PROGRESS_FILE), flags)
+        return self
+
+    def add_plan(self, plan):
+        """
+        保存一批计划
+
+        Returns:
+            这批计划第一条笔画在整个会话中的序号
+        """
+        first = self.strokes
+        plan.save(self._path(f"batch-{self.session['batches']:05d}.xcplan"))
+        self.session['batches'] += 1
+        self.session['strokes'] += len(plan)
+        self.session['points'] += int(plan.num_points)
+        self.strokes += len(plan)
+        _write_json(self._path(SESSION_FILE), self.session)
+        return first
+
+    def end_planning(self):
+        """全部批次已保存（之后继续绘制不需要重新规划）"""
+        self.session['planned'] = True
+        _write_json(self._path(SESSION_FILE), self.session)
+
+    def record(self, stroke, point=0):
+        """追加一条进度记录：序号小于 stroke 的笔画已画完，第 stroke 条已画出前 point 个点"""
+        if self._fd is None:
+            return
+        try:
+            os.write(self._fd, PROGRESS_RECORD.pack(int(stroke), int(point)))
+        except OSError as e:
+            print(f"⚠️ 写入绘制进度失败，不再记录: {e}")
+            self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def clear(self):
+        """删除检查点（绘制完成后调用）"""
+        self.close()
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+
+class SavedSession:
+    """从检查点目录读取的中断会话：全部已保存的计划批次和最后的绘制位置"""
+
+    def __init__(self, info, plan, stroke, point):
+        self.info = info
+        self.plan = plan
+        self.stroke = stroke
+        self.point = point
+
+    @property
+    def source(self):
+        return self.info.get('source')
+
+    @property
+    def planned(self):
+        return bool(self.info.get('planned'))
+
+    def drawn_plan(self):
+        """已画出的部分（含最后一条笔画已画出的点）"""
+        strokes = self.plan.strokes
+        drawn = strokes.select(slice(0, self.stroke))
+        if self.point >= 2 and self.stroke < len(strokes):
+            partial = strokes.select([self.stroke])
+            partial.points = partial.points[:self.point]
+            partial.offsets = np.array([0, len(partial.points)], dtype=np.int64)
+            drawn = StrokeSet.concatenate([drawn, partial])
+        return self._with(drawn)
+
+    def remaining_plan(self):
+        """
+        还没画的部分：中断在笔画中间时，该笔画从最后画出的点开始（与已画出的部分衔接）
+        """
+        strokes = self.plan.strokes.select(slice(self.stroke, len(self.plan)))
+        if self.point >= 2 and len(strokes):
+            skip = min(self.point - 1, int(strokes.lengths[0]) - 1)
+            strokes.points = strokes.points[skip:]
+            strokes.offsets = strokes.offsets - skip
+            strokes.offsets[0] = 0
+        return self._with(strokes)
+
+    def _with(self, strokes):
+        plan = self.plan
+        return StrokePlan(strokes, plan.canvas_top_left, plan.canvas_size, plan.scale_factor, plan.tier_bounds)
+
+
+def has_checkpoint(directory=None):
+    """是否有可以继续的中断会话（只检查文件是否存在）"""
+    return os.path.exists(os.path.join(directory or checkpoint_path(), SESSION_FILE))
+
+
+def load_checkpoint(directory=None):
+    """
+    读取中断的绘制会话
+
+    Returns:
+        SavedSession，没有检查点或检查点无效时为 None
+    """
+    directory = directory or checkpoint_path()
+    session_file = os.path.join(directory, SESSION_FILE)
+    if not os.path.exists(session_file):
+        return None
+    try:
+        with open(session_file, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        batches = [StrokePlan.load(os.path.join(directory, f"batch-{i:05d}.xcplan"))
+                   for i in range(int(info['batches']))]
+        stroke, point = 0, 0
+        progress_file = os.path.join(directory, PROGRESS_FILE)
+        if os.path.exists(progress_file):
+            size = os.path.getsize(progress_file) // PROGRESS_RECORD.size * PROGRESS_RECORD.size
+            if size:
+                with open(progress_file, 'rb') as f:
+                    f.seek(size - PROGRESS_RECORD.size)
+                    stroke, point = PROGRESS_RECORD.unpack(f.read(PROGRESS_RECORD.size))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ 读取绘制检查点失败: {e}")
+        return None
+    if not batches:
+        return None
+    plan = StrokePlan.concatenate(batches)
+    return SavedSession(info, plan, min(stroke, len(plan)), point)
@@ -0,0 +1,98 @@
+import os
+import queue
+import threading
+import cv2
+
+# 设置该环境变量为 1 时默认开启调试中间结果输出
+DEBUG_ARTIFACTS_ENV = 'XICHA_DEBUG_ARTIFACTS'
+
+
+class DebugArtifactSink:
+    """
+    调试中间结果（骨架图、距离变换图、笔画宽度等）的输出
+
+    默认关闭，关闭时各保存方法直接返回，不做任何编码或磁盘读写。开启后
+    图像编码和写文件都交给一个后台线程，提取流程只负责把数组放入队列，
+    不会因为磁盘 I/O 推迟开始绘制。
+    """
+
+    def __init__(self, enabled=False):
+        """
+        Args:
+            enabled: 是否输出调试中间结果
+        """
+        self.enabled = enabled
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def save_image(self, path, image):
+        """
+        保存图像（PNG 等，按扩展名编码）
+
+        Args:
+            path: 输出文件路径
+            image: 图像数组，或返回图像数组的函数（在后台线程中调用，转换开销也不占用提取流程）
+        """
+        if self.enabled:
+            self._submit(self._write_image, path, image)
+
+    def save_text(self, path, lines):
+        """
+        保存文本，每个元素一行
+
+        Args:
+            path: 输出文件路径
+            lines: 可迭代对象，元素按 str() 写出
+        """
+        if self.enabled:
+            self._submit(self._write_text, path, lines)
+
+    def flush(self, timeout=None):
+        """
+        等待已提交的中间结果全部写完
+
+        Returns:
+            是否在超时前写完
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put((done.set, ()))
+        return done.wait(timeout)
+
+    def _submit(self, func, *args):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='debug-artifacts', daemon=True)
+                self._thread.start()
+        self._queue.put((func, args))
+
+    def _worker(self):
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"❌ 保存中间结果时发生错误: {e}")
+
+    @staticmethod
+    def _write_image(path, image):
+        if callable(image):
+            image = image()
+        success, encoded_img = cv2.imencode(os.path.splitext(path)[1] or '.png', image)
+        if success:
+            # 使用 numpy tofile 解决中文路径问题
+            encoded_img.tofile(path)
+        else:
+            print(f"❌ 编码中间结果失败: {path}")
+
+    @staticmethod
+    def _write_text(path, lines):
+        with open(path, 'w') as f:
+            for line in lines:
+                f.write(f"{line}\n")
+
+
+# 全局实例，由 draw_image 的 --debug-artifacts 参数或 XICHA_DEBUG_ARTIFACTS=1 开启
+debug_sink = DebugArtifactSink(enabled=os.environ.get(DEBUG_ARTIFACTS_ENV) == '1')
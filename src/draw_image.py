@@ -1,6 +1,17 @@
-import pyautogui
+import os
+import ast
 import time
 import argparse
+import cv2
+import numpy as np
+try:
+    import pyautogui
+except Exception:  # 无显示环境（如无头 Linux）下导入失败，只能使用模拟画布后端
+    pyautogui = None
+try:
+    from pynput import keyboard
+except Exception:  # 无显示环境下不可用，此时不监听 ESC / 空格
+    keyboard = None
 from .config import config_manager
 from .keyboard_handler import KeyboardHandler
 from .path_processor import PathProcessor
@@ -8,6 +19,27 @@ from .brush_handler import BrushHandler
 from .image_processor import ImageProcessor
 from .coordinate_loader import CoordinateLoader
 from .drawer import Drawer
+from .skeleton_graph import trace_skeleton, merge_degree_two_nodes, prune_spurs, split_edges
+from .stroke_planner import plan_pen_routes, routes_to_paths, bridge_gaps
+from .stroke_order import order_strokes_grouped, apply_order, pen_up_distance
+from .polyline import simplify_concatenated
+from .tiled_skeleton import extract_skeleton_tiled, otsu_threshold, tile_size_for_budget
+from .parallel_extraction import (extract_components_parallel, pool_saving, component_rois, spatial_batches,
+                                  trace_component, merge_component_results)
+from .skeleton_backends import skeletonize_with_distance
+from .stroke_set import StrokeSet
+from .debug_artifacts import debug_sink
+from .plan_cache import PlanCache, resolved_params
+from .plan_format import StrokePlan, open_plan
+from .stage_pipeline import Stage, StagePipeline
+from .stroke_stream import StrokeStream
+from .input_backends import get_input_backend, INPUT_BACKENDS
+from .simulated_canvas import SimulatedCanvasBackend
+from .injection_scheduler import TimelineBuilder, InjectionScheduler
+from .calibration import Calibrator, load_pacing, load_timing_profile, save_timing_profile, CALIBRATION_RANGES
+from .verification import PlanVerifier
+from .checkpoint import DrawingCheckpoint, load_checkpoint
+from .time_budget import StrokeCostModel, fit_plan_to_budget
 
 # 初始化各个处理器
 path_processor = PathProcessor()
@@ -16,6 +48,9 @@ image_processor = ImageProcessor()
 coordinate_loader = CoordinateLoader()
 drawer = Drawer()
 
+config_path = config_manager.get_config_path()
+output_path = config_manager.get_output_path()
+
 
 def main(image_path, mode='draw'):
     """
@@ -99,7 +134,7 @@ def main(image_path, mode='draw'):
                         break
                     
                     print(f"点击坐标点 {i+1}: ({x}, {y})")
-                    pyautogui.click(x, y)
+                    input_backend.click(x, y)
                     time.sleep(0.1)  # 点击间隔
                     
                     # 等待直到绘制继续（如果暂停）
@@ -109,7 +144,7 @@ def main(image_path, mode='draw'):
                         time.sleep(0.1)
             finally:
                 keyboard_handler.stop_listener()
-                pyautogui.mouseUp()
+                input_backend.up()
             
             if keyboard_handler.check_exit_condition():
                 print("\n🛑 点击操作已被用户中断")
@@ -123,27 +158,6 @@ def main(image_path, mode='draw'):
     return True
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='高精细度一笔画绘制')
-    parser.add_argument('-i', '--image', required=True, help='输入图像路径')
-    parser.add_argument('-m', '--mode', choices=['draw', 'click'], default='draw', 
-                        help='运行模式: draw-绘制图像, click-点击坐标点 (默认: draw)')
-    args = parser.parse_args()
-    
-    try:
-        success = main(args.image, args.mode)
-        if success:
-            print("\n🎉 程序执行成功！")
-        else:
-            print("\n⚠️  程序执行失败！")
-    except KeyboardInterrupt:
-        print("\n程序被中断")
-    except Exception as e:
-        print(f"错误: {e}")
-    finally:
-        pyautogui.mouseUp()
-        print("程序结束")
-
 def get_line_width(contour):
     """
     估算轮廓的平均宽度（像素）
@@ -331,54 +345,67 @@ def map_width_to_brush_size(width):
     else:
         return 3
 
+# 画笔档位表：第 k 档的线宽上限（最后一档没有上限），与 map_width_to_brush_size 一致
+BRUSH_TIER_BOUNDS = (8, 20)
+
+def map_widths_to_brush_sizes(widths):
+    """map_width_to_brush_size 的向量化版本"""
+    return np.searchsorted(BRUSH_TIER_BOUNDS, widths, side='left') + 1
+
 def filter_short_paths(paths, min_points=3):
-    """过滤点数太少的路径（通常是噪点）"""
-    filtered = []
-    for path in paths:
-        if len(path) >= min_points:
-            filtered.append(path)
-        else:
-            print(f"[过滤] 路径过短 ({len(path)} 点)，已丢弃: {path[:3]}...")
+    """过滤点数太少的路径（通常是噪点），paths 可以是折线列表或 StrokeSet，返回 StrokeSet"""
+    strokes = paths if isinstance(paths, StrokeSet) else StrokeSet.from_paths(paths)
+    filtered = strokes.filter_short(min_points)
+    if len(filtered) < len(strokes):
+        print(f"[过滤] {len(strokes) - len(filtered)} 条路径过短（少于 {min_points} 点），已丢弃")
     return filtered
 
-def extract_skeleton_paths(binary_img):
+def extract_skeleton_paths(binary_img, spur_length=0, backend=None):
     """
     从二值图像中提取骨架路径（中心线），适用于实心笔画绘制
-    返回: [(path1), (path2), ...] 每个 path 是 [(x,y), ...]
+    骨架按像素图追踪：端点和交叉点为节点，每条边作为一条开放折线只输出一次
+    spur_length: 毛刺剪除阈值（原图像素），0 表示不剪除
+    backend: 骨架化后端名称（见 skeleton_backends），None 表示默认
+    返回: (paths, skeleton, graph, dist_transform)，paths 为 StrokeSet，与 graph.edges 一一对应
     """
-    # 确保输入是二值图（0 和 255），转为 0/1
-    bw = (binary_img > 0).astype(np.uint8)
+    # 确保输入是二值图（0 和 255）
+    bw = (binary_img > 0).astype(np.uint8) * 255
 
-    # 骨架化（细化）
-    skeleton = skeletonize(bw).astype(np.uint8) * 255
+    # 骨架化（细化），后端同时给出距离变换
+    skeleton, dist_transform = skeletonize_with_distance(bw, backend)
+    skeleton = skeleton.astype(np.uint8) * 255
 
-    # 查找骨架中的连通路径（使用 RETR_LIST + CHAIN_APPROX_NONE）
-    contours, _ = cv2.findContours(skeleton, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+    # 追踪骨架图（不再对单像素骨架做 findContours，否则每条中心线会沿两侧各走一遍）
+    graph = clean_skeleton_graph(trace_skeleton(skeleton), spur_length)
 
-    paths = []
-    for contour in contours:
-        if len(contour) < 2:
-            continue
-        path = [(int(pt[0][0]), int(pt[0][1])) for pt in contour]
-        # 去除闭合环的重复终点（骨架通常是开曲线）
-        if len(path) > 2 and path[0] == path[-1]:
-            path = path[:-1]
-        
-        # 过滤极小的路径：max(x)-min(x)<1 and max(y)-min(y)<1
-        if len(path) > 0:
-            x_coords = [pt[0] for pt in path]
-            y_coords = [pt[1] for pt in path]
-            if ((max(x_coords) - min(x_coords) <= 3) and (max(y_coords) - min(y_coords) <= 3) or (max(x_coords) - min(x_coords) <= 1) or (max(y_coords) - min(y_coords) <= 1)):
-                continue
-                
-        paths.append(path)
+    paths = StrokeSet.from_paths(graph.edges)
+    return paths, skeleton, graph, dist_transform
+
+def clean_skeleton_graph(graph, spur_length=0):
+    """
+    骨架图后处理：过滤极小的孤立碎片、剪除短毛刺，并按起始点排序
+    spur_length: 毛刺剪除阈值（原图像素），0 表示不剪除
+    """
+    # 过滤极小的孤立碎片和毛刺：max(x)-min(x)<=3 且 max(y)-min(y)<=3
+    # 两端都是交叉点的短边是结构的一部分，保留
+    degree = graph.degrees()
+    keep = []
+    for edge, (a, b) in zip(graph.edges, graph.edge_nodes):
+        span = edge.max(axis=0) - edge.min(axis=0)
+        dangling = degree[a] == 1 or degree[b] == 1
+        keep.append(not (dangling and span[0] <= 3 and span[1] <= 3))
+    graph = merge_degree_two_nodes(graph.select(keep))
 
-    # 过滤短路径
-    paths = filter_short_paths(paths, min_points=1)  # 至少6个点才保留
+    # 剪除短毛刺（粗线条和噪声边缘上骨架化产生的短分支）
+    if spur_length > 0:
+        edges_before = graph.num_edges
+        graph, removed_edges, removed_points = prune_spurs(graph, spur_length)
+        print(f"✂️ 毛刺剪除: 移除 {removed_edges} 条毛刺共 {removed_points} 个点，"
+              f"路径 {edges_before} 条 -> {graph.num_edges} 条")
 
-    # 可选：按起始点排序
-    paths.sort(key=lambda p: (p[0][1], p[0][0]))
-    return paths, skeleton
+    # 可选：按起始点排序（边和路径保持同一顺序）
+    order = sorted(range(graph.num_edges), key=lambda i: (graph.edges[i][0][1], graph.edges[i][0][0]))
+    return graph.select(order)
 
 def switch_brush_to_size(size_index, slider_positions):
     """
@@ -398,17 +425,68 @@ def switch_brush_to_size(size_index, slider_positions):
         # 输出正在切换画笔的提示
         print(f"正在切换画笔到大小档位 {size_index}")
         # 移动到目标位置并点击
-        pyautogui.moveTo(target_x, target_y, duration=0.1)
-        pyautogui.click()
-        time.sleep(0.2)  # 等待系统响应
+        input_backend.click(target_x, target_y)
+        input_backend.wait(load_pacing().brush_settle)  # 等待系统响应（可由 calibrate 命令校准）
         print(f"已切换到画笔大小档位 {size_index}")
         return True
     except Exception as e:
         print(f"切换画笔大小时出错: {e}")
         return False
 
-pyautogui.FAILSAFE = False
-pyautogui.PAUSE = 0.001  # 极小延迟，提升绘制速度
+# 鼠标输出统一经由输入后端（默认 pyautogui，可用 --input-backend 或 XICHA_INPUT_BACKEND 选择）
+try:
+    input_backend = get_input_backend()
+except RuntimeError:
+    # 无显示环境下没有真实的输入后端，需用 --input-backend simulated 或 set_input_backend 指定模拟画布
+    input_backend = None
+
+def set_input_backend(backend):
+    """
+    替换绘制使用的输入后端（如无显示环境下的基准测试传入 SimulatedCanvasBackend）
+    backend: InputBackend 实例或后端名称
+    返回: 替换后的后端
+    """
+    global input_backend
+    input_backend = get_input_backend(backend) if isinstance(backend, str) else backend
+    return input_backend
+
+# 绘制后截图检查、只补画缺失部分的设置（None 表示不检查），见 set_verification
+verification_options = None
+
+def set_verification(enabled=True, every=None, **options):
+    """
+    开启或关闭绘制后的截图检查
+    every: 每绘制多少条笔触检查一次，None 表示全部绘制完成后检查一次
+    options: 传给 PlanVerifier 的其他参数（tolerance、max_rounds 等）
+    """
+    global verification_options
+    verification_options = dict(options, every=every) if enabled else None
+
+# 键盘控制状态：ESC 中断绘制，空格暂停/继续
+should_exit = False
+is_paused = False
+
+def on_press(key):
+    """键盘监听回调"""
+    global should_exit, is_paused
+    if key == keyboard.Key.esc:
+        should_exit = True
+        # 立即抬起鼠标，确保停止所有绘制操作
+        input_backend.up()
+        return False
+    elif key == keyboard.Key.space:
+        is_paused = not is_paused
+        if is_paused:
+            # 暂停时立即抬笔，防止拖动产生线条
+            input_backend.up()
+
+def check_exit_condition():
+    """检查是否应该中断绘制"""
+    return should_exit
+
+def extend_short_path(path, threshold=7, target_length=6):
+    """扩展过短的路径使其在画布上可见"""
+    return path_processor.extend_short_path(path, threshold, target_length)
 
 import json
 
@@ -446,129 +524,268 @@ def load_canvas_coordinates():
     print(f"❌ 未找到有效的画布坐标文件: {config_file}")
     return None, None, None
 
-def extract_strict_strokes(image_path):
+def fit_scale_factor(img_width, img_height, canvas_size):
+    """计算把图像范围放入画布的缩放因子（四周留 10% 边距）"""
+    canvas_width, canvas_height = canvas_size
+    scale_x = canvas_width / img_width if img_width > 0 else 1
+    scale_y = canvas_height / img_height if img_height > 0 else 1
+    return min(scale_x, scale_y) * 0.9
+
+def to_canvas_coords(strokes, canvas_top_left, min_xy, scale_factor, offset):
+    """把原图坐标的 StrokeSet 映射为画布上的浮点屏幕坐标（未取整、未裁剪）"""
+    origin = np.array([canvas_top_left[0] + offset[0], canvas_top_left[1] + offset[1]], dtype=np.float64)
+    return strokes.transform(scale_factor, origin, pivot=min_xy)
+
+def bridge_stroke_gaps(paths, stroke_widths, tiers, scale_factor, max_gap=None):
     """
-    从图像中提取骨架路径（中心线）和宽度信息，将整个白色区域视为线条
-    流程：先处理原始图像得到processed_binary.png，再对其白色部分进行骨架化
+    端点间隙桥接（画布坐标）：同一画笔档位内，端点间距不超过画笔半径的笔画首尾相接，
+    落笔直接画过间隙，不再抬笔
+    scale_factor: 原图像素到画布像素的缩放因子（笔画宽度以原图像素计）
+    max_gap: 桥接距离（画布像素），None 表示按该档位笔画宽度中位数的一半估算画笔半径
+    返回: (paths, stroke_widths, tiers)，宽度为合并笔画按点数加权的平均值
     """
-    # 第一步：处理原始图像，生成processed_binary.png（保持原有处理逻辑）
+    merged_paths, merged_widths, merged_tiers = [], [], []
+    for tier in sorted(set(tiers)):
+        members = [i for i, t in enumerate(tiers) if t == tier]
+        subset = [paths[i] for i in members]
+        widths = [stroke_widths[i] for i in members]
+        gap = max_gap
+        if gap is None:
+            gap = max(1.0, 0.5 * float(np.median(widths)) * scale_factor)
+        tier_paths, chains = bridge_gaps(subset, gap)
+        for path, chain in zip(tier_paths, chains):
+            lengths = [len(subset[k]) for k, _ in chain]
+            chain_widths = [widths[k] for k, _ in chain]
+            merged_paths.append(path)
+            merged_widths.append(max(1, int(round(np.average(chain_widths, weights=lengths)))))
+            merged_tiers.append(tier)
+    print(f"🌉 端点桥接: {len(paths) - len(merged_paths)} 处间隙落笔连画，笔画 {len(paths)} 条 -> {len(merged_paths)} 条")
+    return merged_paths, merged_widths, merged_tiers
+
+# 解码时直接缩小的倍数及对应的 imread 标志（JPEG 在 DCT 阶段缩小，几乎不占额外内存）
+REDUCED_GRAYSCALE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    1: cv2.IMREAD_GRAYSCALE,
+}
+
+def read_gray_image(image_path, reduction=1):
+    """以灰度读取图像，reduction 为 2/4/8 时由解码器直接输出缩小后的图像"""
     # 使用numpy fromfile解决中文路径问题
-    try:
-        img_data = np.fromfile(image_path, dtype=np.uint8)
-        img = cv2.imdecode(img_data, cv2.IMREAD_COLOR)
-        if img is None:
-            print(f"❌ 无法读取图像: {image_path}")
-            return [], None, []
-    except Exception as e:
-        print(f"❌ 读取图像时发生错误: {image_path}, 错误信息: {e}")
-        return [], None, []
-    
-    # 转为灰度图
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    # 使用OTSU阈值自动确定最佳阈值
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    
+    img_data = np.fromfile(image_path, dtype=np.uint8)
+    return cv2.imdecode(img_data, REDUCED_GRAYSCALE_FLAGS[reduction])
+
+def read_npy_gray(image_path, crop=None, scale=1.0, band_bytes=1 << 23):
+    """
+    分条读取 .npy 灰度图（不用 memmap）：每个条带先在水平方向按面积缩小，全部条带读完后再在
+    垂直方向缩小；面积插值可分离，结果与整幅 INTER_AREA 缩放一致，常驻内存只有一个条带
+    （约 band_bytes）、原图高 × 目标宽的中间图和结果。缩放比例为 1/整数时条带高度取该整数的
+    倍数，每个条带直接缩小到结果中，不需要中间图
+    crop: 原图坐标的裁剪范围 (x0, y0, x1, y1)，超出原图的部分截去，None 表示整幅
+    scale: 缩放比例（≤ 1）
+    返回: (gray, (crop_w, crop_h))
+    """
+    with open(image_path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        if len(shape) != 2 or dtype != np.uint8 or fortran_order:
+            raise ValueError(f".npy 需为按行存储的二维 uint8 灰度图: {image_path}")
+        offset = f.tell()
+        height, width = shape
+        x0, y0, x1, y1 = crop or (0, 0, width, height)
+        x1, y1 = min(x1, width), min(y1, height)
+        crop_w, crop_h = x1 - x0, y1 - y0
+        block = int(round(1 / scale))
+        if abs(block * scale - 1) > 1e-9 or crop_w % block or crop_h % block:
+            block = 0
+        size = (crop_w // block, crop_h // block) if block else (max(1, int(round(crop_w * scale))),
+                                                                 max(1, int(round(crop_h * scale))))
+        rows = max(block or 1, band_bytes // width // (block or 1) * (block or 1))
+        gray = np.empty((size[1] if block else crop_h, size[0]), dtype=np.uint8)
+        for top in range(y0, y1, rows):
+            count = min(rows, y1 - top)
+            f.seek(offset + top * width)
+            band = np.fromfile(f, dtype=np.uint8, count=count * width).reshape(count, width)[:, x0:x1]
+            start = (top - y0) // (block or 1)
+            height = count // (block or 1)
+            gray[start:start + height] = (cv2.resize(band, (size[0], height), interpolation=cv2.INTER_AREA)
+                                          if size[0] < crop_w or height < count else band)
+    if not block and size[1] < crop_h:
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    return gray, (crop_w, crop_h)
+
+def load_working_image(image_path, canvas_size=None, oversample=2.0):
+    """
+    按画布实际需要的分辨率读取灰度图，并裁剪到内容范围
+    先以 1/8 分辨率解码预览，用 OTSU 阈值找出内容外接矩形；所需分辨率为
+    内容放入画布的缩放因子 × oversample，选择能满足要求的最大解码缩小倍数，
+    裁剪后再用 INTER_AREA 缩放一次
+    超大图可以预先保存为 .npy 灰度图：需要缩小时分条读取并缩放（read_npy_gray），峰值内存只有
+    一个条带和工作图；不需要缩小时按 np.memmap 打开，只裁剪不复制。PNG/JPEG 由 OpenCV 整幅解码
+    canvas_size: 画布尺寸 (width, height)，None 表示保持原图分辨率，只裁剪
+    oversample: 过采样倍数，工作图分辨率相对最终画布像素的倍数
+    返回: (gray, work_scale)，work_scale 为工作图相对原图的缩放比例；读取失败时 gray 为 None
+    """
+    is_npy = image_path.lower().endswith('.npy')
+    if is_npy:
+        preview = read_npy_gray(image_path, scale=1 / 8)[0]
+    else:
+        preview = read_gray_image(image_path, 8)
+    if preview is None:
+        return None, 1.0
+    _, mask = cv2.threshold(preview, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    x, y, w, h = cv2.boundingRect(mask)
+    if w == 0 or h == 0:
+        x, y, w, h = 0, 0, preview.shape[1], preview.shape[0]
+
+    # 预览坐标换算到原图坐标，四周多留一个预览像素
+    x0, y0 = max(0, x - 1) * 8, max(0, y - 1) * 8
+    x1, y1 = (x + w + 1) * 8, (y + h + 1) * 8
+    needed = 1.0
+    if canvas_size:
+        needed = min(1.0, fit_scale_factor(x1 - x0, y1 - y0, canvas_size) * oversample)
+    reduction = next(r for r in REDUCED_GRAYSCALE_FLAGS if r * needed <= 1.0)
+
+    if is_npy and needed < 1.0:
+        # 分条读取裁剪范围并直接缩放到工作分辨率，峰值内存不随原图面积增长
+        reduction = 1
+        gray, (crop_w, crop_h) = read_npy_gray(image_path, (x0, y0, x1, y1), needed)
+    else:
+        if is_npy:
+            reduction, gray = 1, np.load(image_path, mmap_mode='r')
+        elif reduction == 8:
+            gray = preview
+        else:
+            gray = read_gray_image(image_path, reduction)
+        if gray is None:
+            return None, 1.0
+        gray = gray[y0 // reduction:-(-y1 // reduction), x0 // reduction:-(-x1 // reduction)]
+        crop_w, crop_h = gray.shape[1], gray.shape[0]
+        factor = needed * reduction
+        if factor < 1.0:
+            size = (max(1, int(round(crop_w * factor))), max(1, int(round(crop_h * factor))))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    work_scale = gray.shape[1] / crop_w / reduction
+    print(f"🔍 工作分辨率: 裁剪到内容 {crop_w * reduction}x{crop_h * reduction} -> "
+          f"{gray.shape[1]}x{gray.shape[0]}（解码缩小 1/{reduction}，缩放 {work_scale:.3f}）")
+    return gray, work_scale
+
+def binarize_lines(gray, threshold=None, open_kernel=3, close_kernel=2, filter_kernel=3):
+    """
+    灰度图转线条二值图：反相阈值后开运算去噪点、闭运算连接断线，再过滤过小的细节
+    threshold: 二值化阈值，None 表示用 OTSU 自动确定
+    open_kernel / close_kernel / filter_kernel: 各形态学运算的核大小，见 clean_binary
+    返回: (binary, filtered_binary)
+    """
+    return clean_binary(threshold_lines(gray, threshold), open_kernel, close_kernel, filter_kernel)
+
+def threshold_lines(gray, threshold=None):
+    """反相阈值：线条（暗色）为 255；threshold 为 None 时用 OTSU 自动确定"""
+    if threshold is None:
+        # 使用OTSU阈值自动确定最佳阈值
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    else:
+        _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+    return binary
+
+def clean_binary(binary, open_kernel=3, close_kernel=2, filter_kernel=3):
+    """
+    二值图去噪：椭圆核开运算去除小噪点、椭圆核闭运算连接断线，再用矩形核开运算过滤过小的细节
+    各核大小为 0 或 1 时跳过对应的运算
+    返回: (binary, filtered_binary)
+    """
     # 更强的开运算（去除小噪点）
-    kernel_open = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel_open)
+    if open_kernel > 1:
+        kernel_open = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (open_kernel, open_kernel))
+        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel_open)
     
     # 再做一次闭运算（连接断裂但重要的线条）
-    kernel_close = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2, 2))
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel_close)
-    
-    # 设置面积阈值，过滤掉特别小的细节部分
-    min_area_threshold = 3  # 像素面积阈值
+    if close_kernel > 1:
+        kernel_close = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (close_kernel, close_kernel))
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel_close)
     
     # 使用更强的形态学开运算过滤小区域（先腐蚀后膨胀）
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-    filtered_binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-    
-    # 计算过滤掉的像素数量
-    total_white_pixels = cv2.countNonZero(binary)
-    filtered_white_pixels = cv2.countNonZero(filtered_binary)
-    small_contours_count = total_white_pixels - filtered_white_pixels
-    
-    # 打印过滤信息
-    print(f"已过滤 {small_contours_count} 个过小的细节轮廓（面积小于{min_area_threshold}像素）")
-    
-    # 保存processed_binary.png（这是处理后的二值图像）到临时目录
-    try:
-        # 使用临时目录存储处理后的文件
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-            temp_path = temp_file.name
-        
-        success, encoded_img = cv2.imencode('.png', filtered_binary)
-        if success:
-            encoded_img.tofile(temp_path)
-            print(f"✅ 已生成 processed_binary.png")
-        else:
-            print(f"❌ 保存 processed_binary.png 失败")
-            os.unlink(temp_path)
-            return [], None, []
-    except Exception as e:
-        print(f"❌ 保存 processed_binary.png 时发生错误: {e}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
-        return [], None, []
-    
-    # 第二步：读取processed_binary.png，并对其白色部分进行骨架化处理
-    # 使用numpy fromfile解决中文路径问题
-    try:
-        processed_img_data = np.fromfile(temp_path, dtype=np.uint8)
-        processed_img = cv2.imdecode(processed_img_data, cv2.IMREAD_GRAYSCALE)
-        os.unlink(temp_path)  # 读取后删除临时文件
-        if processed_img is None:
-            print(f"❌ 无法读取 processed_binary.png")
-            return [], None, []
-    except Exception as e:
-        print(f"❌ 读取 processed_binary.png 时发生错误: {e}")
-        return [], None, []
-    
-    # 确保图像是二值化的
-    _, processed_binary = cv2.threshold(processed_img, 127, 255, cv2.THRESH_BINARY)
-    
-    # 获取骨架路径（中心线）- 将整个白色区域视为线条
-    strokes, skeleton = extract_skeleton_paths(processed_binary)
+    filtered_binary = binary
+    if filter_kernel > 1:
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (filter_kernel, filter_kernel))
+        filtered_binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    return binary, filtered_binary
 
-    # 估算每条路径的宽度（使用距离变换）
-    dist_transform = cv2.distanceTransform(processed_binary, cv2.DIST_L2, 5)
-    stroke_widths = []
-    
-    # 打印骨架信息
-    print(f"找到 {len(strokes)} 条骨架路径")
-    
-    for i, path in enumerate(strokes):
-        widths = []
-        for x, y in path:
-            if 0 <= x < dist_transform.shape[1] and 0 <= y < dist_transform.shape[0]:
-                widths.append(int(dist_transform[y, x] * 2))  # 直径 = 2 * 半径
-        
-        avg_width = max(1, int(np.mean(widths))) if widths else 1
-        stroke_widths.append(avg_width)
-        
-        # 调试信息
-        if i < 5 or i % 50 == 0:  # 只打印部分路径信息
-            print(f"路径 {i}: 点数={len(path)}, 平均宽度={avg_width}px")
+def extract_strict_strokes(image_path, canvas_size=None, spur_length=4, tier_min_length=3, oversample=2.0,
+                           tile_size=None, memory_limit_mb=None, workers=None, skeleton_backend=None):
+    """
+    从图像中提取骨架路径（中心线）和宽度信息，将整个白色区域视为线条
+    流程：先处理原始图像得到二值图（processed_binary），再对其白色部分进行骨架化，各步骤间直接传递数组
+    canvas_size: 画布尺寸 (width, height)，用于把画布像素阈值换算为原图像素；
+                 None 时从 canvas_coordinates.txt 读取
+    spur_length: 毛刺剪除阈值（最终画布像素），短于该长度的分支在采样宽度前剪除
+    tier_min_length: 路径在局部宽度跨越画笔档位处切开，短于该长度（画布像素）的档位段并入相邻段
+    oversample: 工作分辨率相对画布像素的过采样倍数，图像裁剪到内容后只按该分辨率处理
+    tile_size / memory_limit_mb: 指定任一项即分块提取（见 tiled_skeleton），
+                 memory_limit_mb 为单个分块处理时的内存预算，用于推算分块边长；
+                 与骨架像素数成正比的输出（骨架图、稀疏宽度图、笔画）不在预算之内；
+                 只有 .npy 灰度图按条带读取，PNG/JPEG 整幅解码，解码的峰值内存不受预算约束
+    workers: 按连通分量并行提取的进程数，None 表示 CPU 核数，1 表示整幅图在主进程处理
+    skeleton_backend: 骨架化后端 'skimage' / 'medial_axis' / 'opencv'，None 表示最快的可用后端
+    返回: (strokes, binary, stroke_widths, graph, work_scale)，笔画为工作图坐标的 StrokeSet，
+          宽度仍以原图像素计，work_scale 为工作图相对原图的缩放；分块模式下 binary 返回 None
+    """
+    if canvas_size is None:
+        _, canvas_size, _ = load_canvas_coordinates()
 
-    # 保存中间结果用于调试
+    # 第一步：按画布所需分辨率读取灰度图并裁剪到内容范围
     try:
-        success, encoded_img = cv2.imencode('.png', skeleton)
-        if success:
-            encoded_img.tofile(os.path.join(output_path, 'skeleton.png'))
-        
-        success, encoded_img = cv2.imencode('.png', (dist_transform * 10).astype(np.uint8))
-        if success:
-            encoded_img.tofile(os.path.join(output_path, 'distance_transform.png'))
+        gray, work_scale = load_working_image(image_path, canvas_size, oversample)
+        if gray is None:
+            print(f"❌ 无法读取图像: {image_path}")
+            return [], None, [], None, 1.0
     except Exception as e:
-        print(f"❌ 保存中间结果时发生错误: {e}")
-    
+        print(f"❌ 读取图像时发生错误: {image_path}, 错误信息: {e}")
+        return [], None, [], None, 1.0
+
+    if tile_size is not None or memory_limit_mb is not None:
+        # 分块模式：整幅图只读取灰度（可为 memmap），其余中间结果都按分块处理
+        if memory_limit_mb is not None and not image_path.lower().endswith('.npy'):
+            print(f"⚠️ 内存预算 {memory_limit_mb:g}MB 只约束 .npy 灰度图的读取和分块处理，"
+                  "PNG/JPEG 会整幅解码；超大图请先转换为 .npy")
+        if tile_size is None:
+            tile_size = tile_size_for_budget(memory_limit_mb)
+        threshold = otsu_threshold(gray, rows=max(1, tile_size * tile_size // gray.shape[1]))
+        graph, radius_map = extract_skeleton_tiled(
+            gray, lambda tile: binarize_lines(tile, threshold)[1], tile_size, backend=skeleton_backend)
+        binary = skeleton = None
+        scale_factor = 1.0
+        if canvas_size and graph.num_edges:
+            points = np.concatenate(graph.edges)
+            extent = points.max(axis=0) - points.min(axis=0)
+            scale_factor = fit_scale_factor(extent[0], extent[1], canvas_size)
+        graph = clean_skeleton_graph(graph, spur_length / scale_factor)
+
+        def radius_at(xs, ys):
+            return radius_map.lookup(xs, ys) / work_scale
+    else:
+        binary, skeleton, graph, radius_in_work, dist_transform, scale_factor = _extract_in_memory(
+            np.ascontiguousarray(gray), canvas_size, spur_length, workers, skeleton_backend)
+
+        def radius_at(xs, ys):
+            return radius_in_work(xs, ys) / work_scale
+
+    graph, strokes = split_by_brush_tier(graph, radius_at, scale_factor, tier_min_length)
+    stroke_widths = strokes.widths.tolist()
+
+    # 保存中间结果用于调试（默认关闭，开启后在后台线程写入；
+    # 分块模式下没有整幅的骨架图，并行模式下没有整幅的距离变换）
+    if skeleton is not None:
+        debug_sink.save_image(os.path.join(output_path, 'skeleton.png'), skeleton)
+        if dist_transform is not None:
+            debug_sink.save_image(os.path.join(output_path, 'distance_transform.png'),
+                                  lambda: (dist_transform / work_scale * 10).astype(np.uint8))
+
     # 保存笔画宽度信息
-    stroke_widths_path = os.path.join(config_path, 'stroke_widths.txt')
-    with open(stroke_widths_path, 'w') as f:
-        for width in stroke_widths:
-            f.write(f"{width}\n")
-    
+    debug_sink.save_text(os.path.join(config_path, 'stroke_widths.txt'), stroke_widths)
+
     # 统计宽度范围
     if stroke_widths:
         min_width = min(stroke_widths)
@@ -578,33 +795,146 @@ def extract_strict_strokes(image_path):
     
     print(f"✅ 提取 {len(strokes)} 条中心线路径，支持实心绘制")
     print(f"笔画宽度范围: 最小={min_width}px, 最大={max_width}px")
-    return strokes, binary, stroke_widths
+    return strokes, binary, stroke_widths, graph, work_scale
 
-def draw_on_canvas(traced_paths, canvas_top_left, canvas_size, stroke_widths=None, scale_factor=1.0):
-    """在画布上逐条绘制笔触，根据线条宽度自动切换画笔大小"""
-    global should_exit, is_paused
-    screen_width, screen_height = pyautogui.size()
-    safe_margin = 30
+def split_by_brush_tier(graph, radius_at, scale_factor=1.0, tier_min_length=3):
+    """
+    在局部宽度跨越画笔档位的位置切开路径，使每段只对应一个档位，并估算每段的平均宽度
+    radius_at(xs, ys): 骨架像素处的半径（原图像素）
+    tier_min_length: 短于该长度（画布像素）的档位段并入相邻段
+    返回: (graph, strokes)，strokes 为与 graph.edges 一一对应的 StrokeSet，widths 列为平均宽度
+    """
+    edges = StrokeSet.from_paths(graph.edges)
+    point_tiers = map_widths_to_brush_sizes((edges.sample(radius_at) * 2).astype(int))
+    edges_before = graph.num_edges
+    graph, _ = split_edges(graph, np.split(point_tiers, edges.offsets[1:-1]),
+                           max(1, int(round(tier_min_length / scale_factor))))
+    strokes = StrokeSet.from_paths(graph.edges)
+    print(f"✂️ 按画笔档位切分: {edges_before} 条 -> {len(strokes)} 条路径")
+
+    # 打印骨架信息
+    print(f"找到 {len(strokes)} 条骨架路径")
+
+    # 平均宽度：直径 = 2 * 半径，逐点采样后按笔画求平均
+    strokes.sample_widths(radius_at)
+    return graph, strokes
+
+def _extract_in_memory(gray, canvas_size, spur_length, workers=None, backend=None):
+    """
+    整幅图在内存中提取骨架图；有多个 CPU 核且预计并行能节省时间时按连通分量并行处理（见 pool_saving）
+    返回: (binary, skeleton, graph, radius_at, dist_transform, scale_factor)
+          radius_at(xs, ys) 为工作图像素的半径，并行模式下 dist_transform 为 None
+    """
+    binary, filtered_binary = binarize_lines(gray)
     
-    # 初始化画笔大小
-    current_brush_size = 1
-    slider_positions = None
+    # 设置面积阈值，过滤掉特别小的细节部分
+    min_area_threshold = 3  # 像素面积阈值
     
-    # 加载已保存的滑块位置（从最细到最粗的画笔坐标）
-    slider_positions = load_brush_slider_positions()
+    # 计算过滤掉的像素数量
+    total_white_pixels = cv2.countNonZero(binary)
+    filtered_white_pixels = cv2.countNonZero(filtered_binary)
+    small_contours_count = total_white_pixels - filtered_white_pixels
     
-    # 验证加载的位置数量
-    if slider_positions and len(slider_positions) == 5:
-        print("已成功加载5个画笔档位位置，按最细到最粗顺序使用")
-    else:
-        print("警告：未找到有效滑块位置或位置数量不正确")
-        print("请确保brush_slider_positions.txt文件包含5个坐标，顺序为最细到最粗")
+    # 打印过滤信息
+    print(f"已过滤 {small_contours_count} 个过小的细节轮廓（面积小于{min_area_threshold}像素）")
     
+    # 第二步：直接对处理后的二值图（0/255）的白色部分进行骨架化处理，
+    # 不再经由临时 PNG 文件往返；需要检查时由调试输出保存 processed_binary.png
+    processed_binary = filtered_binary
+    debug_sink.save_image(os.path.join(output_path, 'processed_binary.png'), processed_binary)
+
+    # 画布像素阈值换算到原图像素（缩放方式与 draw_on_canvas 一致）
+    scale_factor = 1.0
+    if canvas_size:
+        _, _, content_w, content_h = cv2.boundingRect(processed_binary)
+        scale_factor = fit_scale_factor(content_w - 1, content_h - 1, canvas_size)
+
+    workers = workers or os.cpu_count() or 1
+    # 按工作图中各连通分量的 ROI 面积估算并行能节省的时间，抵不过进程池启动开销时整幅处理
+    rois = component_rois(processed_binary) if workers > 1 else []
+    if pool_saving(rois, workers) > 0:
+        # 各连通分量在 ROI 内骨架化、追踪并采样距离变换，合并后统一过滤和剪除毛刺
+        graph, radius_map = extract_components_parallel(processed_binary, workers, backend=backend, rois=rois)
+        graph = clean_skeleton_graph(graph, spur_length / scale_factor)
+        skeleton = np.zeros(processed_binary.shape, dtype=np.uint8)
+        if graph.num_edges:
+            points = np.concatenate(graph.edges)
+            skeleton[points[:, 1], points[:, 0]] = 255
+        return binary, skeleton, graph, radius_map.lookup, None, scale_factor
+
+    # 获取骨架路径（中心线）- 将整个白色区域视为线条
+    # 距离变换用于估算每条路径的宽度，由骨架化后端一并给出
+    _, skeleton, graph, dist_transform = extract_skeleton_paths(processed_binary, spur_length / scale_factor,
+                                                                backend)
+
+    def radius_at(xs, ys):
+        return dist_transform[ys, xs]
+    return binary, skeleton, graph, radius_at, dist_transform, scale_factor
+
+def plan_pen_down_routes(graph, stroke_widths):
+    """
+    合并笔画：在每个连通分量内按画笔档位规划最少抬笔的连续路线
+    位于 extract_strict_strokes 和 draw_on_canvas 之间
+    返回: (paths, stroke_widths)，paths 为 StrokeSet，宽度为路线内各边按点数加权的平均值
+    """
+    keys = map_widths_to_brush_sizes(stroke_widths)
+    routes = plan_pen_routes(graph, keys)
+    merged = routes_to_paths(graph, routes)
+
+    edge_lengths = np.array([len(edge) for edge in graph.edges], dtype=np.float64)
+    edge_widths = np.asarray(stroke_widths, dtype=np.float64)
+    widths = []
+    for route in routes:
+        route_edges = [e for e, _ in route]
+        widths.append(max(1, int(round(np.average(edge_widths[route_edges], weights=edge_lengths[route_edges])))))
+    paths = StrokeSet.from_paths(merged, widths)
+
+    # 按起始点排序，与 extract_skeleton_paths 保持一致
+    if len(paths):
+        starts = paths.points[paths.offsets[:-1]]
+        paths = paths.select(np.lexsort((starts[:, 0], starts[:, 1])))
+
+    print(f"🔗 笔画合并: {graph.num_edges} 条 -> {len(paths)} 条，减少抬笔 {graph.num_edges - len(paths)} 次")
+    return paths, paths.widths.tolist()
+
+def plan_canvas_strokes(traced_paths, canvas_top_left, canvas_size, stroke_widths=None,
+                        order_time_limit=0.5, bridge_gap=None, simplify_tolerance=0.75,
+                        short_path_threshold=20, short_path_target=23, work_scale=1.0):
+    """
+    生成最终的屏幕笔画计划：映射到画布并桥接（map_strokes_to_canvas）、按档位排序
+    （order_canvas_strokes）、延长短路径、取整裁剪并简化（finalize_screen_strokes）
+    traced_paths: StrokeSet 或折线列表（原图坐标）
+    选择笔画顺序和方向以缩短抬笔移动，order_time_limit 为 2-opt/Or-opt 改进的时间限制（秒）
+    bridge_gap: 端点桥接距离（画布像素），None 表示按画笔半径估算，0 表示不桥接
+    simplify_tolerance: 屏幕坐标折线简化（RDP）的容差（屏幕像素），0 表示只去重和合并共线点
+    short_path_threshold / short_path_target: 短路径延长的阈值和目标长度（原图像素）
+    work_scale: traced_paths 坐标相对原图的缩放（extract_strict_strokes 返回的工作图缩放）
+    返回: StrokePlan，strokes 为屏幕坐标的 StrokeSet（按绘制顺序），widths / tiers 列为每条笔画的宽度和画笔档位
+    """
+    canvas_strokes, scale_factor, baseline = map_strokes_to_canvas(traced_paths, canvas_top_left, canvas_size,
+                                                                   stroke_widths, bridge_gap,
+                                                                   work_scale=work_scale)
+    ordered = order_canvas_strokes(canvas_strokes, order_time_limit, baseline)
+    return finalize_screen_strokes(ordered, canvas_top_left, canvas_size, scale_factor, simplify_tolerance,
+                                   short_path_threshold, short_path_target)
+
+def map_strokes_to_canvas(traced_paths, canvas_top_left, canvas_size, stroke_widths=None, bridge_gap=None,
+                          bounds=None, work_scale=1.0):
+    """
+    把原图坐标的笔画居中缩放到画布（浮点屏幕坐标），再做同档位端点桥接
+    bounds: 整幅图的范围 (min_x, min_y, max_x, max_y)，None 表示取这些笔画的范围；
+            分批规划时各批共用整幅图的范围，保证缩放和偏移一致
+    work_scale: 笔画坐标相对原图的缩放，笔画宽度以原图像素计
+    返回: (canvas_strokes, scale_factor, baseline)，canvas_strokes 带 widths / tiers 列，
+          scale_factor 为原图像素到画布像素的缩放因子，
+          baseline 为桥接和排序前的 (画笔切换次数, 抬笔移动距离)
+    """
+    # 绘制开始时画笔为 1 档
+    current_brush_size = 1
+
     # 计算缩放因子和偏移
-    min_x = min(min(p[0] for p in path) for path in traced_paths)
-    min_y = min(min(p[1] for p in path) for path in traced_paths)
-    max_x = max(max(p[0] for p in path) for path in traced_paths)
-    max_y = max(max(p[1] for p in path) for path in traced_paths)
+    strokes = traced_paths if isinstance(traced_paths, StrokeSet) else StrokeSet.from_paths(traced_paths)
+    min_x, min_y, max_x, max_y = (int(v) for v in (strokes.bounds() if bounds is None else bounds))
     
     # 计算图像实际宽度和高度
     img_width = max_x - min_x
@@ -613,9 +943,7 @@ def draw_on_canvas(traced_paths, canvas_top_left, canvas_size, stroke_widths=Non
     canvas_width, canvas_height = canvas_size
     
     # 计算缩放因子
-    scale_x = canvas_width / img_width if img_width > 0 else 1
-    scale_y = canvas_height / img_height if img_height > 0 else 1
-    scale_factor = min(scale_x, scale_y) * 0.9
+    scale_factor = fit_scale_factor(img_width, img_height, canvas_size)
     
     # 计算偏移量
     offset_x = (canvas_width - img_width * scale_factor) // 2
@@ -626,184 +954,436 @@ def draw_on_canvas(traced_paths, canvas_top_left, canvas_size, stroke_widths=Non
     print(f"画布位置: 左上角({canvas_top_left[0]}, {canvas_top_left[1]})")
     print(f"缩放因子: {scale_factor:.4f}")
     print(f"偏移量: X={offset_x}, Y={offset_y}")
+
+    # 映射到画布坐标（浮点），桥接、排序和短路径延长都在画布坐标中进行
+    traced_paths = to_canvas_coords(strokes, canvas_top_left, (min_x, min_y), scale_factor,
+                                    (offset_x, offset_y)).to_paths()
+    # 宽度和短路径阈值以原图像素计，统一按 原图 -> 画布 的缩放换算
+    scale_factor *= work_scale
+
+    if not stroke_widths:
+        stroke_widths = [1] * len(traced_paths)
+    tiers = [map_width_to_brush_size(width) for width in stroke_widths]
+    switches_before = sum(1 for a, b in zip([current_brush_size] + tiers[:-1], tiers) if a != b)
+    pen_up_before = pen_up_distance(traced_paths)
+
+    # 同档位内端点几乎相接的笔画连成一笔
+    traced_paths, stroke_widths, tiers = bridge_stroke_gaps(traced_paths, stroke_widths, tiers,
+                                                            scale_factor, bridge_gap)
+
+    baseline = (switches_before, pen_up_before)
+    return StrokeSet.from_paths(traced_paths, stroke_widths, tiers, dtype=np.float64), scale_factor, baseline
+
+def order_canvas_strokes(canvas_strokes, order_time_limit=0.5, baseline=None, start_point=None):
+    """
+    按画笔档位分批排序：档位升序依次绘制，每批内选择笔画顺序和方向（最近邻 + 2-opt/Or-opt）
+    baseline: map_strokes_to_canvas 返回的排序前统计，用于打印对比
+    start_point: 绘制前的笔位置，None 表示取所有端点的左上角
+    返回: 排好序的 StrokeSet（画布浮点坐标）
+    """
+    current_brush_size = 1
+    traced_paths = canvas_strokes.to_paths()
+    stroke_widths = canvas_strokes.widths.tolist()
+    tiers = canvas_strokes.tiers.tolist()
+    order, reverse = order_strokes_grouped(traced_paths, tiers, start_point, time_limit=order_time_limit)
+    traced_paths, stroke_widths, tiers = apply_order(traced_paths, order, reverse, stroke_widths, tiers)
+    pen_up_after = pen_up_distance(traced_paths)
+    switches_after = sum(1 for a, b in zip([current_brush_size] + tiers[:-1], tiers) if a != b)
+    if baseline is not None:
+        switches_before, pen_up_before = baseline
+        print(f"🧭 抬笔移动距离: {pen_up_before:.0f}px -> {pen_up_after:.0f}px（画布像素）")
+        print(f"🖌️ 画笔切换: {switches_before} 次 -> {switches_after} 次")
+    return StrokeSet.from_paths(traced_paths, stroke_widths, tiers, dtype=np.float64)
+
+def finalize_screen_strokes(ordered, canvas_top_left, canvas_size, scale_factor, simplify_tolerance=0.75,
+                            short_path_threshold=20, short_path_target=23):
+    """
+    转换为最终屏幕坐标：延长过短路径，取整并限制在画布内，再做折线简化
+    scale_factor: 原图到画布的缩放因子，短路径阈值按原图像素给出，乘以它换算到画布坐标
+    返回: StrokePlan（屏幕坐标的 StrokeSet 及画布、缩放、画笔档位表）
+    """
+    canvas_width, canvas_height = canvas_size
+    lower = np.array(canvas_top_left, dtype=np.int64)
+    upper = lower + np.array([canvas_width - 1, canvas_height - 1], dtype=np.int64)
+    screen = ordered.extend_short(threshold=short_path_threshold * scale_factor,
+                                  target_length=short_path_target * scale_factor)
+    screen = screen.astype(np.int64).clamp(lower, upper)
+
+    # 折线简化：去掉取整后重复的点，合并共线点，再用亚像素容差的 RDP 减少鼠标事件
+    events_before = screen.num_points
+    points, starts = simplify_concatenated(screen.points, screen.offsets[:-1], simplify_tolerance)
+    offsets = np.append(starts, len(points)).astype(np.int64)
+    print(f"📉 鼠标移动事件: {events_before} -> {len(points)}（RDP 容差 {simplify_tolerance}px）")
+    screen = StrokeSet(points.astype(np.int32), offsets, ordered.widths, ordered.tiers)
+    return StrokePlan(screen, canvas_top_left, canvas_size, scale_factor, BRUSH_TIER_BOUNDS)
+
+def fit_plan_to_canvas(plan, canvas_top_left, canvas_size):
+    """
+    把计划移到当前画布：画布尺寸相同时只平移，否则按比例缩放后居中
+    用于执行在另一台机器（或画布位置不同时）生成的计划
+    返回: StrokePlan，画布与计划一致时原样返回
+    """
+    canvas_top_left = tuple(int(v) for v in canvas_top_left)
+    canvas_size = tuple(int(v) for v in canvas_size)
+    if canvas_top_left == plan.canvas_top_left and canvas_size == plan.canvas_size:
+        return plan
+    old_width, old_height = plan.canvas_size
+    new_width, new_height = canvas_size
+    scale = min(new_width / old_width, new_height / old_height)
+    origin = (canvas_top_left[0] + (new_width - old_width * scale) / 2,
+              canvas_top_left[1] + (new_height - old_height * scale) / 2)
+    print(f"⚠️ 当前画布 {canvas_top_left} {new_width}x{new_height} 与计划画布 "
+          f"{plan.canvas_top_left} {old_width}x{old_height} 不同，按比例 {scale:.4f} 映射")
+    moved = plan.strokes.transform(scale, origin, pivot=plan.canvas_top_left)
+    lower = np.array(canvas_top_left, dtype=np.int64)
+    upper = lower + np.array([new_width - 1, new_height - 1], dtype=np.int64)
+    moved = StrokeSet(np.rint(moved.points).astype(np.int64), moved.offsets, moved.widths, moved.tiers)
+    moved = moved.clamp(lower, upper).astype(np.int32)
+    return StrokePlan(moved, canvas_top_left, canvas_size, plan.scale_factor * scale, plan.tier_bounds)
+
+def stream_canvas_plans(image_path, canvas_top_left, canvas_size, spur_length=4, tier_min_length=3,
+                        oversample=2.0, skeleton_backend=None, batch_area=20000, order_time_limit=0.1,
+                        bridge_gap=None, simplify_tolerance=0.75, short_path_threshold=20, short_path_target=23,
+                        skip_batches=0, start_point=None):
+    """
+    边提取边规划：按空间顺序把连通分量分批，逐批骨架化、追踪、切分档位并生成屏幕笔画计划
+    整幅图只做读取、二值化和连通分量标记，骨架化等耗时步骤按批进行，
+    第一批计划的就绪时间只取决于第一批的大小，与整幅图的大小无关
+    各批共用整幅图内容的范围做缩放和居中，下一批从上一批的结束位置开始排序
+    batch_area: 每批的线条面积（工作图像素），见 spatial_batches
+    order_time_limit: 每批的排序改进时间限制（秒）
+    skip_batches: 跳过前若干个非空批次（继续中断的绘制时这些批次已经画过），只追踪不规划
+    start_point: 第一批排序时的笔位置（屏幕坐标），None 表示取该批所有端点的左上角
+    其余参数含义同 extract_strict_strokes / plan_canvas_strokes
+    产出: 每批一个 StrokePlan（屏幕坐标，按绘制顺序）；批次划分只取决于图像和画布，
+          同样的参数重新运行时第 k 批的笔画相同
+    """
+    gray, work_scale = load_working_image(image_path, canvas_size, oversample)
+    if gray is None:
+        raise ValueError(f"无法读取图像: {image_path}")
+    _, processed_binary = binarize_lines(np.ascontiguousarray(gray))
+    x, y, content_w, content_h = cv2.boundingRect(processed_binary)
+    if content_w == 0 or content_h == 0:
+        return
+    bounds = (x, y, x + content_w - 1, y + content_h - 1)
+    scale_factor = fit_scale_factor(content_w - 1, content_h - 1, canvas_size)
+
+    rois = component_rois(processed_binary)
+    batches = spatial_batches(rois, processed_binary.shape, batch_area)
+    print(f"🚚 边提取边绘制: {len(rois)} 个连通分量分为 {len(batches)} 批")
+    for batch in batches:
+        results = [trace_component(*rois[i][:2], skeleton_backend) for i in batch]
+        graph, radius_map = merge_component_results(results, processed_binary.shape)
+        graph = clean_skeleton_graph(graph, spur_length / scale_factor)
+        if graph.num_edges == 0:
+            continue
+        if skip_batches > 0:
+            skip_batches -= 1
+            continue
+
+        def radius_at(xs, ys):
+            return radius_map.lookup(xs, ys) / work_scale
+        graph, strokes = split_by_brush_tier(graph, radius_at, scale_factor, tier_min_length)
+        strokes, stroke_widths = plan_pen_down_routes(graph, strokes.widths.tolist())
+        canvas_strokes, canvas_scale, _ = map_strokes_to_canvas(strokes, canvas_top_left, canvas_size,
+                                                                stroke_widths, bridge_gap, bounds, work_scale)
+        ordered = order_canvas_strokes(canvas_strokes, order_time_limit, start_point=start_point)
+        plan = finalize_screen_strokes(ordered, canvas_top_left, canvas_size, canvas_scale, simplify_tolerance,
+                                       short_path_threshold, short_path_target)
+        if len(plan) == 0:
+            continue
+        start_point = tuple(ordered[len(ordered) - 1][-1])
+        yield plan
+
+def draw_on_canvas(traced_paths, canvas_top_left, canvas_size, stroke_widths=None, scale_factor=1.0,
+                   order_time_limit=0.5, bridge_gap=None, simplify_tolerance=0.75, budget=None, work_scale=1.0):
+    """
+    在画布上逐条绘制笔触，根据线条宽度自动切换画笔大小
+    先由 plan_canvas_strokes 生成屏幕笔画计划（参数含义见该函数），再由 execute_plan 绘制
+    traced_paths: StrokeSet 或折线列表（原图坐标）
+    budget: 绘制时间限制（秒），None 表示全部绘制，见 execute_within_budget
+    work_scale: traced_paths 坐标相对原图的缩放（extract_strict_strokes 返回的工作图缩放）
+    """
+    plan = plan_canvas_strokes(traced_paths, canvas_top_left, canvas_size, stroke_widths,
+                               order_time_limit, bridge_gap, simplify_tolerance, work_scale=work_scale)
+    if budget is not None:
+        execute_within_budget(plan, budget)
+    else:
+        execute_plan(plan)
+
+def execute_plan(plan, source=None):
+    """
+    按屏幕笔画计划逐条绘制，根据线条宽度自动切换画笔大小
+    plan: plan_canvas_strokes 返回或从计划文件读取的 StrokePlan
+    source: 计划来源（图像或计划文件路径），记录在进度检查点中
+    返回: 是否绘制完成（未被中断）
+    """
+    return execute_stream([plan], len(plan), plan.num_points, source=source)
+
+def execute_within_budget(plan, budget, source=None):
+    """
+    在时间限制内绘制：按事件代价模型（当前节奏和画笔滑块）预计绘制时间，超出时按重要性
+    （长度 × 宽度 × 覆盖率）选取并简化笔画（time_budget.fit_plan_to_budget），绘制后打印预计与实际用时
+    budget: 时间限制（秒，含开始绘制前的等待）
+    source: 计划来源，记录在进度检查点中
+    返回: 是否绘制完成（未被中断）
+    """
+    model = StrokeCostModel(load_pacing(), load_brush_slider_positions())
+    start = time.perf_counter()
+    fitted, summary = fit_plan_to_budget(plan, budget, model)
+    print(f"⏳ 时间限制 {budget:.1f}s，完整绘制预计 {summary['full_time']:.1f}s")
+    if fitted is not plan:
+        tolerance = summary['tolerance']
+        print(f"✂️ 保留 {len(fitted)}/{len(plan)} 条笔触（重要性 {summary['importance'] * 100:.1f}%），"
+              f"{'简化容差 ' + format(tolerance, 'g') + 'px' if tolerance else '未额外简化'}，"
+              f"预计 {summary['predicted']:.1f}s（选取耗时 {(time.perf_counter() - start) * 1000:.0f}ms）")
+    started = input_backend.now()
+    completed = execute_plan(fitted, source)
+    actual = input_backend.now() - started
+    print(f"⏱️ 预计用时 {summary['predicted']:.1f}s，实际 {actual:.1f}s（{actual - summary['predicted']:+.1f}s）")
+    return completed
+
+def execute_stream(plans, total_paths=None, total_points=None, pacing=None, source=None, select_brush=False,
+                   checkpoint_info=None):
+    """
+    按一批或多批屏幕笔画计划逐条绘制，根据线条宽度自动切换画笔大小
+    每批计划先整体转换为事件时间线（点击画笔滑块、移动、落笔、抬笔及其间隔），
+    交给专用的注入线程按绝对截止时间发出；提取、规划和时间线生成都在注入线程之外进行
+    plans: StrokePlan 的可迭代对象，可以是边提取边规划的 StrokeStream，取到哪批画到哪批
+    total_paths / total_points: 总笔画数和总点数，未知时为 None（只按已绘制数量报告进度）
+    pacing: 事件节奏 Pacing，None 表示按配置目录中的校准结果（calibrate 命令）或默认节奏
+    source: 计划来源（图像或计划文件路径），记录在进度检查点中
+    select_brush: 第一条笔画前总是点击其画笔档位（继续绘制时画笔可能停在任意档位）
+    checkpoint_info: 一并写入检查点的会话信息（如边提取边绘制时跳过的批次数，见 draw_streaming）
+    绘制的每批计划和绘制位置都写入配置目录的检查点，中断后可用 resume_drawing 继续；绘制完成后删除
+    返回: 是否绘制完成（未被中断）
+    """
+    global should_exit, is_paused
+    
+    # 加载已保存的滑块位置（从最细到最粗的画笔坐标）
+    slider_positions = load_brush_slider_positions()
     
+    # 验证加载的位置数量
+    if slider_positions and len(slider_positions) == 5:
+        print("已成功加载5个画笔档位位置，按最细到最粗顺序使用")
+    else:
+        print("警告：未找到有效滑块位置或位置数量不正确")
+        print("请确保brush_slider_positions.txt文件包含5个坐标，顺序为最细到最粗")
+
     # 启动键盘监听，使用非阻塞模式
     print("提示: 按ESC键随时中断绘制过程")
-    listener = keyboard.Listener(on_press=on_press)
-    listener.daemon = True  # 设置为守护进程，主程序结束时自动停止
-    listener.start()
-    
-    # 给监听器一些初始化时间
-    time.sleep(0.1)
+    listener = None
+    if keyboard is not None:
+        listener = keyboard.Listener(on_press=on_press)
+        listener.daemon = True  # 设置为守护进程，主程序结束时自动停止
+        listener.start()
+
+        # 给监听器一些初始化时间
+        time.sleep(0.1)
 
     print("正在绘制... 请等待...")
-    print(f"准备绘制 {len(traced_paths)} 条笔触")
-    time.sleep(1)
+    if total_paths is not None:
+        print(f"准备绘制 {total_paths} 条笔触")
+    else:
+        print("边提取边绘制，笔触总数在提取完成后确定")
+    input_backend.wait(1)
 
-    total_paths = len(traced_paths)
-    drawn_paths = 0
-    total_points = sum(len(path) for path in traced_paths)
-    drawn_points = 0
+    last_reported = [0]
 
-    pen_is_down = False  # 初始状态：笔是抬起的
-    
-    # 为不同粗细线条优化的移动参数（已提速）
-    thin_line_delay = 0.001  # 细线条使用更快的速度
-    medium_line_delay = 0.002  # 中等线条速度
-    thick_line_delay = 0.003  # 粗线条使用更快的速度
-    
-    for path_idx, path in enumerate(traced_paths):
-        if should_exit:
-            break
-            
-        # 检查是否暂停
-        while is_paused:
-            if should_exit:
-                break
-            time.sleep(0.1)
-        if should_exit:
-            break
-            
-        # 获取当前笔画的宽度
-        width = 1  # 默认宽度
-        if stroke_widths and path_idx < len(stroke_widths):
-            width = stroke_widths[path_idx]
-        
-        # 映射宽度到画笔大小档位
-        target_brush_size = map_width_to_brush_size(width)
-        
-        # 切换画笔大小（如果需要）- 优先处理宽度变化
-        if target_brush_size != current_brush_size and slider_positions:
-            print(f"发现线条宽度变化，需要切换画笔大小: 当前{current_brush_size}档 -> 目标{target_brush_size}档")
-            print("正在切换画笔大小")
-            # 确保笔是抬起的状态
-            if pen_is_down:
-                pyautogui.mouseUp(button='left')
-                pen_is_down = False
-                time.sleep(0.02)
-            # 切换画笔大小
-            switch_brush_to_size(target_brush_size, slider_positions)
-            current_brush_size = target_brush_size
-            print(f"画笔大小已切换到档位 {current_brush_size}")
-            # 切换后不立即移动，因为后面会专门移动到绘制起点
-        
-        # 根据线条宽度选择延迟参数
-        if width <= 2:
-            current_delay = thin_line_delay
-            line_type = "极细线条"
-        elif width <= 7:
-            current_delay = medium_line_delay
-            line_type = "中等线条"
-        else:
-            current_delay = thick_line_delay
-            line_type = "粗线条"
-        
-        # 扩展过短路径，确保在画布上可见
-        extended_path = extend_short_path(path, threshold=20, target_length=23)
-        
-        # 如果是点路径（空列表），直接跳过绘制
-        if not extended_path:
-            continue
-        
-        # 转换坐标
-        scaled_path = []
-        for p in extended_path:
-            # 映射到画布坐标
-            x = int(canvas_top_left[0] + offset_x + (p[0] - min_x) * scale_factor)
-            y = int(canvas_top_left[1] + offset_y + (p[1] - min_y) * scale_factor)
-            
-            # 确保坐标在安全范围内
-            x = max(canvas_top_left[0], min(x, canvas_top_left[0] + canvas_width - 1))
-            y = max(canvas_top_left[1], min(y, canvas_top_left[1] + canvas_height - 1))
-            
-            scaled_path.append((x, y))
-        
-        # 输出第一个点的坐标用于调试
-        if path_idx == 0:
-            print(f"第一个绘制点: ({scaled_path[0][0]}, {scaled_path[0][1]})")
-        
-        # 确保笔是抬起的状态 - 加强状态管理
-        if pen_is_down:
-            pyautogui.mouseUp(button='left')  # 明确指定左键抬笔
-            pen_is_down = False
-            time.sleep(0.02)  # 增加延迟确保抬笔完全生效
-        
-        # 确保当前鼠标位置不是在点击状态
-        # 抬笔状态下移动到起点 - 使用更快的移动
-        pyautogui.moveTo(scaled_path[0][0], scaled_path[0][1], duration=0.02)  # 更快移动
-        time.sleep(0.005)  # 减少延迟
-        
-        # 调试信息
-        if path_idx < 5 or path_idx % 50 == 0:
-            print(f"绘制笔触 {path_idx+1}: 点数={len(path)}, 宽度={width}px, 画笔档位={current_brush_size}, 类型={line_type}")
-        
-        # 落笔开始绘制 - 确保只在起点位置进行一次点击
-        pyautogui.mouseDown(button='left')  # 明确指定左键
-        pen_is_down = True
-        time.sleep(0.01)  # 给一个极小延迟确保点击状态稳定
-
-        # 绘制整条路径 - 根据线条类型调整速度（已提速）
-        for x, y in scaled_path[1:]:
-            # 在每次移动前检查是否应该退出
-            if check_exit_condition():
-                break
-                
-            # 检查是否暂停
-            while is_paused:
-                if check_exit_condition():
-                    break
-                time.sleep(0.1)
-            if check_exit_condition():
-                break
-                
-            # 使用更精确的移动方法
-            pyautogui.moveTo(x, y, duration=current_delay*0.3)  # 进一步缩短移动时间
-            drawn_points += 1
-            if drawn_points % 1000 == 0:
-                print(f"已绘制点: {drawn_points}/{total_points}")
-                
-        # 再次检查是否应该退出
-        if check_exit_condition():
-            break
+    def report_progress(drawn_paths, drawn_points):
+        if total_paths is None:
+            if drawn_paths % 50 == 0:
+                print(f"进度: 已绘制 {drawn_paths} 条笔触，{drawn_points} 个点")
+        elif drawn_paths <= total_paths:
+            progress = int(drawn_paths / total_paths * 100)
+            if progress >= last_reported[0] + 5 or drawn_paths == total_paths:
+                last_reported[0] = progress
+                print(f"进度: {progress}% ({drawn_paths}/{total_paths} 条笔触)")
 
-        # 绘制完成，抬笔
-        pyautogui.mouseUp(button='left')
-        pen_is_down = False
-        
-        # 每个笔画之间的等待时间根据线条宽度调整（已大幅缩短）
-        if width <= 2:
-            time.sleep(0.05)  # 细线条之间更短的间隔
-        elif width <= 7:
-            time.sleep(0.08)  # 中等线条更短的间隔
+    builder = TimelineBuilder(slider_positions, pacing or load_pacing())
+    if select_brush:
+        builder.tier = 0
+    checkpoint = DrawingCheckpoint().begin(source, **(checkpoint_info or {}))
+    scheduler = InjectionScheduler(input_backend, should_stop=lambda: should_exit, is_paused=lambda: is_paused,
+                                   progress=report_progress, checkpoint=checkpoint.record,
+                                   checkpoint_interval=checkpoint.interval).start()
+    verifier = None
+    unchecked = []  # 上次截图检查之后绘制的计划
+    try:
+        first = True
+        batches = iter(plans)
+        for plan in batches:
+            first_stroke = checkpoint.add_plan(plan)
+            if should_exit or scheduler.stopped:
+                break
+            if first and len(plan):
+                first = False
+                x, y = plan.strokes.points[0]
+                print(f"第一个绘制点: ({x}, {y})")
+                if verification_options is not None:
+                    verifier = PlanVerifier(plan.canvas_top_left, plan.canvas_size,
+                                            getattr(input_backend, 'screenshot', None), **verification_options)
+                    verifier.capture_baseline()
+            for part in _split_plan(plan, verifier.every if verifier is not None else None):
+                for timeline in builder.build(part, first_stroke):
+                    if not scheduler.submit(timeline):
+                        break
+                first_stroke += len(part)
+                if verifier is not None:
+                    unchecked.append(part)
+                    if verifier.every and sum(len(p) for p in unchecked) >= verifier.every:
+                        verify_and_repair(scheduler, builder, verifier, unchecked)
+                        unchecked = []
         else:
-            time.sleep(0.1)  # 粗线条更短的间隔
-
-        drawn_paths += 1
-        progress = int(drawn_paths / total_paths * 100)
-        if progress % 5 == 0 or drawn_paths == total_paths:
-            print(f"进度: {progress}% ({drawn_paths}/{total_paths} 条笔触)")
+            checkpoint.end_planning()
+        if (should_exit and scheduler.error is None and checkpoint.session is not None
+                and not checkpoint.session['planned'] and isinstance(plans, (list, tuple))):
+            # 按 ESC 中断时已在内存中的其余批次直接写入检查点；边提取边绘制时不等提取完成，
+            # 检查点保持未规划完成，继续绘制时从来源重新规划
+            for plan in batches:
+                checkpoint.add_plan(plan)
+            checkpoint.end_planning()
+        if verifier is not None and unchecked and not should_exit:
+            verify_and_repair(scheduler, builder, verifier, unchecked)
+    finally:
+        try:
+            scheduler.finish()
+        finally:
+            checkpoint.close()
 
-    # 确保停止监听器
-    if hasattr(listener, 'stop'):
-        listener.stop()
-        listener.join(timeout=1.0)  # 等待监听器线程结束
+        # 确保停止监听器
+        if listener is not None and hasattr(listener, 'stop'):
+            listener.stop()
+            listener.join(timeout=1.0)  # 等待监听器线程结束
     
     # 确保鼠标抬起
-    pyautogui.mouseUp()
+    input_backend.up()
+
+    drawn_paths, drawn_points = scheduler.strokes, scheduler.moves
     
     # 根据退出状态显示不同信息
+    completed = not should_exit
     if should_exit:
         print(f"\n🔴 程序已被用户中断！已处理 {drawn_points} 个像素点")
-        print(f"已完成 {drawn_paths}/{total_paths} 条笔触 (约 {int(drawn_paths/total_paths*100)}%)")
+        if total_paths:
+            print(f"已完成 {drawn_paths}/{total_paths} 条笔触 (约 {int(drawn_paths/total_paths*100)}%)")
+        else:
+            print(f"已完成 {drawn_paths} 条笔触")
+        print("💾 绘制进度已保存，可用 resume 子命令（或界面上的“继续上次绘制”）从中断处继续")
     else:
+        checkpoint.clear()
         print(f"\n✅ 绘制完成！总共处理 {drawn_points} 个像素点")
-        print("查看生成的contours_visualization.png和processed_binary.png以检查细节提取效果")
+        if debug_sink.enabled:
+            print(f"查看 {output_path} 中的 processed_binary.png 和 skeleton.png 以检查细节提取效果")
+    scheduler.report()
     
     # 重置退出和暂停标志，确保下次运行正常
     should_exit = False
     is_paused = False
+    return completed
 
-def main(image_path, mode='draw'):
+def build_stroke_pipeline():
+    """
+    把整幅图在内存中的提取和规划组织为按阶段缓存的流水线：
+    decode → threshold → cleaned → skeleton → graph → strokes → routes → canvas → order → plan
+    修改某个参数后重新运行只重算使用该参数的阶段及其下游，例如只改 simplify_tolerance
+    时只重算 plan 阶段，只改 order_time_limit 时重算 order 和 plan 阶段
+    运行时需给出 image_path、canvas_top_left、canvas_size，其余参数默认值与
+    extract_strict_strokes / clean_binary / plan_canvas_strokes 一致
+    返回: StagePipeline，run('plan', ...) 得到与 plan_canvas_strokes 相同的屏幕笔画计划
+    """
+    def decode(image_path, canvas_size, oversample):
+        gray, work_scale = load_working_image(image_path, canvas_size, oversample)
+        if gray is None:
+            raise ValueError(f"无法读取图像: {image_path}")
+        return np.ascontiguousarray(gray), work_scale
+
+    def graph_stage(decoded, cleaned, skeleton, canvas_size, spur_length):
+        # 画布像素阈值换算到工作图像素（与 _extract_in_memory 一致）
+        scale_factor = 1.0
+        if canvas_size:
+            _, _, content_w, content_h = cv2.boundingRect(cleaned)
+            scale_factor = fit_scale_factor(content_w - 1, content_h - 1, canvas_size)
+        return clean_skeleton_graph(trace_skeleton(skeleton[0]), spur_length / scale_factor), scale_factor
+
+    def strokes_stage(decoded, skeleton, graph, tier_min_length):
+        dist_transform, work_scale = skeleton[1], decoded[1]
+
+        def radius_at(xs, ys):
+            return dist_transform[ys, xs] / work_scale
+        return split_by_brush_tier(graph[0], radius_at, graph[1], tier_min_length)
+
+    def canvas_stage(decoded, routes, canvas_top_left, canvas_size, bridge_gap):
+        strokes, stroke_widths = routes
+        return map_strokes_to_canvas(strokes, canvas_top_left, canvas_size, stroke_widths, bridge_gap,
+                                     work_scale=decoded[1])
+
+    def plan_stage(canvas, ordered, canvas_top_left, canvas_size, simplify_tolerance,
+                   short_path_threshold, short_path_target):
+        return finalize_screen_strokes(ordered, canvas_top_left, canvas_size, canvas[1], simplify_tolerance,
+                                       short_path_threshold, short_path_target)
+
+    stages = [
+        Stage('decode', decode, params=('image_path', 'canvas_size', 'oversample'),
+              fingerprint=lambda image_path, **_: (os.stat(image_path).st_mtime_ns, os.stat(image_path).st_size)),
+        Stage('threshold', lambda decoded, threshold: threshold_lines(decoded[0], threshold),
+              inputs=('decode',), params=('threshold',)),
+        Stage('cleaned', lambda binary, **kernels: clean_binary(binary, **kernels)[1],
+              inputs=('threshold',), params=('open_kernel', 'close_kernel', 'filter_kernel')),
+        Stage('skeleton', lambda cleaned, skeleton_backend: skeletonize_with_distance(cleaned, skeleton_backend),
+              inputs=('cleaned',), params=('skeleton_backend',)),
+        Stage('graph', graph_stage, inputs=('decode', 'cleaned', 'skeleton'), params=('canvas_size', 'spur_length')),
+        Stage('strokes', strokes_stage, inputs=('decode', 'skeleton', 'graph'), params=('tier_min_length',)),
+        Stage('routes', lambda split: plan_pen_down_routes(split[0], split[1].widths.tolist()),
+              inputs=('strokes',)),
+        Stage('canvas', canvas_stage, inputs=('decode', 'routes'), params=('canvas_top_left', 'canvas_size', 'bridge_gap')),
+        Stage('order', lambda canvas, order_time_limit: order_canvas_strokes(canvas[0], order_time_limit, canvas[2]),
+              inputs=('canvas',), params=('order_time_limit',)),
+        Stage('plan', plan_stage, inputs=('canvas', 'order'),
+              params=('canvas_top_left', 'canvas_size', 'simplify_tolerance',
+                      'short_path_threshold', 'short_path_target')),
+    ]
+    defaults = {}
+    for func in (extract_strict_strokes, threshold_lines, clean_binary, plan_canvas_strokes):
+        defaults.update(resolved_params(func))
+    names = {param for stage in stages for param in stage.params}
+    return StagePipeline(stages, {name: value for name, value in defaults.items() if name in names})
+
+def tune_plan(image_path, canvas_top_left, canvas_size):
+    """
+    交互式调参：每次输入 name=value 修改参数后只重算受影响的阶段，确认后按当前计划绘制
+    返回: 最后一次生成的计划，退出时返回 None
+    """
+    pipeline = build_stroke_pipeline()
+    params = {'image_path': image_path, 'canvas_top_left': tuple(canvas_top_left), 'canvas_size': tuple(canvas_size)}
+    print("可调参数: " + ", ".join(f"{name}={value!r}" for name, value in pipeline.defaults.items()
+                                   if name not in params))
+    while True:
+        try:
+            plan = pipeline.run('plan', **params)
+        except Exception as e:
+            print(f"❌ 生成计划失败: {e}")
+            plan = None
+        else:
+            print(f"⏱️ 阶段耗时: {pipeline.timing_summary()}")
+            print(f"📋 当前计划: {len(plan)} 条笔触，{plan.num_points} 个鼠标移动事件")
+        command = input("输入 name=value 修改参数（可多个，空格分隔），draw 开始绘制，q 退出: ").strip()
+        if command in ('q', 'quit', 'exit'):
+            return None
+        if command == 'draw' and plan is not None:
+            execute_plan(plan)
+            return plan
+        for item in command.split():
+            name, sep, text = item.partition('=')
+            if not sep or name not in pipeline.defaults:
+                print(f"⚠️ 无法识别的参数: {item}")
+                continue
+            try:
+                params[name] = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                params[name] = text
+
+def main(image_path, mode='draw', use_cache=True, stream=False, budget=None, tile_size=None, memory_limit_mb=None):
     global should_exit, is_paused
     # 重置退出标志，确保每次运行都从头开始
     should_exit = False
@@ -834,9 +1414,8 @@ def main(image_path, mode='draw'):
             # 依次点击每个坐标点
             for i, (x, y) in enumerate(captured_coords):
                 print(f"点击坐标点 {i+1}/{len(captured_coords)}: ({x}, {y})")
-                pyautogui.moveTo(x, y, duration=0.1)
-                pyautogui.click()
-                time.sleep(0.5)  # 点击间隔
+                input_backend.click(x, y)
+                input_backend.wait(0.5)  # 点击间隔
             
             print("✅ 所有坐标点点击完成！")
             return
@@ -845,6 +1424,7 @@ def main(image_path, mode='draw'):
     
     # 默认执行正常的图像绘制流程
     print("🎨 开始正常图像绘制模式")
+    extract_params = tiled_extract_params(tile_size, memory_limit_mb)
     
     # 加载画布坐标
     top_left, size, bottom_right = load_canvas_coordinates()
@@ -858,33 +1438,368 @@ def main(image_path, mode='draw'):
 
     print(f"处理图像: {image_path}")
 
-    # 高效处理图像并提取笔触和宽度信息
-    strokes, binary, stroke_widths = extract_strict_strokes(image_path)
+    if mode == 'tune':
+        tune_plan(image_path, top_left, size)
+        return
 
-    if len(strokes) == 0:
-        print("未找到有效线条！")
+    if budget is not None:
+        # 按时间限制选取笔画需要完整的计划，不边提取边绘制
+        plan = prepare_plan(image_path, top_left, size, use_cache, extract_params)
+        if plan is not None:
+            execute_within_budget(plan, budget, image_path)
         return
 
-    print(f"共生成 {len(strokes)} 条笔触，开始绘制...")
+    # 默认整幅图统一规划（按画笔档位全局分组排序，每档最多切换一次，可用进程池并行提取）；
+    # 边提取边绘制需显式开启，各批分别排序，画笔切换和抬笔更多
+    if stream and extract_params:
+        print("🧩 分块提取时整幅图提取和规划完成后再开始绘制")
+    elif stream:
+        draw_streaming(image_path, top_left, size, use_cache)
+        return
+
+    plan = prepare_plan(image_path, top_left, size, use_cache, extract_params)
+    if plan is None:
+        return
+
+    print(f"共生成 {len(plan)} 条笔触，开始绘制...")
     print("系统将根据线条粗细自动切换画笔大小")
 
-    # 绘制 - strokes已经是高质量的路径，包含宽度信息
-    draw_on_canvas(strokes, top_left, size, stroke_widths)
+    # 绘制
+    execute_plan(plan, image_path)
+
+def draw_streaming(image_path, top_left, size, use_cache=True, skip_batches=0, resumed=None):
+    """
+    边提取边绘制：后台线程按批生成计划（stream_canvas_plans）放入有界队列，绘制逐批取出，
+    总耗时接近 max(提取规划, 绘制) 而不是两者之和；完整绘制后把各批拼接写入笔画计划缓存
+    skip_batches / resumed: 继续中断的绘制时，跳过已保存的前若干批，先画 resumed（检查点中
+                            已保存但没画完的部分），再画其余批次；此时不读写缓存
+    检查点记录跳过的批次数（stream_skip）和开头非流式的批次数（stream_prefix），
+    再次中断时据此算出已保存到第几批
+    返回: 是否绘制完成
+    """
+    if skip_batches or resumed is not None:
+        use_cache = False
+    cache = PlanCache(os.path.join(config_path, 'plan_cache')) if use_cache else None
+    if cache is not None:
+        cache_key = cache.key(image_path, {'stream': resolved_params(stream_canvas_plans)}, top_left, size)
+        plan = cache.get(cache_key)
+        if plan is not None:
+            print(f"⚡ 命中笔画计划缓存: {len(plan)} 条笔触，跳过图像处理")
+            return execute_plan(plan, image_path)
+
+    start = time.perf_counter()
+    start_point = tuple(resumed.strokes.points[-1]) if resumed is not None and len(resumed) else None
+    stream = StrokeStream(stream_canvas_plans(image_path, top_left, size, skip_batches=skip_batches,
+                                              start_point=start_point)).start()
+    batches = []
+
+    def collect():
+        if resumed is not None:
+            yield resumed
+        for plan in stream:
+            if not batches:
+                print(f"⏱️ 首批笔画就绪: {(time.perf_counter() - start) * 1000:.0f}ms")
+            batches.append(plan)
+            yield plan
+
+    try:
+        completed = execute_stream(collect(), source=image_path, select_brush=resumed is not None,
+                                   checkpoint_info={'stream_skip': skip_batches,
+                                                    'stream_prefix': int(resumed is not None)})
+    finally:
+        stream.close()
+    print(f"⏱️ 总耗时 {time.perf_counter() - start:.1f}s，其中绘制等待提取 {stream.wait_time:.1f}s")
+    if not batches and resumed is None:
+        print("未找到有效线条！")
+    elif completed and stream.finished and cache is not None:
+        cache.put(cache_key, StrokePlan.concatenate(batches))
+    return completed
+
+def prepare_plan(image_path, top_left, size, use_cache=True, extract_params=None, plan_params=None):
+    """
+    提取笔画并生成屏幕笔画计划，先查笔画计划缓存：同一图像、参数和画布位置再次绘制时跳过提取和规划
+    extract_params / plan_params: 传给 extract_strict_strokes / plan_canvas_strokes 的关键字参数，
+                                  与其余参数的默认值一起计入缓存键
+    返回: StrokePlan，没有有效线条时返回 None
+    """
+    extract_params = dict(extract_params or {})
+    plan_params = dict(plan_params or {})
+    cache = PlanCache(os.path.join(config_path, 'plan_cache')) if use_cache else None
+    plan = None
+    if cache is not None:
+        params = {'extract': resolved_params(extract_strict_strokes, **extract_params),
+                  'plan': resolved_params(plan_canvas_strokes, **plan_params)}
+        cache_key = cache.key(image_path, params, top_left, size)
+        plan = cache.get(cache_key)
+        if plan is not None:
+            print(f"⚡ 命中笔画计划缓存: {len(plan)} 条笔触，跳过图像处理")
+
+    if plan is None:
+        # 高效处理图像并提取笔触和宽度信息
+        strokes, binary, stroke_widths, graph, work_scale = extract_strict_strokes(image_path, canvas_size=size,
+                                                                                   **extract_params)
+
+        if len(strokes) == 0:
+            print("未找到有效线条！")
+            return None
+
+        # 同一连通分量内的笔画合并为尽量少的连续路线，减少抬笔
+        strokes, stroke_widths = plan_pen_down_routes(graph, stroke_widths)
+
+        # 生成屏幕笔画计划 - strokes已经是高质量的路径，包含宽度信息
+        plan = plan_canvas_strokes(strokes, top_left, size, stroke_widths, work_scale=work_scale, **plan_params)
+        if cache is not None:
+            cache.put(cache_key, plan)
+    return plan
+
+def tiled_extract_params(tile_size=None, memory_limit_mb=None):
+    """
+    分块提取的 extract_strict_strokes 参数（见 tiled_skeleton），两项都为 None 时为空字典（整图提取）
+    """
+    params = {}
+    if tile_size is not None:
+        params['tile_size'] = tile_size
+    if memory_limit_mb is not None:
+        params['memory_limit_mb'] = memory_limit_mb
+    return params
+
+def plan_to_file(image_path, output_file, canvas=None, use_cache=True, tile_size=None, memory_limit_mb=None):
+    """
+    只生成笔画计划并写入计划文件，不绘制（可在另一台机器上用 execute 执行）
+    canvas: (x, y, width, height)，None 表示使用已保存的画布坐标
+    tile_size / memory_limit_mb: 分块提取的分块边长或单个分块的内存预算，见 extract_strict_strokes
+    """
+    image_path = os.path.abspath(image_path)
+    if canvas is not None:
+        top_left, size = tuple(canvas[:2]), tuple(canvas[2:])
+    else:
+        top_left, size, _ = load_canvas_coordinates()
+        if not top_left:
+            print("错误：未找到画布坐标！请用 --canvas X Y W H 指定")
+            return None
+    if not os.path.exists(image_path):
+        print(f"错误：图片不存在！路径：{image_path}")
+        return None
+
+    plan = prepare_plan(image_path, top_left, size, use_cache, tiled_extract_params(tile_size, memory_limit_mb))
+    if plan is None:
+        return None
+    plan.save(output_file)
+    print(f"💾 笔画计划已保存: {output_file}（{len(plan)} 条笔触，{plan.num_points} 个点，"
+          f"{os.path.getsize(output_file) / 1024:.1f} KB）")
+    return plan
+
+def execute_plan_file(plan_file):
+    """读取计划文件并绘制，当前画布与计划画布不同时先映射到当前画布"""
+    global should_exit, is_paused
+    should_exit = False
+    is_paused = False
+
+    start = time.perf_counter()
+    plan = open_plan(plan_file).to_plan()
+    print(f"📂 已加载笔画计划: {len(plan)} 条笔触，{plan.num_points} 个点，"
+          f"耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    top_left, size, _ = load_canvas_coordinates()
+    if top_left:
+        plan = fit_plan_to_canvas(plan, top_left, size)
+    else:
+        print(f"⚠️ 未找到画布坐标，按计划中的画布位置 {plan.canvas_top_left} 绘制")
+    execute_plan(plan, os.path.abspath(plan_file))
+
+def resume_drawing(verify=False):
+    """
+    从上次中断的位置继续绘制（进度检查点见 checkpoint.DrawingCheckpoint），不重新处理图像
+    中断在笔画中间时从该笔画最后画出的点接着画；边提取边绘制时中断（笔画计划尚未全部生成），
+    画完已保存的批次后从原图重新规划，跳过已保存的批次（批次划分只取决于图像和画布）
+    verify: 继续前截图检查已画出的部分，缺失的片段先补画
+    返回: 是否绘制完成，没有可继续的绘制时为 None
+    """
+    global should_exit, is_paused
+    should_exit = False
+    is_paused = False
+
+    saved = load_checkpoint()
+    if saved is None:
+        print("没有可以继续的绘制进度")
+        return None
+    source = saved.source
+    top_left, size, _ = load_canvas_coordinates()
+    replan = False
+    if not saved.planned:
+        replan = bool(top_left and source and os.path.exists(source) and not source.endswith('.xcplan'))
+        if replan:
+            print("⚠️ 中断时笔画计划尚未全部生成，画完已保存的部分后从原图规划其余批次")
+        else:
+            print("⚠️ 中断时笔画计划尚未全部生成，只能继续已保存的部分")
+
+    if top_left:
+        saved.plan = fit_plan_to_canvas(saved.plan, top_left, size)
+    print(f"📂 继续绘制 {source or '上次的计划'}：已完成 {saved.stroke}/{len(saved.plan)} 条笔触"
+          + (f"，第 {saved.stroke + 1} 条已画 {saved.point} 个点" if saved.point else ""))
+
+    plans = []
+    drawn = saved.drawn_plan()
+    if verify and len(drawn):
+        verifier = PlanVerifier(drawn.canvas_top_left, drawn.canvas_size, getattr(input_backend, 'screenshot', None),
+                                **(verification_options or {}))
+        start = time.perf_counter()
+        repair, missing = verifier.repair_plan(drawn)
+        print(f"🔍 截图检查已绘制的 {len(drawn)} 条笔触: 缺失 {missing * 100:.2f}%，"
+              f"{'先补画 ' + str(len(repair)) + ' 段' if len(repair) else '无需补画'}"
+              f"（检查耗时 {(time.perf_counter() - start) * 1000:.0f}ms）")
+        if len(repair):
+            plans.append(repair)
+    remaining = saved.remaining_plan()
+    if len(remaining):
+        plans.append(remaining)
+    if replan:
+        # 已保存的批次中除开头非流式的批次外都来自 stream_canvas_plans
+        info = saved.info
+        skip = int(info.get('stream_skip', 0)) + max(0, int(info['batches']) - int(info.get('stream_prefix', 0)))
+        resumed = StrokePlan.concatenate(plans) if plans else None
+        return draw_streaming(source, top_left, size, skip_batches=skip, resumed=resumed)
+    if not plans:
+        print("✅ 上次的绘制已经完成")
+        DrawingCheckpoint().clear()
+        return True
+    return execute_stream(plans, sum(len(p) for p in plans), sum(p.num_points for p in plans), source=source,
+                          select_brush=True)
+
+def _split_plan(plan, size):
+    """按绘制顺序把计划切成每段最多 size 条笔触（size 为 None 时不切分）"""
+    if not size or len(plan) <= size:
+        return [plan]
+    return [StrokePlan(plan.strokes.select(slice(start, start + size)), plan.canvas_top_left, plan.canvas_size,
+                       plan.scale_factor, plan.tier_bounds) for start in range(0, len(plan), size)]
+
+def verify_and_repair(scheduler, builder, verifier, plans):
+    """
+    等这些计划绘制完成后截图检查，只把缺失的片段作为补画计划交给注入线程；
+    补画后再检查补画部分，最多 verifier.max_rounds 轮
+    返回: 最后一次检查的缺失比例
+    """
+    checked = StrokePlan.concatenate(plans)
+    for round_index in range(verifier.max_rounds + 1):
+        scheduler.wait_idle()
+        if scheduler.stopped:
+            return None
+        input_backend.wait(verifier.settle)
+        start = time.perf_counter()
+        repair, missing = verifier.repair_plan(checked)
+        print(f"🔍 截图检查 {len(checked)} 条笔触: 缺失 {missing * 100:.2f}%，"
+              f"{'需补画 ' + str(len(repair)) + ' 段' if len(repair) else '无需补画'}"
+              f"（检查耗时 {(time.perf_counter() - start) * 1000:.0f}ms）")
+        if not len(repair) or round_index == verifier.max_rounds:
+            return missing
+        for timeline in builder.build(repair):
+            if not scheduler.submit(timeline):
+                return missing
+        checked = repair
+    return missing
+
+def calibrate_timing(trials=2, margin=1.5, names=None):
+    """
+    在已保存的画布上画测试笔画并截图检查，校准落笔、抬笔、移动间隔和切换画笔的等待时间，
+    结果保存到配置目录，之后绘制时自动使用
+    trials: 每个候选值的重复次数
+    margin: 结果的余量倍数
+    names: 要校准的参数名列表，None 表示全部
+    画布上的测试方格用完时只保存已完成的各项，其余各项保留之前的校准结果（或默认值）
+    返回: 校准结果 {参数名: 秒}，没有画布坐标时为 None
+    """
+    top_left, size, _ = load_canvas_coordinates()
+    if not top_left:
+        print("❌ 请先检测并保存画布坐标后再校准")
+        return None
+    print("⚠️ 校准会在画布上画测试笔画，请先切换到空白画布，完成后清空画布")
+    input_backend.wait(3)
+    calibrator = Calibrator(input_backend, top_left, size, load_brush_slider_positions(), trials=trials,
+                            margin=margin)
+    profile = calibrator.run(names)
+    if profile:
+        save_timing_profile(dict(load_timing_profile() or {}, **profile), backend=getattr(input_backend, 'name', ''), canvas=[*top_left, *size],
+                            calibrated_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+    return profile
 
 if __name__ == "__main__":
     # 从命令行参数获取图像路径（仅在直接运行时使用）
     parser = argparse.ArgumentParser(description='高精细度一笔画绘制')
-    parser.add_argument('-i', '--image', required=True, help='输入图像路径')
-    parser.add_argument('-m', '--mode', choices=['draw', 'click'], default='draw', 
-                        help='运行模式: draw-绘制图像, click-点击坐标点 (默认: draw)')
+    parser.add_argument('-i', '--image', help='输入图像路径')
+    parser.add_argument('-m', '--mode', choices=['draw', 'click', 'tune'], default='draw', 
+                        help='运行模式: draw-绘制图像, click-点击坐标点, tune-交互式调参后绘制 (默认: draw)')
+    parser.add_argument('--no-cache', action='store_true', help='不读写笔画计划缓存，总是重新处理图像')
+    parser.add_argument('--stream', action='store_true',
+                        help='边提取边绘制：按连通分量分批，首批就绪即开始绘制；各批分别排序、不使用进程池，'
+                             '画笔切换和抬笔比整幅图统一规划多，只有一个连通分量的图像不分批')
+    parser.add_argument('--input-backend', choices=list(INPUT_BACKENDS) + ['simulated'],
+                        help='鼠标输入后端（默认: pyautogui，或 XICHA_INPUT_BACKEND 环境变量指定）；'
+                             'simulated 不操作真实鼠标，把笔画画到内存中的模拟画布，结束时保存图像并报告事件统计')
+    parser.add_argument('--debug-artifacts', action='store_true',
+                        help='输出调试中间结果（processed_binary.png、skeleton.png 等），在后台线程写入')
+    parser.add_argument('--verify', action='store_true', help='绘制后截图检查，只补画缺失的部分')
+    parser.add_argument('--verify-every', type=int, metavar='N', help='每绘制 N 条笔触截图检查一次（隐含 --verify）')
+    parser.add_argument('--tile-size', type=int, metavar='PX',
+                        help='分块提取超大图像，指定分块核心区边长（像素）；分块时不边提取边绘制')
+    parser.add_argument('--memory-limit-mb', type=float, metavar='MB',
+                        help='分块提取超大图像，按单个分块的内存预算推算分块边长；'
+                             '与骨架像素数成正比的输出（骨架图、宽度、笔画）不计入预算；'
+                             '只有 .npy 灰度图按条带读取，PNG/JPEG 整幅解码不受预算约束')
+    parser.add_argument('--budget', type=float, metavar='SECONDS',
+                        help='绘制时间限制（秒）：预计超时时按重要性选取并简化笔画，结束后打印预计与实际用时')
+    subparsers = parser.add_subparsers(dest='command', help='不指定子命令时按 -m 模式处理图像并绘制')
+    plan_parser = subparsers.add_parser('plan', help='只生成笔画计划文件，不绘制')
+    plan_parser.add_argument('-i', '--image', required=True, help='输入图像路径')
+    plan_parser.add_argument('-o', '--output', help='计划文件路径（默认: 图像同名 .xcplan）')
+    plan_parser.add_argument('--canvas', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+                             help='画布左上角和尺寸（默认: 使用已保存的画布坐标）')
+    execute_parser = subparsers.add_parser('execute', help='按计划文件绘制，跳过图像处理')
+    execute_parser.add_argument('plan_file', help='计划文件路径')
+    calibrate_parser = subparsers.add_parser('calibrate', help='在画布上画测试笔画，校准各项等待时间并保存')
+    calibrate_parser.add_argument('--trials', type=int, default=2, help='每个候选值的重复次数')
+    calibrate_parser.add_argument('--margin', type=float, default=1.5, help='结果的余量倍数')
+    calibrate_parser.add_argument('--only', nargs='+', choices=list(CALIBRATION_RANGES), help='只校准指定参数')
+    resume_parser = subparsers.add_parser('resume', help='从上次中断（ESC、异常或关闭窗口）的位置继续绘制')
+    resume_parser.add_argument('--verify', action='store_true', dest='verify_drawn',
+                               help='继续前截图检查已画出的部分，缺失的片段先补画')
     args = parser.parse_args()
+    if args.debug_artifacts:
+        debug_sink.enabled = True
+    if args.verify or args.verify_every:
+        set_verification(every=args.verify_every)
+    if args.input_backend == 'simulated':
+        set_input_backend(SimulatedCanvasBackend.from_config())
+    elif args.input_backend:
+        set_input_backend(args.input_backend)
+    if args.command is None and not args.image:
+        parser.error('需要 -i/--image，或使用 plan / execute / calibrate / resume 子命令')
     
     try:
-        main(args.image, args.mode)
+        if args.command == 'plan':
+            output_file = args.output or os.path.splitext(args.image)[0] + '.xcplan'
+            plan_to_file(args.image, output_file, args.canvas, use_cache=not args.no_cache,
+                         tile_size=args.tile_size, memory_limit_mb=args.memory_limit_mb)
+        elif args.command == 'execute':
+            execute_plan_file(args.plan_file)
+        elif args.command == 'calibrate':
+            calibrate_timing(args.trials, args.margin, args.only)
+        elif args.command == 'resume':
+            resume_drawing(args.verify_drawn)
+        else:
+            main(args.image, args.mode, use_cache=not args.no_cache, stream=args.stream, budget=args.budget,
+                 tile_size=args.tile_size, memory_limit_mb=args.memory_limit_mb)
     except KeyboardInterrupt:
         print("\n程序被中断")
     except Exception as e:
         print(f"错误: {e}")
     finally:
-        pyautogui.mouseUp()
+        if input_backend is not None:
+            input_backend.up()
+        if isinstance(input_backend, SimulatedCanvasBackend):
+            simulated_file = os.path.join(output_path, 'simulated_canvas.png')
+            input_backend.save(simulated_file)
+            input_backend.report()
+            print(f"🖼️ 模拟画布已保存: {simulated_file}")
+        # 等待后台线程写完调试中间结果
+        debug_sink.flush(timeout=10)
         print("程序结束")
\ No newline at end of file
@@ -1,17 +1,39 @@
-import pyautogui
 import time
 from .keyboard_handler import KeyboardHandler
+from .input_backends import get_input_backend
+from .calibration import load_pacing
+from .stroke_set import StrokeSet
+from .stroke_order import order_strokes, apply_order, pen_up_distance
 
 class Drawer:
     """绘制器，用于实际执行绘制操作"""
     
-    def __init__(self):
-        self.keyboard_handler = KeyboardHandler()
-        # 配置pyautogui
-        pyautogui.FAILSAFE = False
-        pyautogui.PAUSE = 0.001  # 极小延迟，提升绘制速度
+    def __init__(self, input_backend=None, pacing=None):
+        """
+        Args:
+            input_backend: 输入后端，None 表示默认后端（pyautogui，或 XICHA_INPUT_BACKEND 指定）
+            pacing: 事件节奏 Pacing，None 表示第一次绘制时按校准结果（calibrate 命令）或默认节奏
+        """
+        self._input_backend = input_backend
+        self._pacing = pacing
+        self.keyboard_handler = KeyboardHandler(input_backend)
+
+    @property
+    def input_backend(self):
+        """输入后端，未指定时在第一次使用时取默认后端"""
+        if self._input_backend is None:
+            self._input_backend = get_input_backend()
+        return self._input_backend
+
+    @property
+    def pacing(self):
+        """事件节奏，与注入调度器使用同一份校准结果（只读取一次）"""
+        if self._pacing is None:
+            self._pacing = load_pacing()
+        return self._pacing
     
-    def draw_on_canvas(self, traced_paths, canvas_top_left, canvas_size, stroke_widths=None, scale_factor=1.0):
+    def draw_on_canvas(self, traced_paths, canvas_top_left, canvas_size, stroke_widths=None, scale_factor=1.0,
+                       order_time_limit=0.5):
         """
         在画布上绘制路径
         
@@ -21,7 +43,11 @@ class Drawer:
             canvas_size: 画布大小 (width, height)
             stroke_widths: 对应的笔触宽度列表
             scale_factor: 缩放因子
+            order_time_limit: 笔画顺序局部改进的时间限制（秒），None 表示保持原顺序
         """
+        pacing = self.pacing
+        wait = self.input_backend.wait
+
         # 启动键盘监听器
         self.keyboard_handler.start_listener()
         
@@ -31,13 +57,26 @@ class Drawer:
             canvas_center_y = canvas_top_left[1] + canvas_size[1] // 2
             
             # 先将鼠标移动到画布中心
-            pyautogui.moveTo(canvas_center_x, canvas_center_y)
-            time.sleep(0.5)
+            self.input_backend.move(canvas_center_x, canvas_center_y)
+            wait(0.5)
             
             # 如果没有提供笔触宽度，使用默认值
             if stroke_widths is None:
                 stroke_widths = [1.0] * len(traced_paths)
             
+            # 从画布中心出发，选择笔画顺序和方向以缩短抬笔移动
+            if order_time_limit is not None and traced_paths:
+                start_point = ((canvas_center_x - canvas_top_left[0]) / scale_factor,
+                               (canvas_center_y - canvas_top_left[1]) / scale_factor)
+                before = pen_up_distance(traced_paths, start_point) * scale_factor
+                order, reverse = order_strokes(traced_paths, start_point, time_limit=order_time_limit)
+                traced_paths, stroke_widths = apply_order(traced_paths, order, reverse, stroke_widths)
+                after = pen_up_distance(traced_paths, start_point) * scale_factor
+                print(f"🧭 抬笔移动距离: {before:.0f}px -> {after:.0f}px")
+            
+            # 抬笔后的等待按线宽取（与注入调度器的时间线一致）
+            stroke_gaps = pacing.stroke_gap(stroke_widths) if traced_paths else []
+
             # 遍历所有路径
             for i, path in enumerate(traced_paths):
                 if self.keyboard_handler.check_exit_condition():
@@ -59,37 +98,43 @@ class Drawer:
                 
                 # 绘制路径
                 if scaled_path:
+                    # 每段移动后的间隔：有速度规划时按曲率和线段长度分配
+                    if pacing.velocity is not None:
+                        intervals = pacing.velocity.intervals(StrokeSet.from_paths([scaled_path])).tolist()
+                    else:
+                        intervals = [pacing.move_interval] * len(scaled_path)
+
                     # 移动到路径的起点
-                    pyautogui.moveTo(scaled_path[0][0], scaled_path[0][1])
-                    time.sleep(0.01)
+                    self.input_backend.move(scaled_path[0][0], scaled_path[0][1])
+                    wait(pacing.travel_settle)
                     
                     # 按下鼠标左键
-                    pyautogui.mouseDown()
-                    time.sleep(0.01)
+                    self.input_backend.down()
+                    wait(pacing.down_settle)
                     
                     # 绘制路径的每个点
                     for j, (x, y) in enumerate(scaled_path[1:]):
                         if self.keyboard_handler.check_exit_condition():
-                            pyautogui.mouseUp()
+                            self.input_backend.up()
                             break
                         
                         # 等待直到绘制继续（如果暂停）
                         while self.keyboard_handler.check_pause_condition():
                             if self.keyboard_handler.check_exit_condition():
-                                pyautogui.mouseUp()
+                                self.input_backend.up()
                                 break
                             time.sleep(0.1)
                         
                         # 移动到下一个点
-                        pyautogui.moveTo(x, y)
-                        time.sleep(0.001)
+                        self.input_backend.move(x, y)
+                        wait(intervals[j + 1])
                     
                     # 释放鼠标左键
-                    pyautogui.mouseUp()
-                    time.sleep(0.01)
+                    self.input_backend.up()
+                    wait(stroke_gaps[i])
             
         finally:
             # 停止键盘监听器
             self.keyboard_handler.stop_listener()
             # 确保鼠标按键已释放
-            pyautogui.mouseUp()
\ No newline at end of file
+            self.input_backend.up()
\ No newline at end of file
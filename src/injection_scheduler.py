@@ -0,0 +1,438 @@
+import sys
+import time
+import queue
+import threading
+from array import array
+import numpy as np
+from .velocity_profile import VelocityProfile
+
+# 事件类型
+MOVE, DOWN, UP, CLICK, FLUSH = range(5)
+
+# 队列结束标记
+_DONE = object()
+
+
+class Pacing:
+    """
+    事件节奏：每类事件之后到下一个事件的名义间隔（秒），默认值与原先绘制循环中的 sleep 一致
+    """
+
+    def __init__(self, move_interval=0.001, travel_settle=0.005, down_settle=0.01, brush_settle=0.2,
+                 stroke_gaps=((2, 0.05), (7, 0.08), (None, 0.1)), velocity=None):
+        """
+        Args:
+            move_interval: 笔画内相邻移动事件的间隔（未指定 velocity 时使用）
+            travel_settle: 抬笔移动到笔画起点后、落笔前的等待
+            down_settle: 落笔后、开始移动前的等待
+            brush_settle: 点击画笔滑块后的等待
+            stroke_gaps: 抬笔后到下一条笔画的等待，按线宽分段 ((宽度上限, 秒), ...)，最后一段上限为 None
+            velocity: VelocityProfile，按曲率和线段长度为每段移动分配间隔，None 表示固定间隔
+        """
+        self.move_interval = move_interval
+        self.travel_settle = travel_settle
+        self.down_settle = down_settle
+        self.brush_settle = brush_settle
+        self.stroke_gaps = tuple(stroke_gaps)
+        self.velocity = velocity
+
+    def stroke_gap(self, widths):
+        """每条笔画抬笔后的等待（向量化）"""
+        widths = np.asarray(widths)
+        gaps = np.full(len(widths), self.stroke_gaps[-1][1], dtype=np.float64)
+        assigned = np.zeros(len(widths), dtype=bool)
+        for limit, seconds in self.stroke_gaps[:-1]:
+            hit = ~assigned & (widths <= limit)
+            gaps[hit] = seconds
+            assigned |= hit
+        return gaps
+
+
+def default_pacing():
+    """绘制使用的默认节奏：笔画内移动按速度规划分配间隔"""
+    return Pacing(velocity=VelocityProfile())
+
+
+class EventTimeline:
+    """
+    一段事件时间线：事件类型、坐标，以及每个事件之后到下一个事件的间隔
+
+    注入线程按 上一个事件的截止时间 + 间隔 得到每个事件的绝对截止时间（单调时钟），
+    误差不会沿时间线累积。
+    """
+
+    def __init__(self, kinds, xs, ys, gaps, num_strokes=0, stroke_ids=None):
+        self.kinds = kinds
+        self.xs = xs
+        self.ys = ys
+        self.gaps = gaps
+        self.num_strokes = num_strokes
+        # 每条笔画在整个绘制会话中的序号（按抬笔顺序），None 表示不计入进度检查点（如补画）
+        self.stroke_ids = stroke_ids
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def duration(self):
+        """按名义节奏执行这段时间线所需的时间（秒）"""
+        return float(self.gaps.sum())
+
+
+class TimelineBuilder:
+    """
+    把屏幕笔画计划转换为事件时间线（整段向量化生成，不逐点循环）
+
+    每条笔画依次为：[档位变化时点击画笔滑块] → 移动到起点 → flush → 落笔 → 逐点移动 → 抬笔。
+    跨批次保持当前画笔档位，边提取边绘制时各批连续衔接。
+    """
+
+    def __init__(self, slider_positions=None, pacing=None, chunk_points=20000):
+        """
+        Args:
+            slider_positions: 画笔滑块 5 个档位的屏幕坐标，None 表示不切换画笔
+            pacing: Pacing，None 表示默认节奏
+            chunk_points: 每段时间线最多包含的点数，超大计划按笔画切成多段依次提交
+        """
+        self.slider_positions = (np.asarray(slider_positions, dtype=np.int32)
+                                 if slider_positions and len(slider_positions) >= 5 else None)
+        self.pacing = pacing or Pacing()
+        self.chunk_points = chunk_points
+        self.tier = 1
+
+    def build(self, plan, first_stroke=None):
+        """
+        Args:
+            plan: StrokePlan
+            first_stroke: 计划第一条笔画在绘制会话中的序号，用于记录进度检查点；None 表示不记录
+
+        Yields:
+            EventTimeline
+        """
+        strokes = plan.strokes
+        if len(strokes) == 0:
+            return
+        ends = np.searchsorted(strokes.offsets, np.arange(self.chunk_points, strokes.num_points,
+                                                          self.chunk_points), side='right') - 1
+        bounds = np.unique(np.concatenate([[0], ends, [len(strokes)]]))
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            part = strokes if (start, stop) == (0, len(strokes)) else strokes.select(slice(start, stop))
+            if part.num_points:
+                yield self._build(part, plan.tier_bounds, None if first_stroke is None else first_stroke + start)
+
+    def _build(self, strokes, tier_bounds, first_stroke=None):
+        pacing = self.pacing
+        stroke_ids = None
+        if first_stroke is not None:
+            stroke_ids = first_stroke + np.nonzero(strokes.lengths > 0)[0]
+        if (strokes.lengths == 0).any():
+            strokes = strokes.filter_short(1)
+        n = len(strokes)
+        lengths = strokes.lengths
+        # 与 map_width_to_brush_size 相同，按线宽和档位表决定画笔档位
+        if strokes.widths is not None:
+            widths = np.asarray(strokes.widths)
+            tiers = np.searchsorted(tier_bounds, widths, side='left') + 1
+        else:
+            widths = np.ones(n, dtype=np.int64)
+            tiers = np.asarray(strokes.tiers) if strokes.tiers is not None else np.ones(n, dtype=np.int64)
+
+        switch = np.zeros(n, dtype=bool)
+        if self.slider_positions is not None:
+            switch = tiers != np.concatenate([[self.tier], tiers[:-1]])
+            self.tier = int(tiers[-1])
+
+        # 每条笔画的事件数：[点击滑块] + 移动到起点 + flush + 落笔 + (点数 - 1) 个移动 + 抬笔
+        counts = lengths + 3 + switch
+        base = np.zeros(n, dtype=np.int64)
+        np.cumsum(counts[:-1], out=base[1:])
+        total = int(counts.sum())
+        kinds = np.full(total, MOVE, dtype=np.uint8)
+        xs = np.zeros(total, dtype=np.int32)
+        ys = np.zeros(total, dtype=np.int32)
+        gaps = np.full(total, pacing.move_interval, dtype=np.float64)
+
+        points = strokes.points
+        starts = strokes.offsets[:-1]
+        first = points[starts]
+        if switch.any():
+            index = base[switch]
+            kinds[index] = CLICK
+            slider = self.slider_positions[np.clip(tiers[switch] - 1, 0, 4)]
+            xs[index], ys[index] = slider[:, 0], slider[:, 1]
+            gaps[index] = pacing.brush_settle
+
+        travel = base + switch
+        kinds[travel] = MOVE
+        gaps[travel] = 0.0
+        kinds[travel + 1] = FLUSH
+        gaps[travel + 1] = pacing.travel_settle
+        kinds[travel + 2] = DOWN
+        gaps[travel + 2] = pacing.down_settle
+        for index in (travel, travel + 1, travel + 2):
+            xs[index], ys[index] = first[:, 0], first[:, 1]
+
+        # 笔画内第 2 个点起的移动事件
+        rest = np.ones(len(points), dtype=bool)
+        rest[starts] = False
+        point_index = np.nonzero(rest)[0]
+        stroke_of_point = np.repeat(np.arange(n), lengths)[point_index]
+        event_index = point_index - starts[stroke_of_point] - 1 + travel[stroke_of_point] + 3
+        xs[event_index], ys[event_index] = points[point_index, 0], points[point_index, 1]
+        if pacing.velocity is not None:
+            gaps[event_index] = pacing.velocity.intervals(strokes)[point_index]
+
+        up = travel + lengths + 2
+        kinds[up] = UP
+        xs[up], ys[up] = points[strokes.offsets[1:] - 1, 0], points[strokes.offsets[1:] - 1, 1]
+        gaps[up] = pacing.stroke_gap(widths)
+        return EventTimeline(kinds, xs, ys, gaps, n, stroke_ids)
+
+
+def default_spin_threshold():
+    """
+    混合等待中改为自旋的剩余时间阈值（秒）
+    Windows 默认计时器精度约 1~15ms，其余系统的 sleep 误差通常在 0.1ms 以内
+    """
+    return 0.002 if sys.platform.startswith('win') else 0.0003
+
+
+class InjectionScheduler:
+    """
+    按绝对截止时间注入事件的专用线程
+
+    提交的时间线放入有界队列，注入线程逐个事件等待到截止时间：剩余时间大于
+    spin_threshold 时先 sleep，之后自旋（期间 sleep(0) 让出 GIL）到截止时间再调用输入后端。
+    截止时间由单调时钟 time.perf_counter 和名义间隔累加得到，单次延迟不会累积到后续事件；
+    暂停、队列断供或延迟超过 max_lag 时以当前时刻重新对齐。规划线程只负责生成时间线，
+    注入期间缩短解释器的线程切换间隔，规划中的纯 Python 计算不会长时间占用 GIL。
+    """
+
+    def __init__(self, backend, max_pending=8, spin_threshold=None, max_lag=0.05, should_stop=None,
+                 is_paused=None, progress=None, switch_interval=0.0005, checkpoint=None, checkpoint_interval=0.5):
+        """
+        Args:
+            backend: InputBackend
+            max_pending: 队列中最多等待的时间线段数
+            spin_threshold: 剩余时间小于该值（秒）时自旋等待，None 表示按平台取默认值
+            max_lag: 延迟超过该值（秒）时重新对齐，避免之后的事件集中补发
+            should_stop: 返回是否中止的函数（如 ESC）
+            is_paused: 返回是否暂停的函数（如空格）
+            progress: 每条笔画抬笔后调用 progress(已完成笔画数, 已注入移动数)
+            switch_interval: 注入期间的 sys.setswitchinterval（秒），None 表示不修改
+            checkpoint: 记录绘制位置的函数 checkpoint(笔画序号, 该笔画已画出的点数)，按时间线的
+                stroke_ids 计数；至多每 checkpoint_interval 秒调用一次，注入结束时再调用一次
+            checkpoint_interval: 记录绘制位置的最短间隔（秒）
+        """
+        self.backend = backend
+        self.spin_threshold = default_spin_threshold() if spin_threshold is None else spin_threshold
+        self.max_lag = max_lag
+        self.should_stop = should_stop or (lambda: False)
+        self.is_paused = is_paused or (lambda: False)
+        self.progress = progress
+        self.switch_interval = switch_interval
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        # 模拟后端（realtime 为 False）按其模拟时钟推进，不真正等待
+        self._now = time.perf_counter if backend.realtime else backend.now
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._thread = threading.Thread(target=self._run, name='injector', daemon=True)
+        self._saved_switch_interval = None
+        self.lateness = array('d')
+        self.submitted = 0
+        self.events = 0
+        self.moves = 0
+        self.strokes = 0
+        self.realigns = 0
+        self.starved = 0
+        self.stopped = False
+        self.error = None
+        self.nominal_time = 0.0
+        self.active_time = 0.0
+        # 绘制位置：序号小于 position[0] 的笔画已画完，第 position[0] 条已画出前 position[1] 个点
+        self.position = None
+
+    def start(self):
+        self.backend.set_external_pacing(True)
+        if self.switch_interval is not None:
+            self._saved_switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(self.switch_interval)
+        self._thread.start()
+        return self
+
+    def submit(self, timeline):
+        """
+        提交一段时间线（队列满时等待）
+
+        Returns:
+            False 表示注入已中止，不必再提交
+        """
+        while not self.stopped:
+            try:
+                self._queue.put(timeline, timeout=0.1)
+                self.submitted += len(timeline)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def wait_idle(self, poll=0.005):
+        """等待已提交的事件全部发出（或注入中止）"""
+        while not self.stopped and self.events < self.submitted:
+            time.sleep(poll)
+
+    def finish(self, timeout=None):
+        """提交结束标记并等待注入线程处理完所有时间线"""
+        while not self.stopped:
+            try:
+                self._queue.put(_DONE, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self._thread.join(timeout)
+        self.backend.set_external_pacing(False)
+        if self._saved_switch_interval is not None:
+            sys.setswitchinterval(self._saved_switch_interval)
+            self._saved_switch_interval = None
+        if self.error is not None:
+            raise self.error
+
+    def _wait_until(self, deadline):
+        if not self.backend.realtime:
+            self.backend.wait(max(0.0, deadline - self._now()))
+            return
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_threshold:
+            time.sleep(remaining - self.spin_threshold)
+        while time.perf_counter() < deadline:
+            time.sleep(0)
+
+    def _run(self):
+        backend = self.backend
+        next_deadline = None
+        pen_down = False
+        last_xy = (0, 0)
+        checkpoint = self.checkpoint
+        next_checkpoint = self._now() + self.checkpoint_interval
+        current = drawn = None
+        try:
+            while True:
+                try:
+                    timeline = self._queue.get(timeout=0.05)
+                except queue.Empty:
+                    if self.should_stop():
+                        break
+                    continue
+                if timeline is _DONE:
+                    break
+                now = self._now()
+                if next_deadline is None or now - next_deadline > self.max_lag:
+                    # 首段或规划跟不上注入（队列断供），从当前时刻重新开始
+                    if next_deadline is not None:
+                        self.starved += 1
+                    next_deadline = now
+                self.nominal_time += timeline.duration
+                kinds, xs, ys = timeline.kinds.tolist(), timeline.xs.tolist(), timeline.ys.tolist()
+                gaps = timeline.gaps.tolist()
+                ids = timeline.stroke_ids.tolist() if timeline.stroke_ids is not None else None
+                ups = 0
+                segment_start = self._now()
+                for kind, x, y, gap in zip(kinds, xs, ys, gaps):
+                    if self.should_stop():
+                        raise _Stopped()
+                    if self.is_paused():
+                        if pen_down:
+                            backend.up()
+                        while self.is_paused():
+                            if self.should_stop():
+                                raise _Stopped()
+                            time.sleep(0.05)
+                        if pen_down:
+                            # 继续时回到暂停处重新落笔，笔画不会缺一段
+                            backend.move(*last_xy)
+                            backend.down()
+                        self.active_time += self._now() - segment_start
+                        segment_start = next_deadline = self._now()
+                    self._wait_until(next_deadline)
+                    actual = self._now()
+                    late = actual - next_deadline
+                    self.lateness.append(late)
+                    if late > self.max_lag:
+                        self.realigns += 1
+                        next_deadline = actual
+                    if kind == MOVE:
+                        backend.move(x, y)
+                        last_xy = (x, y)
+                        self.moves += 1
+                        if pen_down and ids is not None:
+                            drawn += 1
+                    elif kind == DOWN:
+                        backend.down()
+                        pen_down = True
+                        if ids is not None:
+                            current, drawn = ids[ups], 1
+                    elif kind == UP:
+                        backend.up()
+                        pen_down = False
+                        self.strokes += 1
+                        if ids is not None:
+                            current, drawn = ids[ups] + 1, 0
+                            ups += 1
+                        if self.progress is not None:
+                            self.progress(self.strokes, self.moves)
+                    elif kind == CLICK:
+                        backend.click(x, y)
+                    else:
+                        backend.flush()
+                    self.events += 1
+                    next_deadline += gap
+                    if checkpoint is not None and current is not None and actual >= next_checkpoint:
+                        checkpoint(current, drawn)
+                        next_checkpoint = actual + self.checkpoint_interval
+                self.active_time += self._now() - segment_start
+        except _Stopped:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.stopped = True
+            backend.up()
+            backend.flush()
+            if current is not None:
+                self.position = (current, drawn)
+                if checkpoint is not None:
+                    checkpoint(current, drawn)
+
+    def stats(self):
+        """
+        Returns:
+            字典：事件数、移动数、实际/名义速率（事件/秒）、延迟统计（秒）、重新对齐和断供次数
+        """
+        late = np.frombuffer(self.lateness, dtype=np.float64) if len(self.lateness) else np.zeros(1)
+        return {
+            'events': self.events,
+            'moves': self.moves,
+            'strokes': self.strokes,
+            'rate': self.events / self.active_time if self.active_time > 0 else 0.0,
+            'nominal_rate': self.events / self.nominal_time if self.nominal_time > 0 else 0.0,
+            'lateness_mean': float(late.mean()),
+            'lateness_p50': float(np.percentile(late, 50)),
+            'lateness_p99': float(np.percentile(late, 99)),
+            'lateness_max': float(late.max()),
+            'realigns': self.realigns,
+            'starved': self.starved,
+        }
+
+    def report(self):
+        """打印注入统计"""
+        stats = self.stats()
+        print(f"📈 注入 {stats['events']} 个事件（移动 {stats['moves']}），实际 {stats['rate']:.0f} 事件/秒"
+              f"（名义 {stats['nominal_rate']:.0f}）")
+        print(f"⏱️ 截止时间延迟: 平均 {stats['lateness_mean'] * 1e6:.0f}µs，p50 {stats['lateness_p50'] * 1e6:.0f}µs，"
+              f"p99 {stats['lateness_p99'] * 1e6:.0f}µs，最大 {stats['lateness_max'] * 1e3:.1f}ms；"
+              f"重新对齐 {stats['realigns']} 次，等待规划 {stats['starved']} 次")
+        return stats
+
+
+class _Stopped(Exception):
+    pass
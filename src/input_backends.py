@@ -0,0 +1,411 @@
+import abc
+import os
+import sys
+import math
+import time
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+# 设置该环境变量可指定默认输入后端（pyautogui / pynput / xtest / uinput）
+INPUT_BACKEND_ENV = 'XICHA_INPUT_BACKEND'
+
+
+class InputBackend(abc.ABC):
+    """
+    鼠标输入注入后端：绘制流程只通过 move / down / up / click / flush 输出指针事件
+
+    各方法可能在键盘监听线程中被调用（ESC / 空格时立即抬笔），实现需保证线程安全。
+    """
+
+    name = ''
+
+    # 为 False 时事件不占用真实时间，时间以 now() 返回的模拟时钟为准
+    realtime = True
+
+    def available(self):
+        """当前环境能否使用该后端"""
+        return True
+
+    @abc.abstractmethod
+    def move(self, x, y):
+        """把指针移到屏幕坐标 (x, y)"""
+
+    @abc.abstractmethod
+    def down(self):
+        """按下左键"""
+
+    @abc.abstractmethod
+    def up(self):
+        """抬起左键"""
+
+    def click(self, x=None, y=None):
+        """（可选先移动到 (x, y) 再）单击左键"""
+        if x is not None:
+            self.move(x, y)
+        self.down()
+        self.up()
+        self.flush()
+
+    def flush(self):
+        """把缓冲的事件立即发出（不缓冲的后端无需处理）"""
+
+    def wait(self, seconds):
+        """事件之间的等待（让目标程序处理完上一个事件），模拟后端只推进模拟时钟"""
+        time.sleep(seconds)
+
+    def now(self):
+        """当前时刻（秒，单调时钟），模拟后端返回模拟时钟"""
+        return time.perf_counter()
+
+    def set_external_pacing(self, enabled):
+        """由注入调度器按截止时间控制节奏时调用：enabled 为 True 时后端不再在事件后自行暂停"""
+
+    def close(self):
+        """释放后端占用的资源"""
+
+
+class PyAutoGUIBackend(InputBackend):
+    """pyautogui（原有行为：每次调用后暂停 PAUSE 秒，关闭角落中止检查）"""
+
+    name = 'pyautogui'
+
+    def __init__(self, pause=0.001):
+        """
+        Args:
+            pause: 每次调用后的暂停时间 pyautogui.PAUSE（秒）
+        """
+        self.pause = pause
+        self._pyautogui = None
+
+    def available(self):
+        try:
+            self._module()
+        except Exception:
+            return False
+        return True
+
+    def _module(self):
+        if self._pyautogui is None:
+            import pyautogui
+            pyautogui.FAILSAFE = False
+            pyautogui.PAUSE = self.pause  # 极小延迟，提升绘制速度
+            self._pyautogui = pyautogui
+        return self._pyautogui
+
+    def set_external_pacing(self, enabled):
+        self._module().PAUSE = 0 if enabled else self.pause
+
+    def move(self, x, y):
+        self._module().moveTo(x, y)
+
+    def down(self):
+        self._module().mouseDown(button='left')
+
+    def up(self):
+        self._module().mouseUp(button='left')
+
+    def click(self, x=None, y=None):
+        if x is None:
+            self._module().click()
+        else:
+            self._module().click(x, y)
+
+
+class PynputBackend(InputBackend):
+    """pynput.mouse.Controller，没有 pyautogui 的暂停和中止检查"""
+
+    name = 'pynput'
+
+    def __init__(self):
+        self._mouse = None
+        self._button = None
+
+    def available(self):
+        try:
+            self._controller()
+        except Exception:
+            return False
+        return True
+
+    def _controller(self):
+        if self._mouse is None:
+            from pynput.mouse import Controller, Button
+            self._mouse = Controller()
+            self._button = Button.left
+        return self._mouse
+
+    def move(self, x, y):
+        self._controller().position = (int(x), int(y))
+
+    def down(self):
+        self._controller().press(self._button)
+
+    def up(self):
+        self._controller().release(self._button)
+
+
+class XTestBackend(InputBackend):
+    """
+    直接调用 X11 XTest 扩展（ctypes，不经过 pyautogui / Xlib 的 Python 封装）
+
+    移动事件先留在 Xlib 的输出缓冲区，每 batch_size 个或 flush() 时才 XFlush 一次；
+    按键事件立即发出，保证落笔、抬笔的时机。
+    """
+
+    name = 'xtest'
+
+    def __init__(self, batch_size=16):
+        """
+        Args:
+            batch_size: 累积多少个移动事件 XFlush 一次
+        """
+        self.batch_size = max(1, batch_size)
+        self._display = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def available(self):
+        if not sys.platform.startswith('linux') or not os.environ.get('DISPLAY'):
+            return False
+        try:
+            self._open()
+        except OSError:
+            return False
+        return True
+
+    def _open(self):
+        if self._display is None:
+            x11 = ctypes.CDLL(ctypes.util.find_library('X11') or 'libX11.so.6')
+            xtst = ctypes.CDLL(ctypes.util.find_library('Xtst') or 'libXtst.so.6')
+            x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+            x11.XOpenDisplay.restype = ctypes.c_void_p
+            x11.XFlush.argtypes = [ctypes.c_void_p]
+            x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+            xtst.XTestFakeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                                  ctypes.c_ulong]
+            xtst.XTestFakeButtonEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+            display = x11.XOpenDisplay(None)
+            if not display:
+                raise OSError("无法连接 X 显示服务器")
+            self._x11, self._xtst, self._display = x11, xtst, display
+        return self._display
+
+    def move(self, x, y):
+        with self._lock:
+            self._xtst.XTestFakeMotionEvent(self._open(), -1, int(x), int(y), 0)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._flush_locked()
+
+    def down(self):
+        self._button(True)
+
+    def up(self):
+        self._button(False)
+
+    def _button(self, pressed):
+        with self._lock:
+            self._xtst.XTestFakeButtonEvent(self._open(), 1, pressed, 0)
+            self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            if self._display is not None:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        self._x11.XFlush(self._display)
+        self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._display is not None:
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+
+
+class UInputBackend(InputBackend):
+    """
+    Linux uinput 虚拟绝对坐标指针设备（需要 /dev/uinput 写权限，X11 / Wayland 都可用）
+
+    事件先打包在缓冲区，每 batch_size 个移动或 flush() 时一次 write 写入内核；
+    按键事件立即写入。
+    """
+
+    name = 'uinput'
+
+    # linux/input-event-codes.h、linux/uinput.h
+    EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+    SYN_REPORT, BTN_LEFT, ABS_X, ABS_Y = 0x00, 0x110, 0x00, 0x01
+    UI_SET_EVBIT, UI_SET_KEYBIT, UI_SET_ABSBIT = 0x40045564, 0x40045565, 0x40045567
+    UI_DEV_CREATE, UI_DEV_DESTROY = 0x5501, 0x5502
+    ABS_CNT = 64
+    EVENT_FORMAT = 'llHHi'  # struct input_event: timeval, type, code, value
+
+    def __init__(self, screen_size=None, batch_size=16):
+        """
+        Args:
+            screen_size: 屏幕尺寸 (width, height)，用作绝对坐标范围；None 时取 pyautogui.size()
+            batch_size: 累积多少个移动事件写入一次
+        """
+        self.screen_size = screen_size
+        self.batch_size = max(1, batch_size)
+        self._fd = None
+        self._buffer = []
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def available(self):
+        return sys.platform.startswith('linux') and os.access('/dev/uinput', os.W_OK)
+
+    def _open(self):
+        if self._fd is None:
+            import fcntl
+            if self.screen_size is None:
+                import pyautogui
+                self.screen_size = tuple(pyautogui.size())
+            width, height = self.screen_size
+            fd = os.open('/dev/uinput', os.O_WRONLY | os.O_NONBLOCK)
+            try:
+                for ev in (self.EV_SYN, self.EV_KEY, self.EV_ABS):
+                    fcntl.ioctl(fd, self.UI_SET_EVBIT, ev)
+                fcntl.ioctl(fd, self.UI_SET_KEYBIT, self.BTN_LEFT)
+                for axis in (self.ABS_X, self.ABS_Y):
+                    fcntl.ioctl(fd, self.UI_SET_ABSBIT, axis)
+                # struct uinput_user_dev: name[80], input_id, ff_effects_max, absmax/absmin/absfuzz/absflat[64]
+                absmax = [0] * self.ABS_CNT
+                absmax[self.ABS_X], absmax[self.ABS_Y] = width - 1, height - 1
+                device = struct.pack(f'80sHHHHi{self.ABS_CNT * 4}i', b'xicha-draw-pointer',
+                                     0x03, 0x1, 0x1, 1, 0, *absmax, *([0] * self.ABS_CNT * 3))
+                os.write(fd, device)
+                fcntl.ioctl(fd, self.UI_DEV_CREATE)
+            except OSError:
+                os.close(fd)
+                raise
+            self._fd = fd
+            # 等待窗口系统识别新设备，否则最初的事件会丢失
+            time.sleep(0.3)
+        return self._fd
+
+    def _event(self, type_, code, value):
+        self._buffer.append(struct.pack(self.EVENT_FORMAT, 0, 0, type_, code, value))
+
+    def move(self, x, y):
+        with self._lock:
+            self._open()
+            self._event(self.EV_ABS, self.ABS_X, int(x))
+            self._event(self.EV_ABS, self.ABS_Y, int(y))
+            self._event(self.EV_SYN, self.SYN_REPORT, 0)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._flush_locked()
+
+    def down(self):
+        self._button(1)
+
+    def up(self):
+        self._button(0)
+
+    def _button(self, value):
+        with self._lock:
+            self._open()
+            self._event(self.EV_KEY, self.BTN_LEFT, value)
+            self._event(self.EV_SYN, self.SYN_REPORT, 0)
+            self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            if self._fd is not None:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            os.write(self._fd, b''.join(self._buffer))
+            self._buffer = []
+        self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                import fcntl
+                self._flush_locked()
+                fcntl.ioctl(self._fd, self.UI_DEV_DESTROY)
+                os.close(self._fd)
+                self._fd = None
+
+
+# 默认使用 pyautogui（原有行为），其余后端需按名称或 XICHA_INPUT_BACKEND 环境变量选择
+INPUT_BACKENDS = {backend.name: backend for backend in (
+    PyAutoGUIBackend(),
+    PynputBackend(),
+    XTestBackend(),
+    UInputBackend(),
+)}
+
+
+def get_input_backend(name=None):
+    """
+    按名称取输入后端；name 为 None 时取环境变量指定的后端，都未指定或不可用时取默认顺序中第一个可用的
+
+    Args:
+        name: 'pyautogui' / 'pynput' / 'xtest' / 'uinput' 或 None
+
+    Returns:
+        InputBackend（同名后端共用一个实例）
+    """
+    name = name or os.environ.get(INPUT_BACKEND_ENV) or None
+    if name is not None:
+        backend = INPUT_BACKENDS.get(name)
+        if backend is not None and backend.available():
+            return backend
+        print(f"⚠️ 输入后端 {name} 不可用，改用默认后端")
+    for backend in INPUT_BACKENDS.values():
+        if backend.available():
+            return backend
+    raise RuntimeError("没有可用的输入后端，请安装 pyautogui 或 pynput")
+
+
+def benchmark_input_backends(names=None, events=2000, center=None, radius=50):
+    """
+    记录各后端每秒能发出的移动事件数（只移动不按键，指针沿小圆周移动）
+
+    Args:
+        names: 要测试的后端名称列表，None 表示全部
+        events: 每个后端发出的移动事件数
+        center: 圆心屏幕坐标，None 表示 (radius * 2, radius * 2)
+        radius: 圆周半径（像素）
+
+    Returns:
+        {后端名称: 每秒事件数}，不可用的后端记为 None
+    """
+    cx, cy = center or (radius * 2, radius * 2)
+    results = {}
+    for name in names or list(INPUT_BACKENDS):
+        backend = INPUT_BACKENDS.get(name)
+        if backend is None or not backend.available():
+            results[name] = None
+            print(f"{name:10s} 不可用")
+            continue
+        points = [(int(cx + radius * math.cos(2 * math.pi * i / 360)),
+                   int(cy + radius * math.sin(2 * math.pi * i / 360))) for i in range(events)]
+        backend.move(*points[0])
+        backend.flush()
+        start = time.perf_counter()
+        for x, y in points:
+            backend.move(x, y)
+        backend.flush()
+        seconds = time.perf_counter() - start
+        results[name] = events / seconds
+        print(f"{name:10s} {results[name]:10.0f} 事件/秒（{seconds / events * 1e6:.1f}µs/事件）")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='输入后端事件吞吐量对比（会移动鼠标指针，不会按键）')
+    parser.add_argument('-b', '--backends', nargs='*', choices=list(INPUT_BACKENDS), help='要测试的后端，默认全部')
+    parser.add_argument('-n', '--events', type=int, default=2000, help='每个后端发出的移动事件数')
+    args = parser.parse_args()
+    benchmark_input_backends(args.backends, args.events)
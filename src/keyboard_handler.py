@@ -1,13 +1,28 @@
-from pynput import keyboard
-import pyautogui
+try:
+    from pynput import keyboard
+except Exception:  # 无显示环境下不可用，此时不监听 ESC / 空格
+    keyboard = None
+from .input_backends import get_input_backend
 
 class KeyboardHandler:
     """键盘事件处理器，用于处理用户的键盘输入"""
     
-    def __init__(self):
+    def __init__(self, input_backend=None):
+        """
+        Args:
+            input_backend: 输入后端，None 表示默认后端（ESC / 暂停时通过它抬笔）
+        """
+        self._input_backend = input_backend
         self.should_exit = False
         self.is_paused = False
         self.listener = None
+
+    @property
+    def input_backend(self):
+        """输入后端，未指定时在第一次使用时取默认后端"""
+        if self._input_backend is None:
+            self._input_backend = get_input_backend()
+        return self._input_backend
     
     def on_press(self, key):
         """按键处理函数"""
@@ -16,19 +31,22 @@ class KeyboardHandler:
             if key == keyboard.Key.esc:
                 self.should_exit = True
                 # 立即抬起鼠标按键，确保停止所有绘制操作
-                pyautogui.mouseUp()
+                self.input_backend.up()
                 return False  # 停止监听器
             # 捕获空格键 - 暂停/继续绘制
             elif key == keyboard.Key.space:
                 self.is_paused = not self.is_paused
                 if self.is_paused:
                     # 暂停时立即抬起鼠标，防止拖动产生线条
-                    pyautogui.mouseUp()
+                    self.input_backend.up()
         except Exception as e:
             pass
     
     def start_listener(self):
         """启动键盘监听器"""
+        if keyboard is None:
+            print("⚠️ 键盘监听不可用（pynput 无法加载），ESC / 空格不起作用")
+            return
         self.listener = keyboard.Listener(on_press=self.on_press)
         self.listener.start()
     
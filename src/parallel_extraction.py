@@ -0,0 +1,312 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from .skeleton_backends import skeletonize_with_distance
+from .skeleton_graph import SkeletonGraph, trace_skeleton
+from .tiled_skeleton import SparsePixelMap
+
+# 面积（像素）小于该值的连通分量在主进程内处理，避免进程间传输的开销
+MIN_PARALLEL_AREA = 4000
+
+# 骨架化吞吐量的估计（ROI 像素/秒），用于估算并行能节省的时间
+SKELETON_PIXELS_PER_SECOND = 10000000
+
+# 进程池的启动开销（秒）：spawn 方式（Windows、macOS 的默认方式）的工作进程
+# 要重新导入 cv2、skimage，约 1 秒；fork 方式直接复制主进程
+POOL_STARTUP_SECONDS = {'fork': 0.1, 'forkserver': 0.5, 'spawn': 1.0}
+
+# 每个工作进程分到的批次数，批次越多负载越均衡，但调度开销越大
+BATCHES_PER_WORKER = 4
+
+
+def trace_component(mask, offset, backend=None):
+    """
+    骨架化并追踪单个连通分量，同时采样骨架像素处的距离变换
+
+    Args:
+        mask: 连通分量所在 ROI 的二值图（uint8，分量内为非零）
+        offset: ROI 左上角在整图中的坐标 (x, y)
+        backend: 骨架化后端名称，None 表示默认
+
+    Returns:
+        (node_xy, edges, edge_nodes, skeleton_xy, radii)，坐标均为整图坐标
+    """
+    skeleton, dist = skeletonize_with_distance(mask, backend)
+    graph = trace_skeleton(skeleton)
+    ys, xs = np.nonzero(skeleton)
+    shift = np.array(offset, dtype=np.int32)
+    skeleton_xy = np.stack([xs, ys], axis=1).astype(np.int32) + shift
+    return (graph.node_xy + shift, [edge + shift for edge in graph.edges], graph.edge_nodes,
+            skeleton_xy, dist[ys, xs])
+
+
+def _trace_batch(batch, backend=None):
+    """工作进程入口：依次处理一批连通分量"""
+    return [trace_component(mask, offset, backend) for mask, offset in batch]
+
+
+def balance_batches(costs, num_batches):
+    """
+    最长处理时间优先（LPT）：代价从大到小依次分给当前总代价最小的批次
+
+    Args:
+        costs: 每个任务的代价
+        num_batches: 批次数
+
+    Returns:
+        批次列表，每个批次是任务下标列表
+    """
+    batches = [[] for _ in range(max(1, num_batches))]
+    loads = [0] * len(batches)
+    for i in sorted(range(len(costs)), key=lambda i: -costs[i]):
+        b = loads.index(min(loads))
+        batches[b].append(i)
+        loads[b] += costs[i]
+    return [batch for batch in batches if batch]
+
+
+def pool_saving(rois, workers, min_parallel_area=MIN_PARALLEL_AREA):
+    """
+    估算按连通分量并行比整幅图在主进程处理节省的时间（秒），已扣除进程池启动开销
+
+    骨架化耗时按 ROI 面积估算；并行时至少要等最大的分量处理完，
+    也至少要等大分量的总面积平均分给各进程处理完。
+
+    Args:
+        rois: component_rois 的结果
+        workers: 进程数
+        min_parallel_area: 面积小于该值的分量在主进程内处理
+
+    Returns:
+        预计节省的秒数，不值得启用进程池时为 0 或负数
+    """
+    areas = [mask.size for mask, _, area in rois if area >= min_parallel_area]
+    if workers < 2 or len(areas) < 2:
+        return 0.0
+    total = sum(areas)
+    # 进程数多于 CPU 核数时并不会更快
+    parallel = max(max(areas), total / min(workers, len(areas), os.cpu_count() or 1))
+    # 未显式设置时取平台默认的启动方式（列表第一项），不在这里固定下来
+    method = multiprocessing.get_start_method(allow_none=True) or multiprocessing.get_all_start_methods()[0]
+    startup = POOL_STARTUP_SECONDS.get(method, 1.0)
+    return (total - parallel) / SKELETON_PIXELS_PER_SECOND - startup
+
+
+def component_rois(binary):
+    """
+    按 8 连通分量切出 ROI
+
+    ROI 在分量外接矩形的基础上向外扩 1 像素（不超出图像），分量以外的像素
+    置 0，距离变换结果与整图计算一致。
+
+    Returns:
+        [(mask, offset, area), ...]
+    """
+    num, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    h, w = binary.shape
+    rois = []
+    for label in range(1, num):
+        x, y, bw, bh, area = stats[label].tolist()
+        x0, y0 = max(0, x - 1), max(0, y - 1)
+        x1, y1 = min(w, x + bw + 1), min(h, y + bh + 1)
+        mask = (labels[y0:y1, x0:x1] == label).astype(np.uint8) * 255
+        rois.append((mask, (x0, y0), area))
+    return rois
+
+
+def spatial_batches(rois, shape, batch_area, bands=8):
+    """
+    按空间顺序把连通分量分批，用于边提取边绘制
+
+    图像按行分为 bands 条横带，带内按分量外接矩形中心的 x 蛇形排列（偶数带从左到右，
+    奇数带从右到左），依次累积到面积不少于 batch_area 为一批；第一批只需 batch_area / 4，
+    尽快开始绘制。
+
+    Args:
+        rois: component_rois 的结果
+        shape: 图像形状 (h, w)
+        batch_area: 每批的最小线条面积（像素）
+        bands: 横带数
+
+    Returns:
+        批次列表，每个批次是 rois 下标列表
+    """
+    band_height = max(1, -(-shape[0] // bands))
+    keys = []
+    for i, (mask, (x0, y0), _) in enumerate(rois):
+        cx = x0 + mask.shape[1] / 2
+        band = int((y0 + mask.shape[0] / 2) // band_height)
+        keys.append((band, cx if band % 2 == 0 else -cx, i))
+    batches, current, total = [], [], 0
+    threshold = batch_area / 4
+    for _, _, i in sorted(keys):
+        current.append(i)
+        total += rois[i][2]
+        if total >= threshold:
+            batches.append(current)
+            current, total, threshold = [], 0, batch_area
+    if current:
+        batches.append(current)
+    return batches
+
+
+def merge_component_results(results, shape):
+    """
+    合并各连通分量的追踪结果为一张骨架图
+
+    Returns:
+        (graph, radius)：SkeletonGraph 和骨架像素处距离变换值的 SparsePixelMap
+    """
+    node_xy, edges, edge_nodes, keys, radii = [], [], [], [], []
+    num_nodes = 0
+    for comp_nodes, comp_edges, comp_edge_nodes, skeleton_xy, comp_radii in results:
+        node_xy.append(comp_nodes)
+        edges.extend(comp_edges)
+        edge_nodes.append(comp_edge_nodes + num_nodes)
+        keys.append(skeleton_xy[:, 1].astype(np.int64) * shape[1] + skeleton_xy[:, 0])
+        radii.append(comp_radii)
+        num_nodes += len(comp_nodes)
+    if not results:
+        empty = SkeletonGraph(shape, np.zeros((0, 2), np.int32), [], np.zeros((0, 2), np.int64))
+        return empty, SparsePixelMap(np.zeros(0, np.int64), np.zeros(0, np.float32), shape[1])
+    graph = SkeletonGraph(shape, np.concatenate(node_xy), edges, np.concatenate(edge_nodes))
+    return graph, SparsePixelMap(np.concatenate(keys), np.concatenate(radii), shape[1])
+
+
+def extract_components_parallel(binary, workers=None, min_parallel_area=MIN_PARALLEL_AREA, backend=None, rois=None):
+    """
+    按连通分量并行提取骨架图
+
+    连通分量按面积做负载均衡分批，交给进程池骨架化、追踪并采样距离变换；
+    小分量留在主进程处理。各分量互不相邻，合并结果与整图处理一致。
+
+    Args:
+        binary: 二值图（uint8，非零为线条）
+        workers: 进程数，None 表示 CPU 核数
+        min_parallel_area: 面积小于该值的分量在主进程内处理
+        backend: 骨架化后端名称，None 表示默认
+        rois: 已算好的 component_rois 结果，None 时重新计算
+
+    Returns:
+        (graph, radius)
+    """
+    workers = workers or os.cpu_count() or 1
+    if rois is None:
+        rois = component_rois(binary)
+    large = [i for i, (_, _, area) in enumerate(rois) if area >= min_parallel_area]
+    small = [i for i, (_, _, area) in enumerate(rois) if area < min_parallel_area]
+
+    results = [None] * len(rois)
+    if workers > 1 and len(large) > 1:
+        batches = balance_batches([rois[i][2] for i in large], workers * BATCHES_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(batch, pool.submit(_trace_batch, [rois[large[k]][:2] for k in batch], backend))
+                       for batch in batches]
+            # 等待工作进程期间主进程处理小分量
+            for i in small:
+                results[i] = trace_component(*rois[i][:2], backend)
+            for batch, future in futures:
+                for k, result in zip(batch, future.result()):
+                    results[large[k]] = result
+    else:
+        for i in range(len(rois)):
+            results[i] = trace_component(*rois[i][:2], backend)
+    print(f"⚙️ 连通分量: {len(rois)} 个（并行 {len(large) if workers > 1 and len(large) > 1 else 0} 个，"
+          f"进程数 {workers}）")
+    return merge_component_results(results, binary.shape)
+
+
+def benchmark_parallel_extraction(binary, worker_counts=None, repeats=1):
+    """
+    对比不同进程数下按连通分量提取骨架图的耗时
+
+    Args:
+        binary: 二值图（uint8，非零为线条）
+        worker_counts: 要测试的进程数列表，默认 1, 2, 4, ... 直到 CPU 核数
+        repeats: 每种进程数重复次数，取最短时间
+
+    Returns:
+        {进程数: 秒}
+    """
+    if worker_counts is None:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= (os.cpu_count() or 1):
+            worker_counts.append(worker_counts[-1] * 2)
+    timings = {}
+    for workers in worker_counts:
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            extract_components_parallel(binary, workers)
+            best = min(best, time.perf_counter() - start)
+        timings[workers] = best
+    base = timings[worker_counts[0]]
+    for workers, seconds in timings.items():
+        print(f"进程数 {workers}: {seconds:.2f}s，加速比 {base / seconds:.2f}x")
+    return timings
+
+
+def benchmark_prepare_plan(image_path, canvas_size=(800, 800), worker_counts=None, repeats=1):
+    """
+    通过 prepare_plan 走完整的提取和规划流程，对比不同进程数下的耗时
+
+    图像先按画布缩放到工作分辨率，是否启用进程池由 pool_saving 按工作图决定，
+    测到的是实际绘制前的等待时间。不读写笔画计划缓存。
+
+    Args:
+        image_path: 输入图像路径
+        canvas_size: 画布尺寸 (width, height)
+        worker_counts: 要测试的进程数列表，默认 1, 2, 4, ... 直到 CPU 核数
+        repeats: 每种进程数重复次数，取最短时间
+
+    Returns:
+        {进程数: 秒}
+    """
+    import contextlib
+    import io
+    from .draw_image import prepare_plan
+
+    if worker_counts is None:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= (os.cpu_count() or 1):
+            worker_counts.append(worker_counts[-1] * 2)
+    timings = {}
+    for workers in worker_counts:
+        best = float('inf')
+        for _ in range(repeats):
+            output = io.StringIO()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(output):
+                prepare_plan(image_path, (0, 0), canvas_size, use_cache=False, extract_params={'workers': workers})
+            best = min(best, time.perf_counter() - start)
+        timings[workers] = best
+        # 并行提取时会打印连通分量统计，没有这一行说明整幅图在主进程处理
+        pool_lines = [line for line in output.getvalue().splitlines() if line.startswith('⚙️')]
+        print(f"进程数 {workers}: {best:.2f}s，{pool_lines[0] if pool_lines else '未启用进程池'}")
+    base = timings[worker_counts[0]]
+    for workers, seconds in timings.items():
+        print(f"进程数 {workers}: 加速比 {base / seconds:.2f}x")
+    return timings
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='按连通分量并行提取骨架的加速比测试（默认经 prepare_plan 完整规划）')
+    parser.add_argument('-i', '--image', required=True, help='输入图像路径')
+    parser.add_argument('-w', '--workers', type=int, nargs='*', help='要测试的进程数，默认 1, 2, 4, ... 直到 CPU 核数')
+    parser.add_argument('-r', '--repeats', type=int, default=3, help='每种进程数重复次数')
+    parser.add_argument('--canvas', type=int, nargs=2, default=(800, 800), metavar=('W', 'H'),
+                        help='画布尺寸，决定工作分辨率（默认: 800 800）')
+    parser.add_argument('--extract-only', action='store_true',
+                        help='只测原图整幅二值化后的并行提取，总是启用进程池，不经过 prepare_plan')
+    args = parser.parse_args()
+
+    if args.extract_only:
+        gray = cv2.imdecode(np.fromfile(args.image, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        benchmark_parallel_extraction(binary, args.workers, args.repeats)
+    else:
+        benchmark_prepare_plan(args.image, tuple(args.canvas), args.workers, args.repeats)
@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import inspect
+from .plan_format import StrokePlan
+
+# 计划内容或生成算法变化时递增，旧缓存条目随之失效
+PLAN_CACHE_VERSION = 2
+
+# 缓存目录的默认总大小上限（字节）
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def resolved_params(func, **kwargs):
+    """
+    取函数关键字参数的实际取值（未传入的按默认值补全），用于缓存键
+
+    默认值改变时缓存键随之改变，不会误用旧参数生成的计划。
+
+    Args:
+        func: 函数
+        **kwargs: 调用时显式传入的关键字参数
+
+    Returns:
+        {参数名: 取值}，只包含有默认值或显式传入的参数
+    """
+    params = {}
+    for name, parameter in inspect.signature(func).parameters.items():
+        if name in kwargs:
+            params[name] = kwargs[name]
+        elif parameter.default is not inspect.Parameter.empty:
+            params[name] = parameter.default
+    return params
+
+
+class PlanCache:
+    """
+    笔画计划的磁盘缓存
+
+    键由图像文件内容的哈希、提取/规划参数和画布位置尺寸组成，值为最终的屏幕
+    笔画计划（StrokePlan），每个条目一个计划文件（plan_format）。读取命中时更新
+    文件修改时间，写入后按修改时间从旧到新删除条目，直到总大小不超过上限（LRU）。
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Args:
+            cache_dir: 缓存目录（不存在时创建）
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, image_path, params, canvas_top_left, canvas_size):
+        """
+        计算缓存键
+
+        Args:
+            image_path: 图像路径（按文件内容哈希，与路径和修改时间无关）
+            params: 影响计划的参数字典（需可 JSON 序列化）
+            canvas_top_left: 画布左上角屏幕坐标
+            canvas_size: 画布尺寸 (width, height)
+
+        Returns:
+            十六进制字符串
+        """
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        meta = {
+            'version': PLAN_CACHE_VERSION,
+            'params': params,
+            'canvas': [list(map(int, canvas_top_left)), list(map(int, canvas_size))],
+        }
+        digest.update(json.dumps(meta, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.xcplan")
+
+    def get(self, key):
+        """
+        读取缓存的计划
+
+        Returns:
+            StrokePlan，未命中或文件损坏时返回 None
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            plan = StrokePlan.load(path)
+            os.utime(path)
+            return plan
+        except Exception as e:
+            print(f"⚠️ 笔画计划缓存读取失败，将重新生成: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def put(self, key, plan):
+        """写入计划（先写临时文件再改名，中断时不会留下半个条目），然后按大小淘汰旧条目"""
+        try:
+            plan.save(self._path(key))
+        except Exception as e:
+            print(f"⚠️ 笔画计划缓存写入失败: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """按最近使用时间从旧到新删除条目，直到总大小不超过上限"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            # 旧版本留下的 .npz 条目也参与淘汰
+            if not name.endswith(('.xcplan', '.npz')):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,194 @@
+import os
+import numpy as np
+from .stroke_set import StrokeSet
+
+# 计划文件标识和格式版本，格式不兼容地改变时递增版本号
+PLAN_MAGIC = b'XCPLAN\x00\x01'
+PLAN_FORMAT_VERSION = 1
+
+# 画笔档位表最多容纳的档位数
+MAX_TIERS = 8
+
+# 文件头：画布矩形、缩放因子、画笔档位表（每档的宽度上限）以及笔画数和点数
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('header_size', '<u4'),
+    ('canvas', '<i4', (4,)),
+    ('scale', '<f8'),
+    ('num_tiers', '<u4'),
+    ('reserved', '<u4'),
+    ('tier_bounds', '<f4', (MAX_TIERS,)),
+    ('num_strokes', '<u8'),
+    ('num_points', '<u8'),
+])
+
+# 每条笔画的元数据：点在增量数组中的起始位置和点数、起点绝对坐标、宽度和画笔档位
+STROKE_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('x0', '<i4'),
+    ('y0', '<i4'),
+    ('width', '<u2'),
+    ('tier', 'u1'),
+    ('flags', 'u1'),
+])
+
+# 点以 int16 增量存储：每个点相对前一个点（跨笔画也连续，第一个点相对原点）
+DELTA_DTYPE = np.dtype('<i2')
+
+
+def _align(n, alignment=8):
+    return -(-n // alignment) * alignment
+
+
+class StrokePlan:
+    """
+    屏幕笔画计划：按绘制顺序排列的屏幕坐标笔画，以及生成计划时的画布和缩放信息
+
+    可保存为紧凑的二进制计划文件（save / load / open_plan），在另一台机器上直接执行。
+    """
+
+    def __init__(self, strokes, canvas_top_left, canvas_size, scale_factor=1.0, tier_bounds=(8, 20)):
+        """
+        Args:
+            strokes: 屏幕坐标的 StrokeSet，带 widths / tiers 列
+            canvas_top_left: 画布左上角屏幕坐标
+            canvas_size: 画布尺寸 (width, height)
+            scale_factor: 原图像素到画布像素的缩放因子
+            tier_bounds: 画笔档位表，第 k 档的宽度上限（最后一档没有上限，不列出）
+        """
+        self.strokes = strokes
+        self.canvas_top_left = tuple(int(v) for v in canvas_top_left)
+        self.canvas_size = tuple(int(v) for v in canvas_size)
+        self.scale_factor = float(scale_factor)
+        self.tier_bounds = tuple(float(b) for b in tier_bounds)
+
+    @classmethod
+    def concatenate(cls, plans):
+        """按绘制顺序拼接同一画布上的多个计划（如边提取边绘制的各批次），画布等信息取第一个计划"""
+        first = plans[0]
+        return cls(StrokeSet.concatenate([plan.strokes for plan in plans]), first.canvas_top_left,
+                   first.canvas_size, first.scale_factor, first.tier_bounds)
+
+    def __len__(self):
+        return len(self.strokes)
+
+    @property
+    def num_points(self):
+        return self.strokes.num_points
+
+    def save(self, path):
+        """
+        写入二进制计划文件（先写临时文件再改名）
+
+        Raises:
+            ValueError: 相邻点坐标差超出 int16 范围（画布超过 32767 像素）
+        """
+        strokes = self.strokes
+        points = strokes.points.astype(np.int64)
+        deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+        if len(deltas) and (deltas.min() < -32768 or deltas.max() > 32767):
+            raise ValueError("点坐标差超出 int16 范围，无法写入计划文件")
+        if len(self.tier_bounds) + 1 > MAX_TIERS:
+            raise ValueError(f"画笔档位数超过 {MAX_TIERS}")
+
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = PLAN_MAGIC
+        header['version'] = PLAN_FORMAT_VERSION
+        header['header_size'] = HEADER_DTYPE.itemsize
+        header['canvas'] = [*self.canvas_top_left, *self.canvas_size]
+        header['scale'] = self.scale_factor
+        header['num_tiers'] = len(self.tier_bounds) + 1
+        bounds = np.full(MAX_TIERS, np.inf, dtype=np.float32)
+        bounds[:len(self.tier_bounds)] = self.tier_bounds
+        header['tier_bounds'] = bounds
+        header['num_strokes'] = len(strokes)
+        header['num_points'] = len(points)
+
+        table = np.zeros(len(strokes), dtype=STROKE_DTYPE)
+        starts = strokes.offsets[:-1]
+        table['offset'] = starts
+        table['length'] = strokes.lengths
+        nonempty = strokes.lengths > 0
+        table['x0'][nonempty] = points[starts[nonempty], 0]
+        table['y0'][nonempty] = points[starts[nonempty], 1]
+        table['width'] = np.clip(strokes.widths if strokes.widths is not None else 1, 0, 65535)
+        table['tier'] = strokes.tiers if strokes.tiers is not None else 1
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                for block in (header, table, deltas.astype(DELTA_DTYPE)):
+                    f.write(block.tobytes())
+                    f.write(b'\0' * (_align(f.tell()) - f.tell()))
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @classmethod
+    def load(cls, path):
+        """读取计划文件并解码全部点"""
+        return open_plan(path).to_plan()
+
+
+class PlanFile:
+    """
+    以 np.memmap 打开的计划文件：笔画表和增量数组都不复制，按需解码单条笔画或全部点
+    """
+
+    def __init__(self, path):
+        """
+        Raises:
+            ValueError: 不是计划文件或版本不支持
+        """
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != PLAN_MAGIC:
+            raise ValueError(f"不是有效的笔画计划文件: {path}")
+        if header['version'][0] != PLAN_FORMAT_VERSION:
+            raise ValueError(f"不支持的计划文件版本 {header['version'][0]}（当前 {PLAN_FORMAT_VERSION}）")
+        self.header = header[0]
+        canvas = self.header['canvas'].tolist()
+        self.canvas_top_left = tuple(canvas[:2])
+        self.canvas_size = tuple(canvas[2:])
+        self.scale_factor = float(self.header['scale'])
+        self.tier_bounds = tuple(self.header['tier_bounds'][:int(self.header['num_tiers']) - 1].tolist())
+        num_strokes = int(self.header['num_strokes'])
+        num_points = int(self.header['num_points'])
+
+        table_offset = _align(int(self.header['header_size']))
+        delta_offset = _align(table_offset + num_strokes * STROKE_DTYPE.itemsize)
+        self.table = (np.memmap(path, dtype=STROKE_DTYPE, mode='r', offset=table_offset, shape=(num_strokes,))
+                      if num_strokes else np.zeros(0, dtype=STROKE_DTYPE))
+        self.deltas = (np.memmap(path, dtype=DELTA_DTYPE, mode='r', offset=delta_offset, shape=(num_points, 2))
+                       if num_points else np.zeros((0, 2), dtype=DELTA_DTYPE))
+
+    def __len__(self):
+        return len(self.table)
+
+    def stroke(self, i):
+        """解码第 i 条笔画的点 (k, 2)"""
+        entry = self.table[i]
+        start, length = int(entry['offset']), int(entry['length'])
+        points = np.empty((length, 2), dtype=np.int32)
+        if length:
+            points[0] = entry['x0'], entry['y0']
+            np.cumsum(self.deltas[start + 1:start + length], axis=0, out=points[1:])
+            points[1:] += points[0]
+        return points
+
+    def to_plan(self):
+        """解码全部点，得到 StrokePlan"""
+        points = np.cumsum(self.deltas, axis=0, dtype=np.int32)
+        offsets = np.zeros(len(self.table) + 1, dtype=np.int64)
+        offsets[:-1] = self.table['offset']
+        offsets[-1] = len(points)
+        strokes = StrokeSet(points, offsets, self.table['width'].astype(np.int64), self.table['tier'].astype(np.int64))
+        return StrokePlan(strokes, self.canvas_top_left, self.canvas_size, self.scale_factor, self.tier_bounds)
+
+
+def open_plan(path):
+    """以 memmap 方式打开计划文件"""
+    return PlanFile(path)
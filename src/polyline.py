@@ -0,0 +1,102 @@
+import numpy as np
+
+
+def _compact(points, keep, starts):
+    """按保留掩码压缩拼接数组，返回 (points, starts)"""
+    kept_before = np.concatenate([[0], np.cumsum(keep)])
+    return points[keep], kept_before[starts]
+
+
+def dedupe_mask(points, is_start, is_end=None):
+    """去掉与前一个点完全相同的连续重复点（每条折线的起点总是保留）"""
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+    keep |= is_start
+    return keep
+
+
+def collinear_mask(points, is_start, is_end):
+    """去掉与前后两点严格共线且方向不变的中间点（无损）"""
+    keep = np.ones(len(points), dtype=bool)
+    if len(points) < 3:
+        return keep
+    d1 = (points[1:-1] - points[:-2]).astype(np.float64)
+    d2 = (points[2:] - points[1:-1]).astype(np.float64)
+    cross = d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]
+    dot = (d1 * d2).sum(axis=1)
+    keep[1:-1] = ~((cross == 0) & (dot > 0))
+    keep |= is_start | is_end
+    return keep
+
+
+def rdp_mask(points, fixed, tolerance):
+    """
+    Ramer–Douglas–Peucker 简化，所有折线、所有待定线段同时向量化处理
+
+    每轮对每个待定线段找离线段最远的内部点，超过 tolerance 的保留该点并把线段
+    一分为二，其余线段的内部点全部丢弃。轮数等于递归深度。
+
+    Args:
+        points: 拼接后的点数组 (N, 2)
+        fixed: 必须保留的点（各折线的首尾点）
+        tolerance: 点到线段的最大允许偏差
+
+    Returns:
+        保留掩码
+    """
+    pts = points.astype(np.float64)
+    keep = fixed.copy()
+    active = ~keep
+    while True:
+        cand = np.flatnonzero(active)
+        if len(cand) == 0:
+            break
+        kept = np.flatnonzero(keep)
+        seg = np.searchsorted(kept, cand) - 1
+        a = pts[kept[seg]]
+        ab = pts[kept[seg + 1]] - a
+        ap = pts[cand] - a
+        norm2 = (ab * ab).sum(axis=1)
+        t = np.divide((ap * ab).sum(axis=1), norm2, out=np.zeros(len(cand)), where=norm2 > 0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(*(ap - t[:, None] * ab).T)
+
+        # cand 已按线段分组，组内按距离降序后每组第一个即为最远点
+        first = np.concatenate([[True], seg[1:] != seg[:-1]])
+        group = np.cumsum(first) - 1
+        order = np.lexsort((-dist, group))
+        farthest = order[np.flatnonzero(first)]
+        split = dist[farthest] > tolerance
+
+        active[cand[~split[group]]] = False
+        chosen = cand[farthest[split]]
+        keep[chosen] = True
+        active[chosen] = False
+    return keep
+
+
+def simplify_concatenated(points, starts, tolerance=0.5, collinear=True):
+    """
+    屏幕坐标折线简化：去连续重复点，可选合并共线点，再做 RDP
+    各阶段都在同一个拼接数组上进行，不拆分成折线列表
+
+    Args:
+        points: 拼接后的点数组 (N, 2)
+        starts: 每条折线的起始下标（折线不能为空）
+        tolerance: RDP 容差（屏幕像素），0 表示不做 RDP
+        collinear: 是否合并严格共线的中间点
+
+    Returns:
+        (points, starts)，点的类型与输入一致
+    """
+    stages = [dedupe_mask]
+    if collinear:
+        stages.append(collinear_mask)
+    if tolerance > 0:
+        stages.append(lambda points, is_start, is_end: rdp_mask(points, is_start | is_end, tolerance))
+    for stage in stages:
+        is_start = np.zeros(len(points), dtype=bool)
+        is_start[starts] = True
+        is_end = np.roll(is_start, -1)
+        points, starts = _compact(points, stage(points, is_start, is_end), starts)
+    return points, starts
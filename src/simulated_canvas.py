@@ -0,0 +1,402 @@
+import os
+import heapq
+import random
+import time
+import threading
+import cv2
+import numpy as np
+from .input_backends import InputBackend
+
+# 画布底色 #EEEEEE（与 window_detection.detect_gray_area_by_color 识别的颜色一致）、窗口底色、
+# 窗口外的桌面底色和笔迹颜色
+CANVAS_GRAY = 238
+WINDOW_WHITE = 255
+DESKTOP_GRAY = 64
+INK = 0
+
+
+class LatencyModel:
+    """
+    模拟注入延迟：每类事件的固定耗时加可选的高斯抖动（秒）
+
+    默认值近似 pyautogui 后端：每次调用后暂停 PAUSE=0.001 秒，另有约 0.2ms 的调用开销。
+    """
+
+    def __init__(self, move=0.0012, button=0.0012, click=0.0024, flush=0.0, jitter=0.0, seed=0):
+        """
+        Args:
+            move / button / click / flush: 各类事件的耗时（秒）
+            jitter: 每个事件耗时的高斯抖动标准差（秒），结果不小于 0
+            seed: 抖动的随机种子
+        """
+        self.costs = {'move': move, 'down': button, 'up': button, 'click': click, 'flush': flush}
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def cost(self, kind):
+        base = self.costs.get(kind, 0.0)
+        if self.jitter:
+            return max(0.0, base + self._random.gauss(0.0, self.jitter))
+        return base
+
+
+class ResponseModel:
+    """
+    模拟目标程序处理按键事件的延迟（秒）：落笔、抬笔和切换画笔在事件发出后经过这段时间才生效
+
+    在生效之前发出的移动仍按原来的按键状态处理，例如落笔后等待不足时笔画开头缺失，
+    抬笔后等待不足时会画出到下一笔起点的连线，用于在模拟画布上校准等待时间。
+    """
+
+    def __init__(self, down=0.0, up=0.0, click=0.0):
+        self.delays = {'down': down, 'up': up, 'click': click}
+
+    def delay(self, kind):
+        return self.delays.get(kind, 0.0)
+
+
+class SimulatedWindow:
+    """模拟的目标窗口，提供 detect_gray_area_by_color 用到的 left / top / width / height"""
+
+    def __init__(self, left, top, width, height):
+        self.left, self.top, self.width, self.height = left, top, width, height
+
+
+class SimulatedCanvasBackend(InputBackend):
+    """
+    模拟画布输入后端：不操作真实鼠标，把注入的笔画画到内存中的屏幕图像上
+
+    屏幕图像为灰度图，窗口区域为白色，画布区域为 #EEEEEE，落笔移动按当前画笔档位的
+    线宽用 cv2.line 画成黑色；点击画笔滑块位置时切换档位。记录各类事件数、落笔/抬笔
+    移动距离，以及按延迟模型累计的模拟时间（wait() 只推进模拟时钟，不真正等待），
+    用于无显示环境下对绘制流程做基准测试和回归比较。
+    """
+
+    name = 'simulated'
+
+    def __init__(self, canvas_top_left=(0, 0), canvas_size=(800, 800), screen_size=None,
+                 slider_positions=None, brush_widths=(3, 9, 21, 31, 41), latency=None, window_rect=None,
+                 realtime=False, sample_interval=None, response=None, drop_rate=0.0, seed=0):
+        """
+        Args:
+            canvas_top_left: 画布左上角屏幕坐标
+            canvas_size: 画布尺寸 (width, height)
+            screen_size: 屏幕尺寸，None 表示刚好容纳窗口
+            slider_positions: 画笔滑块 5 个档位的屏幕坐标（从细到粗），点击这些位置切换档位
+            brush_widths: 各档位的线宽（像素）
+            latency: LatencyModel，None 表示默认模型
+            window_rect: 模拟窗口 (left, top, width, height)，None 表示画布四周各留 40 像素
+            realtime: 为 True 时 wait() 和事件耗时也真实等待
+            sample_interval: 目标程序落笔时采样指针位置的周期（秒），两次采样之间的多次移动
+                只有最后的位置被画出（转角可能被抹平）；None 表示每次移动都被采样
+            response: ResponseModel，None 表示按键事件立即生效
+            drop_rate: 目标程序丢弃移动、落笔和抬笔事件的概率（模拟负载过高时笔画断开、缺失，
+                或抬笔丢失后多出一段连线）；被丢弃的事件照常计入事件数和发送耗时
+            seed: 丢弃事件的随机种子
+        """
+        self.canvas_top_left = tuple(int(v) for v in canvas_top_left)
+        self.canvas_size = tuple(int(v) for v in canvas_size)
+        if window_rect is None:
+            window_rect = (max(0, self.canvas_top_left[0] - 40), max(0, self.canvas_top_left[1] - 40),
+                           self.canvas_size[0] + 80, self.canvas_size[1] + 80)
+        self.window = SimulatedWindow(*(int(v) for v in window_rect))
+        if screen_size is None:
+            screen_size = (self.window.left + self.window.width, self.window.top + self.window.height)
+        self.screen_size = tuple(int(v) for v in screen_size)
+        self.slider_positions = [tuple(p) for p in slider_positions] if slider_positions else []
+        self.brush_widths = tuple(brush_widths)
+        self.latency = latency or LatencyModel()
+        self.realtime = realtime
+        self.sample_interval = sample_interval
+        self.response = response or ResponseModel()
+        self.drop_rate = drop_rate
+        self._drops = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_config(cls, **kwargs):
+        """按配置目录中保存的画布坐标和画笔滑块位置创建（与真实绘制使用同一份配置）"""
+        from .draw_image import load_canvas_coordinates, load_brush_slider_positions
+        top_left, size, _ = load_canvas_coordinates()
+        if top_left:
+            kwargs.setdefault('canvas_top_left', top_left)
+            kwargs.setdefault('canvas_size', size)
+        kwargs.setdefault('slider_positions', load_brush_slider_positions())
+        return cls(**kwargs)
+
+    def reset(self):
+        """清空画布和统计"""
+        width, height = self.screen_size
+        self.screen = np.full((height, width), DESKTOP_GRAY, dtype=np.uint8)
+        w = self.window
+        self.screen[w.top:w.top + w.height, w.left:w.left + w.width] = WINDOW_WHITE
+        (x, y), (cw, ch) = self.canvas_top_left, self.canvas_size
+        self.screen[y:y + ch, x:x + cw] = CANVAS_GRAY
+        self.position = (0, 0)
+        self.pen_down = False
+        self.tier = 1
+        self.events = {'move': 0, 'down': 0, 'up': 0, 'click': 0, 'flush': 0, 'brush_switch': 0, 'dropped': 0}
+        self.pen_down_distance = 0.0
+        self.pen_up_distance = 0.0
+        self.pen_down_time = 0.0
+        self.simulated_time = 0.0
+        self._down_since = 0.0
+        self._sampled = self.position
+        self._next_sample = 0.0
+        # 尚未生效的按键事件 (生效时刻, 序号, 动作)，按生效时刻排列的堆
+        self._pending = []
+        self._sequence = 0
+
+    @property
+    def canvas(self):
+        """画布区域的图像（视图）"""
+        (x, y), (cw, ch) = self.canvas_top_left, self.canvas_size
+        return self.screen[y:y + ch, x:x + cw]
+
+    def _spend(self, kind):
+        self.events[kind] += 1
+        seconds = self.latency.cost(kind)
+        self.simulated_time += seconds
+        if self.realtime and seconds > 0:
+            time.sleep(seconds)
+
+    def _stroke_width(self):
+        return self.brush_widths[min(max(self.tier, 1), len(self.brush_widths)) - 1]
+
+    def _schedule(self, kind, action):
+        """按响应延迟安排按键事件生效，没有延迟时立即生效"""
+        now = self.now()
+        delay = self.response.delay(kind)
+        if delay > 0:
+            self._sequence += 1
+            heapq.heappush(self._pending, (now + delay, self._sequence, action))
+        else:
+            action(now)
+
+    def _apply_pending(self):
+        """让到当前时刻为止应生效的按键事件生效（指针在两次事件之间停在原位）"""
+        now = self.now()
+        while self._pending and self._pending[0][0] <= now:
+            effective, _, action = heapq.heappop(self._pending)
+            action(effective)
+
+    def _dropped(self):
+        if self.drop_rate and self._drops.random() < self.drop_rate:
+            self.events['dropped'] += 1
+            return True
+        return False
+
+    def move(self, x, y):
+        with self._lock:
+            self._apply_pending()
+            if self._dropped():
+                self._spend('move')
+                return
+            target = (int(x), int(y))
+            distance = float(np.hypot(target[0] - self.position[0], target[1] - self.position[1]))
+            if self.pen_down:
+                if self.sample_interval:
+                    self._sample(self.now())
+                else:
+                    cv2.line(self.screen, self.position, target, INK, self._stroke_width())
+                self.pen_down_distance += distance
+            else:
+                self.pen_up_distance += distance
+            self.position = target
+            self._spend('move')
+
+    def down(self):
+        with self._lock:
+            self._apply_pending()
+            if not self._dropped():
+                self._schedule('down', self._press)
+            self._spend('down')
+
+    def up(self):
+        with self._lock:
+            self._apply_pending()
+            if not self._dropped():
+                self._schedule('up', self._release)
+            self._spend('up')
+
+    def _press(self, now):
+        if not self.pen_down:
+            self.pen_down = True
+            self._down_since = now
+            self._sampled = self.position
+            if self.sample_interval:
+                self._next_sample = now + self.sample_interval
+            # 落笔处先画一个点，单点笔画也可见
+            cv2.line(self.screen, self.position, self.position, INK, self._stroke_width())
+
+    def _release(self, now):
+        if self.pen_down:
+            if self.sample_interval:
+                # 抬笔事件带有最终位置
+                self._sample(now)
+                self._draw_to_position()
+            self.pen_down_time += now - self._down_since
+        self.pen_down = False
+
+    def _sample(self, now):
+        """落笔期间到 now 为止的采样：指针在两次事件之间停在当前位置"""
+        if self._next_sample <= now:
+            self._draw_to_position()
+            ticks = int((now - self._next_sample) // self.sample_interval) + 1
+            self._next_sample += ticks * self.sample_interval
+
+    def _draw_to_position(self):
+        if self._sampled != self.position:
+            cv2.line(self.screen, self._sampled, self.position, INK, self._stroke_width())
+            self._sampled = self.position
+
+    def click(self, x=None, y=None):
+        with self._lock:
+            self._apply_pending()
+            if x is not None:
+                target = (int(x), int(y))
+                self.pen_up_distance += float(np.hypot(target[0] - self.position[0], target[1] - self.position[1]))
+                self.position = target
+            tier = self._slider_tier(self.position)
+            if tier is not None:
+                self._schedule('click', lambda now: self._switch_tier(tier))
+            else:
+                cv2.line(self.screen, self.position, self.position, INK, self._stroke_width())
+            self._spend('click')
+
+    def _switch_tier(self, tier):
+        if tier != self.tier:
+            self.events['brush_switch'] += 1
+        self.tier = tier
+
+    def _slider_tier(self, position, radius=6):
+        for i, (sx, sy) in enumerate(self.slider_positions):
+            if abs(position[0] - sx) <= radius and abs(position[1] - sy) <= radius:
+                return i + 1
+        return None
+
+    def flush(self):
+        with self._lock:
+            self._spend('flush')
+
+    def wait(self, seconds):
+        self.simulated_time += seconds
+        if self.realtime:
+            time.sleep(seconds)
+
+    def now(self):
+        return self.simulated_time if not self.realtime else time.perf_counter()
+
+    def screenshot(self, region=None):
+        """
+        模拟截图，可替代 pyautogui.screenshot 传给 detect_gray_area_by_color
+
+        Args:
+            region: (left, top, width, height)，None 表示整个屏幕
+
+        Returns:
+            RGB 图像数组 (h, w, 3)
+        """
+        if region is None:
+            region = (0, 0) + self.screen_size
+        left, top, width, height = (int(v) for v in region)
+        with self._lock:
+            self._apply_pending()
+            crop = self.screen[top:top + height, left:left + width]
+            return cv2.cvtColor(crop, cv2.COLOR_GRAY2RGB)
+
+    def stats(self):
+        """事件计数、移动距离、模拟时间和画布上的笔迹像素数"""
+        return {
+            'events': dict(self.events),
+            'pen_down_distance': self.pen_down_distance,
+            'pen_up_distance': self.pen_up_distance,
+            'pen_down_time': self.pen_down_time,
+            'simulated_time': self.simulated_time,
+            'ink_pixels': int(np.count_nonzero(self.canvas == INK)),
+        }
+
+    def report(self):
+        """打印统计"""
+        stats = self.stats()
+        events = stats['events']
+        print(f"📊 模拟事件: 移动 {events['move']}，落笔 {events['down']}，抬笔 {events['up']}，"
+              f"点击 {events['click']}（切换画笔 {events['brush_switch']} 次），flush {events['flush']}，"
+              f"丢弃 {events['dropped']}")
+        print(f"📏 落笔移动 {stats['pen_down_distance']:.0f}px，抬笔移动 {stats['pen_up_distance']:.0f}px，"
+              f"笔迹像素 {stats['ink_pixels']}")
+        print(f"⏱️ 模拟耗时: {stats['simulated_time']:.2f}s，其中落笔 {stats['pen_down_time']:.2f}s")
+        return stats
+
+    def save(self, path, region='canvas'):
+        """
+        保存模拟画布（region='canvas'）或整个屏幕（region='screen'）为图像
+        """
+        image = self.canvas if region == 'canvas' else self.screen
+        success, encoded = cv2.imencode(os.path.splitext(path)[1] or '.png', image)
+        if success:
+            # 使用 numpy tofile 解决中文路径问题
+            encoded.tofile(path)
+        return success
+
+
+def benchmark_pacing(image_path, pacings, sample_interval=0.002, canvas_top_left=(100, 100), canvas_size=(800, 800)):
+    """
+    在模拟画布上比较不同事件节奏的落笔耗时和还原度
+
+    以每次移动都被采样的绘制结果为参照，统计目标程序按 sample_interval 采样时
+    笔迹与参照不一致的像素比例（转角被抹平、漏画等）。
+
+    Args:
+        image_path: 图像路径
+        pacings: {名称: Pacing}
+        sample_interval: 模拟目标程序的采样周期（秒）
+
+    Returns:
+        {名称: (落笔耗时秒, 总模拟耗时秒, 不一致像素比例)}
+    """
+    import io
+    import contextlib
+    from . import draw_image
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = draw_image.prepare_plan(image_path, canvas_top_left, canvas_size, use_cache=False)
+
+    def draw(pacing, sample):
+        # 节奏由调度器控制，事件本身只计调用开销；加少量抖动避免事件与采样时刻锁相
+        backend = SimulatedCanvasBackend(canvas_top_left, canvas_size, sample_interval=sample,
+                                         latency=LatencyModel(move=0.0001, button=0.0001, click=0.0002, jitter=0.0002))
+        previous = draw_image.input_backend
+        draw_image.set_input_backend(backend)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                draw_image.execute_stream([plan], len(plan), plan.num_points, pacing)
+        finally:
+            draw_image.set_input_backend(previous)
+        return backend
+
+    print(f"笔画 {len(plan)} 条，点 {plan.num_points} 个，模拟采样周期 {sample_interval * 1e3:g}ms")
+    results = {}
+    for name, pacing in pacings.items():
+        reference = draw(pacing, None).canvas == INK
+        backend = draw(pacing, sample_interval)
+        mismatch = np.count_nonzero((backend.canvas == INK) ^ reference) / max(1, np.count_nonzero(reference))
+        results[name] = (backend.pen_down_time, backend.simulated_time, mismatch)
+        print(f"{name:16s} 落笔 {backend.pen_down_time:7.2f}s，总计 {backend.simulated_time:7.2f}s，"
+              f"不一致像素 {mismatch * 100:5.2f}%")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    from .injection_scheduler import Pacing, default_pacing
+    parser = argparse.ArgumentParser(description='在模拟画布上比较固定间隔和速度规划的落笔耗时与还原度')
+    parser.add_argument('-i', '--image', required=True, help='图像路径')
+    parser.add_argument('-s', '--sample-interval', type=float, default=0.002, help='模拟目标程序的采样周期（秒）')
+    parser.add_argument('--intervals', type=float, nargs='*', default=[0.001, 0.0015, 0.002],
+                        help='参与比较的固定移动间隔（秒）')
+    args = parser.parse_args()
+    candidates = {f'固定 {m * 1e3:g}ms': Pacing(move_interval=m) for m in args.intervals}
+    candidates['速度规划'] = default_pacing()
+    benchmark_pacing(args.image, candidates, args.sample_interval)
@@ -0,0 +1,169 @@
+import abc
+import time
+import cv2
+import numpy as np
+
+
+class SkeletonBackend(abc.ABC):
+    """骨架化后端：输入二值图，同时输出单像素骨架和距离变换"""
+
+    name = ''
+
+    def available(self):
+        """当前环境能否使用该后端"""
+        return True
+
+    @abc.abstractmethod
+    def skeletonize(self, binary):
+        """
+        Args:
+            binary: 二值图（uint8，非零为线条）
+
+        Returns:
+            (skeleton, dist)：布尔骨架图和 float32 距离变换（到最近背景像素的距离）
+        """
+
+
+class SkimageBackend(SkeletonBackend):
+    """skimage.morphology.skeletonize 细化，另算一次 cv2.distanceTransform"""
+
+    name = 'skimage'
+
+    def available(self):
+        try:
+            from skimage.morphology import skeletonize  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def skeletonize(self, binary):
+        from skimage.morphology import skeletonize
+        skeleton = skeletonize(binary > 0)
+        return skeleton, cv2.distanceTransform(binary, cv2.DIST_L2, 5)
+
+
+class MedialAxisBackend(SkeletonBackend):
+    """skimage.morphology.medial_axis，一次计算同时得到中轴和精确欧氏距离"""
+
+    name = 'medial_axis'
+
+    def available(self):
+        try:
+            from skimage.morphology import medial_axis  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def skeletonize(self, binary):
+        from skimage.morphology import medial_axis
+        skeleton, dist = medial_axis(binary > 0, return_distance=True)
+        return skeleton, dist.astype(np.float32)
+
+
+class OpenCVThinningBackend(SkeletonBackend):
+    """cv2.ximgproc.thinning（Zhang-Suen，需要 opencv-contrib-python）"""
+
+    name = 'opencv'
+
+    def available(self):
+        return hasattr(cv2, 'ximgproc') and hasattr(cv2.ximgproc, 'thinning')
+
+    def skeletonize(self, binary):
+        thin = cv2.ximgproc.thinning(binary, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+        return thin > 0, cv2.distanceTransform(binary, cv2.DIST_L2, 5)
+
+
+# 默认按此顺序选择第一个可用的后端（顺序来自 benchmark_skeleton_backends 的实测结果：
+# skimage 在各测试图上都最快；opencv 细化在小图上快于 medial_axis，大图上慢一倍以上）
+SKELETON_BACKENDS = {backend.name: backend for backend in (
+    SkimageBackend(),
+    MedialAxisBackend(),
+    OpenCVThinningBackend(),
+)}
+
+
+def get_skeleton_backend(name=None):
+    """
+    按名称取骨架化后端；name 为 None 或该后端不可用时取默认顺序中第一个可用的
+
+    Args:
+        name: 'opencv' / 'skimage' / 'medial_axis' 或 None
+
+    Returns:
+        SkeletonBackend
+    """
+    if name is not None:
+        backend = SKELETON_BACKENDS.get(name)
+        if backend is not None and backend.available():
+            return backend
+        print(f"⚠️ 骨架化后端 {name} 不可用，改用默认后端")
+    for backend in SKELETON_BACKENDS.values():
+        if backend.available():
+            return backend
+    raise RuntimeError("没有可用的骨架化后端，请安装 scikit-image 或 opencv-contrib-python")
+
+
+def skeletonize_with_distance(binary, backend=None):
+    """
+    用指定（或默认）后端骨架化并计算距离变换，后端运行出错时依次换用其余可用后端
+
+    Args:
+        binary: 二值图（uint8，非零为线条）
+        backend: 后端名称，None 表示默认
+
+    Returns:
+        (skeleton, dist)
+    """
+    first = get_skeleton_backend(backend)
+    candidates = [first] + [b for b in SKELETON_BACKENDS.values() if b is not first and b.available()]
+    for i, candidate in enumerate(candidates):
+        try:
+            return candidate.skeletonize(binary)
+        except Exception as e:
+            if i == len(candidates) - 1:
+                raise
+            print(f"⚠️ 骨架化后端 {candidate.name} 出错（{e}），改用 {candidates[i + 1].name}")
+
+
+def benchmark_skeleton_backends(images, repeats=3):
+    """
+    在一组二值图上记录各后端的耗时（取多次运行的最短时间）
+
+    Args:
+        images: {名称: 二值图}
+        repeats: 每个后端每张图的运行次数
+
+    Returns:
+        {后端名称: {图像名称: 秒}}，不可用的后端记为 None
+    """
+    results = {}
+    for name, backend in SKELETON_BACKENDS.items():
+        if not backend.available():
+            results[name] = None
+            print(f"{name:12s} 不可用")
+            continue
+        results[name] = {}
+        for image_name, binary in images.items():
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                backend.skeletonize(binary)
+                best = min(best, time.perf_counter() - start)
+            results[name][image_name] = best
+        row = '  '.join(f"{image_name}={seconds * 1000:.1f}ms" for image_name, seconds in results[name].items())
+        print(f"{name:12s} {row}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='骨架化后端耗时对比')
+    parser.add_argument('-i', '--images', nargs='+', required=True, help='输入图像路径')
+    parser.add_argument('-r', '--repeats', type=int, default=3, help='每个后端每张图的运行次数')
+    args = parser.parse_args()
+
+    binaries = {}
+    for path in args.images:
+        gray = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        _, binaries[path] = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    benchmark_skeleton_backends(binaries, args.repeats)
@@ -0,0 +1,501 @@
+import cv2
+import numpy as np
+
+# 8 邻域偏移 (dy, dx)，4 邻域在前、对角在后
+NEIGHBOR_OFFSETS = ((-1, 0), (0, -1), (0, 1), (1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+class SkeletonGraph:
+    """骨架像素图：端点/交叉点为节点，节点之间的单像素链为边"""
+
+    def __init__(self, shape, node_xy, edges, edge_nodes):
+        """
+        Args:
+            shape: 骨架图像尺寸 (height, width)
+            node_xy: 节点代表坐标数组 (N, 2)，格式 (x, y)
+            edges: 边列表，每条边是 int32 数组 (k, 2)，格式 (x, y)，首尾为两端节点上的像素
+            edge_nodes: 每条边两端的节点编号数组 (E, 2)
+        """
+        self.shape = shape
+        self.node_xy = node_xy
+        self.edges = edges
+        self.edge_nodes = edge_nodes
+
+    @property
+    def num_nodes(self):
+        return len(self.node_xy)
+
+    @property
+    def num_edges(self):
+        return len(self.edges)
+
+    @property
+    def num_points(self):
+        return sum(len(edge) for edge in self.edges)
+
+    def lengths(self):
+        """
+        向量化计算每条边的弧长（像素）
+
+        Returns:
+            float 数组 (E,)
+        """
+        if not self.edges:
+            return np.zeros(0)
+        counts = np.array([len(edge) for edge in self.edges], dtype=np.int64)
+        points = np.concatenate(self.edges).astype(np.float64)
+        steps = np.zeros(len(points))
+        steps[:-1] = np.hypot(*np.diff(points, axis=0).T)
+        # 每条边最后一个点到下一条边起点的差分不计入
+        steps[np.cumsum(counts) - 1] = 0.0
+        return np.add.reduceat(steps, np.cumsum(counts) - counts)
+
+    def degrees(self):
+        """
+        计算每个节点的度数（自环计两次）
+
+        Returns:
+            int 数组 (N,)
+        """
+        return np.bincount(self.edge_nodes.ravel(), minlength=self.num_nodes)
+
+    def select(self, keep):
+        """
+        按布尔掩码或下标保留部分边，节点编号保持不变
+
+        Args:
+            keep: 长度为 E 的布尔数组，或边下标序列（可用于重排）
+
+        Returns:
+            新的 SkeletonGraph
+        """
+        keep = np.asarray(keep)
+        index = np.flatnonzero(keep) if keep.dtype == bool else keep.astype(np.int64)
+        edges = [self.edges[i] for i in index]
+        return SkeletonGraph(self.shape, self.node_xy, edges, self.edge_nodes[index].reshape(-1, 2))
+
+    def to_paths(self):
+        """
+        转换为 [(x, y), ...] 形式的路径列表
+
+        Returns:
+            路径列表
+        """
+        return [[(int(x), int(y)) for x, y in edge] for edge in self.edges]
+
+
+def count_neighbors(skeleton):
+    """
+    向量化统计每个骨架像素的 8 邻域骨架像素数量
+
+    Args:
+        skeleton: 骨架图像（非零为骨架）
+
+    Returns:
+        uint8 数组，非骨架像素处为 0
+    """
+    skel = skeleton > 0
+    h, w = skel.shape
+    padded = np.pad(skel, 1).astype(np.uint8)
+    count = np.zeros((h, w), dtype=np.uint8)
+    for dy, dx in NEIGHBOR_OFFSETS:
+        count += padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+    count[~skel] = 0
+    return count
+
+
+def trace_skeleton(skeleton):
+    """
+    将单像素宽骨架追踪为图：标记端点和交叉点，每条边只输出一次
+
+    邻居计数和邻接关系全部向量化计算，逐像素的行走只在预先编码好的
+    整数列表上进行。相邻的交叉像素合并为一个节点；只连接两条边的节点
+    （阶梯状拐角产生的伪交叉）会被消去，两侧的边合并为一条折线。
+    没有端点和交叉点的闭合环输出为首尾相同的自环边。
+
+    Args:
+        skeleton: 骨架图像（非零为骨架）
+
+    Returns:
+        SkeletonGraph
+    """
+    graph, _, _ = _trace(skeleton)
+    return merge_degree_two_nodes(graph)
+
+
+def trace_skeleton_tile(skeleton, seam_mask):
+    """
+    追踪分块骨架：接缝上的骨架像素强制作为节点且不会被消去，供拼接相邻分块使用
+
+    Args:
+        skeleton: 分块骨架图像（非零为骨架）
+        seam_mask: 与相邻分块接壤的像素（布尔图像）
+
+    Returns:
+        (graph, seam_xy, seam_nodes)：接缝骨架像素坐标 (x, y) 及其所属节点编号
+    """
+    forced = np.asarray(seam_mask, dtype=bool) & (np.asarray(skeleton) > 0)
+    graph, node_xy, node_label = _trace(skeleton, forced)
+    if len(node_label) == 0:
+        return graph, np.zeros((0, 2), np.int32), np.zeros(0, np.int64)
+    on_seam = forced[node_xy[:, 1], node_xy[:, 0]]
+    protected = np.zeros(graph.num_nodes, dtype=bool)
+    protected[node_label[on_seam]] = True
+    return merge_degree_two_nodes(graph, protected), node_xy[on_seam], node_label[on_seam]
+
+
+def _trace(skeleton, forced=None):
+    """
+    trace_skeleton 的追踪部分，不消去度 2 节点
+
+    Args:
+        skeleton: 骨架图像（非零为骨架）
+        forced: 额外强制作为节点的像素（布尔图像），None 表示没有
+
+    Returns:
+        (graph, node_pixel_xy, node_pixel_label)：所有节点像素的坐标及其节点编号
+    """
+    skel = np.ascontiguousarray(skeleton > 0)
+    h, w = skel.shape
+    W = w + 2
+    padded = np.pad(skel, 1)
+    flat = padded.ravel()
+    offsets = np.array([dy * W + dx for dy, dx in NEIGHBOR_OFFSETS], dtype=np.int64)
+
+    count = count_neighbors(skel)
+    count_flat = np.pad(count, 1).ravel()
+
+    # 链内像素：恰好两个邻居且不是强制节点
+    inner_flat = count_flat == 2
+    if forced is not None:
+        inner_flat &= ~np.pad(np.asarray(forced, dtype=bool), 1).ravel()
+
+    pixel_idx = np.flatnonzero(flat)
+    if len(pixel_idx) == 0:
+        empty = SkeletonGraph((h, w), np.zeros((0, 2), np.int32), [], np.zeros((0, 2), np.int32))
+        return empty, np.zeros((0, 2), np.int32), np.zeros(0, np.int64)
+
+    node_mask = ~inner_flat[pixel_idx]
+    node_idx = pixel_idx[node_mask]        # 节点像素（端点、交叉点、孤立点）
+    inner_idx = pixel_idx[~node_mask]      # 链内像素（恰好两个邻居）
+
+    # 交叉像素按 8 连通合并成簇，每个簇一个节点；端点和孤立点各自成为节点
+    junction = ((count >= 3) & skel).astype(np.uint8)
+    num_labels, labels = cv2.connectedComponents(junction, connectivity=8)
+    labels_flat = np.pad(labels, 1).ravel()
+    node_label = labels_flat[node_idx].astype(np.int64) - 1
+    single = node_label < 0
+    node_label[single] = (num_labels - 1) + np.arange(np.count_nonzero(single))
+    num_nodes = (num_labels - 1) + int(np.count_nonzero(single))
+
+    node_y = node_idx // W - 1
+    node_x = node_idx % W - 1
+    node_n = np.maximum(np.bincount(node_label, minlength=num_nodes), 1)
+    node_xy = np.stack([
+        np.rint(np.bincount(node_label, weights=node_x, minlength=num_nodes) / node_n),
+        np.rint(np.bincount(node_label, weights=node_y, minlength=num_nodes) / node_n),
+    ], axis=1).astype(np.int32)
+
+    # 邻居编码：链内像素用其在 inner_idx 中的序号 (>=0)，节点像素用 -(序号+1)
+    def encode(neighbors):
+        is_inner = inner_flat[neighbors]
+        codes = np.empty(len(neighbors), dtype=np.int64)
+        codes[is_inner] = np.searchsorted(inner_idx, neighbors[is_inner])
+        codes[~is_inner] = -np.searchsorted(node_idx, neighbors[~is_inner]) - 1
+        return codes
+
+    # 链内像素恰好有两个邻居，按行取出 (M, 2)
+    inner_nb = inner_idx[:, None] + offsets[None, :]
+    rows, cols = np.nonzero(flat[inner_nb])
+    inner_codes = encode(inner_nb[rows, cols]).reshape(-1, 2)
+    next_a = inner_codes[:, 0].tolist()
+    next_b = inner_codes[:, 1].tolist()
+
+    # 节点像素的邻居数量不定，展开后按节点像素分组
+    node_nb = node_idx[:, None] + offsets[None, :]
+    rows, cols = np.nonzero(flat[node_nb])
+    node_codes = encode(node_nb[rows, cols]).tolist()
+    node_starts = np.searchsorted(rows, np.arange(len(node_idx) + 1)).tolist()
+
+    node_label_list = node_label.tolist()
+    visited = [False] * len(inner_idx)
+    chains = []       # 每条边的像素编码序列
+    chain_nodes = []  # 每条边两端的节点编号
+
+    for k in range(len(node_idx)):
+        start_code = -k - 1
+        a = node_label_list[k]
+        for code in node_codes[node_starts[k]:node_starts[k + 1]]:
+            if code < 0:
+                # 两个节点像素直接相邻：属于不同节点时只从编号较小的一侧输出
+                b = node_label_list[-code - 1]
+                if a < b:
+                    chains.append([start_code, code])
+                    chain_nodes.append((a, b))
+                continue
+            if visited[code]:
+                continue
+            chain = [start_code]
+            prev, cur = start_code, code
+            while True:
+                visited[cur] = True
+                chain.append(cur)
+                nxt = next_a[cur]
+                if nxt == prev:
+                    nxt = next_b[cur]
+                if nxt < 0 or visited[nxt]:
+                    break
+                prev, cur = cur, nxt
+            if nxt < 0:
+                chain.append(nxt)
+                chain_nodes.append((a, node_label_list[-nxt - 1]))
+            else:
+                chain_nodes.append((a, a))
+            chains.append(chain)
+
+    # 剩余未访问的链内像素属于没有节点的闭合环，以起点为新节点输出自环
+    extra_xy = []
+    for s in range(len(inner_idx)):
+        if visited[s]:
+            continue
+        chain = []
+        prev, cur = next_b[s], s
+        while not visited[cur]:
+            visited[cur] = True
+            chain.append(cur)
+            nxt = next_a[cur]
+            if nxt == prev:
+                nxt = next_b[cur]
+            prev, cur = cur, nxt
+        chain.append(s)
+        v = num_nodes + len(extra_xy)
+        extra_xy.append((int(inner_idx[s] % W - 1), int(inner_idx[s] // W - 1)))
+        chains.append(chain)
+        chain_nodes.append((v, v))
+
+    if extra_xy:
+        node_xy = np.concatenate([node_xy, np.array(extra_xy, dtype=np.int32)])
+
+    # 编码批量还原为坐标
+    lengths = np.array([len(c) for c in chains], dtype=np.int64)
+    codes = np.fromiter((c for chain in chains for c in chain), dtype=np.int64, count=int(lengths.sum()))
+    flat_pos = np.empty(len(codes), dtype=np.int64)
+    is_inner = codes >= 0
+    flat_pos[is_inner] = inner_idx[codes[is_inner]]
+    flat_pos[~is_inner] = node_idx[-codes[~is_inner] - 1]
+    xy = np.stack([flat_pos % W - 1, flat_pos // W - 1], axis=1).astype(np.int32)
+    edges = np.split(xy, np.cumsum(lengths)[:-1]) if len(chains) else []
+    edge_nodes = np.array(chain_nodes, dtype=np.int64).reshape(-1, 2)
+
+    graph = SkeletonGraph((h, w), node_xy, edges, edge_nodes)
+    node_pixel_xy = np.stack([node_x, node_y], axis=1).astype(np.int32)
+    return graph, node_pixel_xy, node_label
+
+
+def _oriented(edge, ends, from_node):
+    """返回从 from_node 出发方向的边坐标及另一端节点"""
+    if ends[0] == from_node:
+        return edge, ends[1]
+    return edge[::-1], ends[0]
+
+
+def merge_degree_two_nodes(graph, protected=None):
+    """
+    消去度数为 2 的节点，把经过它们的边首尾相接合并为一条折线
+
+    Args:
+        graph: SkeletonGraph
+        protected: 不可消去的节点（布尔数组），None 表示没有
+
+    Returns:
+        合并后的 SkeletonGraph
+    """
+    num_edges = graph.num_edges
+    if num_edges == 0:
+        return graph
+
+    degree = graph.degrees()
+    ends = graph.edge_nodes.tolist()
+    incident = [[] for _ in range(graph.num_nodes)]
+    for e, (a, b) in enumerate(ends):
+        incident[a].append(e)
+        if b != a:
+            incident[b].append(e)
+
+    def passable(node, edge_id):
+        """判断能否穿过该节点继续延伸，返回下一条边或 None"""
+        if degree[node] != 2 or len(incident[node]) != 2:
+            return None
+        if protected is not None and protected[node]:
+            return None
+        e1, e2 = incident[node]
+        return e2 if e1 == edge_id else e1
+
+    used = [False] * num_edges
+    edges = []
+    edge_nodes = []
+
+    def extend(first, start_node):
+        pieces = []
+        e, node = first, start_node
+        while True:
+            used[e] = True
+            piece, node = _oriented(graph.edges[e], ends[e], node)
+            if pieces and len(piece) and np.array_equal(piece[0], pieces[-1][-1]):
+                piece = piece[1:]
+            pieces.append(piece)
+            if node == start_node:
+                break
+            nxt = passable(node, e)
+            if nxt is None or used[nxt]:
+                break
+            e = nxt
+        edges.append(np.concatenate(pieces) if len(pieces) > 1 else pieces[0])
+        edge_nodes.append((start_node, node))
+
+    # 先从真正的端点/交叉点出发，再处理只由度 2 节点构成的环
+    for e in range(num_edges):
+        if used[e]:
+            continue
+        for node in ends[e]:
+            if passable(node, e) is None:
+                extend(e, node)
+                break
+    for e in range(num_edges):
+        if not used[e]:
+            extend(e, ends[e][0])
+
+    return SkeletonGraph(graph.shape, graph.node_xy, edges,
+                         np.array(edge_nodes, dtype=np.int64).reshape(-1, 2))
+
+
+def prune_spurs(graph, min_length, max_rounds=3):
+    """
+    剪除短毛刺：一端是端点、另一端是交叉点且弧长小于 min_length 的边
+
+    候选毛刺按交叉点分组向量化筛选，每个交叉点至少保留两条边，
+    避免一整条短笔画被剪光。剪除后交叉点可能退化为度 2 节点，
+    合并两侧的边后再检查新产生的毛刺，最多 max_rounds 轮。
+
+    Args:
+        graph: SkeletonGraph
+        min_length: 毛刺长度阈值（原图像素）
+        max_rounds: 最多迭代轮数
+
+    Returns:
+        (剪除后的 SkeletonGraph, 剪除的边数, 剪除的点数)
+    """
+    removed_edges = 0
+    removed_points = 0
+    for _ in range(max_rounds):
+        if graph.num_edges == 0:
+            break
+        degree = graph.degrees()
+        ends = graph.edge_nodes
+        lengths = graph.lengths()
+        deg_a = degree[ends[:, 0]]
+        deg_b = degree[ends[:, 1]]
+        is_spur = ((deg_a == 1) & (deg_b >= 3)) | ((deg_b == 1) & (deg_a >= 3))
+        junction = np.where(deg_a >= 3, ends[:, 0], ends[:, 1])
+        candidates = np.flatnonzero(is_spur & (lengths < min_length))
+        if len(candidates) == 0:
+            break
+
+        # 同一交叉点上的候选按长度排序，最多剪去 degree - 2 条
+        node = junction[candidates]
+        order = np.lexsort((lengths[candidates], node))
+        candidates, node = candidates[order], node[order]
+        group_start = np.concatenate([[0], np.flatnonzero(np.diff(node)) + 1])
+        group_size = np.diff(np.concatenate([group_start, [len(node)]]))
+        rank = np.arange(len(node)) - np.repeat(group_start, group_size)
+        candidates = candidates[rank < degree[node] - 2]
+        if len(candidates) == 0:
+            break
+
+        keep = np.ones(graph.num_edges, dtype=bool)
+        keep[candidates] = False
+        removed_edges += len(candidates)
+        removed_points += sum(len(graph.edges[e]) for e in candidates)
+        graph = merge_degree_two_nodes(graph.select(keep))
+    return graph, removed_edges, removed_points
+
+
+def smooth_runs(labels, min_run):
+    """
+    把短于 min_run 个点的标签段并入相邻较长的一段，避免标签来回抖动
+
+    Args:
+        labels: 每个点的整数标签数组
+        min_run: 最短段长（点数）
+
+    Returns:
+        平滑后的标签数组
+    """
+    labels = np.asarray(labels)
+    if min_run <= 1 or len(labels) == 0:
+        return labels
+    starts = np.concatenate([[0], np.flatnonzero(labels[1:] != labels[:-1]) + 1])
+    values = labels[starts].tolist()
+    sizes = np.diff(np.concatenate([starts, [len(labels)]])).tolist()
+    while len(sizes) > 1:
+        k = min(range(len(sizes)), key=sizes.__getitem__)
+        if sizes[k] >= min_run:
+            break
+        # 并入左右邻居中较长的一段，相同值的相邻段随之合并
+        if k == 0 or (k + 1 < len(sizes) and sizes[k + 1] > sizes[k - 1]):
+            target = k + 1
+        else:
+            target = k - 1
+        sizes[target] += sizes[k]
+        del sizes[k]
+        del values[k]
+        i = 1
+        while i < len(values):
+            if values[i] == values[i - 1]:
+                sizes[i - 1] += sizes.pop(i)
+                values.pop(i)
+            else:
+                i += 1
+    return np.repeat(values, sizes).astype(labels.dtype)
+
+
+def split_edges(graph, point_labels, min_run=1):
+    """
+    在每条边的点标签变化处切开，切点成为新节点并由前后两段共享
+
+    Args:
+        graph: SkeletonGraph
+        point_labels: 与 graph.edges 一一对应的每点标签数组列表
+        min_run: 短于该点数的标签段先并入相邻段
+
+    Returns:
+        (切分后的 SkeletonGraph, 每条新边的标签列表)
+    """
+    new_xy = []
+    next_node = graph.num_nodes
+    edges = []
+    edge_nodes = []
+    edge_labels = []
+    for edge, (a, b), labels in zip(graph.edges, graph.edge_nodes.tolist(), point_labels):
+        labels = smooth_runs(labels, min_run)
+        cuts = (np.flatnonzero(labels[1:] != labels[:-1]) + 1).tolist()
+        bounds = [0] + cuts + [len(edge) - 1]
+        start_node = a
+        for k in range(len(bounds) - 1):
+            s, e = bounds[k], bounds[k + 1]
+            if k < len(bounds) - 2:
+                end_node = next_node
+                next_node += 1
+                new_xy.append(edge[e])
+            else:
+                end_node = b
+            edges.append(edge[s:e + 1])
+            edge_nodes.append((start_node, end_node))
+            edge_labels.append(int(labels[s]))
+            start_node = end_node
+
+    node_xy = graph.node_xy
+    if new_xy:
+        node_xy = np.concatenate([node_xy, np.array(new_xy, dtype=node_xy.dtype).reshape(-1, 2)])
+    split = SkeletonGraph(graph.shape, node_xy, edges, np.array(edge_nodes, dtype=np.int64).reshape(-1, 2))
+    return split, edge_labels
@@ -0,0 +1,229 @@
+import heapq
+import math
+import numpy as np
+
+# 单个格子内的点数超过该值时，在格内按这些点的分布再建一层细网格
+MAX_CELL_POINTS = 32
+# 最大细分层数（大量重合的点无法再细分）
+MAX_DEPTH = 8
+
+
+def _fine_cell_size(points):
+    """细分一个拥挤格子时的网格边长，点全部重合时返回 None"""
+    w, h = (points.max(axis=0) - points.min(axis=0)).tolist()
+    if max(w, h) <= 0:
+        return None
+    n = len(points)
+    # 共线的点面积为 0，此时按长边上平均每格约 2 个点估算
+    return max(math.sqrt(2.0 * w * h / n), 2.0 * max(w, h) / n)
+
+
+class _GridLevel:
+    """一层均匀网格，点过多的格子由下一层细网格代替"""
+
+    def __init__(self, grid, idx, cell_size, depth=0, parent=None):
+        self.parent = parent
+        self.num_alive = len(idx)
+        self.cell_size = max(float(cell_size), 1e-6)
+        self.cells = {}
+        # 点全部重合、无法细分的拥挤格子，成员按序号降序存放
+        self.stacked = set()
+        if len(idx) == 0:
+            self.min_cell = self.max_cell = (0, 0)
+            return
+        cell = np.floor(grid.points[idx] / self.cell_size).astype(np.int64)
+        order = np.lexsort((cell[:, 1], cell[:, 0]))
+        cell, idx = cell[order], idx[order]
+        change = np.flatnonzero(np.any(np.diff(cell, axis=0) != 0, axis=1)) + 1
+        bounds = np.concatenate([[0], change, [len(idx)]]).tolist()
+        cell_list = cell.tolist()
+        idx_list = idx.tolist()
+        owner = grid._owner
+        for s, e in zip(bounds[:-1], bounds[1:]):
+            key = tuple(cell_list[s])
+            if e - s > MAX_CELL_POINTS and depth < MAX_DEPTH:
+                fine = _fine_cell_size(grid.points[idx[s:e]])
+                if fine is not None:
+                    self.cells[key] = _GridLevel(grid, idx[s:e], fine, depth + 1, self)
+                    continue
+                self.stacked.add(key)
+            members = idx_list[s:e]
+            if key in self.stacked:
+                members.reverse()
+            self.cells[key] = members
+            for i in members:
+                owner[i] = self
+        self.min_cell = tuple(cell.min(axis=0).tolist())
+        self.max_cell = tuple(cell.max(axis=0).tolist())
+
+    def _ring_cells(self, cx, cy, r):
+        """枚举以 (cx, cy) 为中心、切比雪夫半径为 r 的一圈网格"""
+        if r == 0:
+            yield cx, cy
+            return
+        x0, x1 = max(cx - r, self.min_cell[0]), min(cx + r, self.max_cell[0])
+        y0, y1 = max(cy - r, self.min_cell[1]), min(cy + r, self.max_cell[1])
+        for x in range(x0, x1 + 1):
+            if cy - r >= self.min_cell[1]:
+                yield x, cy - r
+            if cy + r <= self.max_cell[1]:
+                yield x, cy + r
+        for y in range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1):
+            if cx - r >= self.min_cell[0]:
+                yield cx - r, y
+            if cx + r <= self.max_cell[0]:
+                yield cx + r, y
+
+    def _cell_dist2(self, key, x, y):
+        """查询点到一个格子的最小距离平方"""
+        cs = self.cell_size
+        dx = max(key[0] * cs - x, 0.0, x - (key[0] + 1) * cs)
+        dy = max(key[1] * cs - y, 0.0, y - (key[1] + 1) * cs)
+        return dx * dx + dy * dy
+
+    def search(self, grid, x, y, k, heap, limit2):
+        """
+        由近到远搜索本层，把更近的存活点放入 heap
+
+        heap 是以 (-距离平方, -序号) 为元素、最多 k 个元素的堆，堆顶是
+        当前结果中最远的点；距离相同时保留序号较小的点。
+        """
+        cs = self.cell_size
+        cx, cy = int(math.floor(x / cs)), int(math.floor(y / cs))
+        (x0, y0), (x1, y1) = self.min_cell, self.max_cell
+        # 查询点在本层范围外时，更近的圈里没有格子
+        min_r = max(x0 - cx, cx - x1, y0 - cy, cy - y1, 0)
+        max_r = max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1))
+        xs, ys, alive, cells, stacked = grid._xs, grid._ys, grid.alive, self.cells, self.stacked
+        for r in range(min_r, max_r + 1):
+            bound2 = -heap[0][0] if len(heap) >= k else limit2
+            # 第 r 圈内的点到查询点的距离至少为 (r - 1) * cs
+            d = (r - 1) * cs
+            if d > 0 and d * d > bound2:
+                break
+            for key in self._ring_cells(cx, cy, r):
+                members = cells.get(key)
+                if not members:
+                    continue
+                if type(members) is _GridLevel:
+                    if members.num_alive and self._cell_dist2(key, x, y) <= bound2:
+                        members.search(grid, x, y, k, heap, limit2)
+                        bound2 = -heap[0][0] if len(heap) >= k else limit2
+                    continue
+                if key in stacked:
+                    # 重合的点距离相同，只需要序号最小的 k 个存活点
+                    while members and not alive[members[-1]]:
+                        members.pop()
+                    picked = []
+                    for i in reversed(members):
+                        if alive[i]:
+                            picked.append(i)
+                            if len(picked) == k:
+                                break
+                    members = picked
+                dead = 0
+                for i in members:
+                    if not alive[i]:
+                        dead += 1
+                        continue
+                    dx = xs[i] - x
+                    dy = ys[i] - y
+                    d2 = dx * dx + dy * dy
+                    if d2 > bound2:
+                        continue
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d2, -i))
+                    elif (-d2, -i) > heap[0]:
+                        heapq.heapreplace(heap, (-d2, -i))
+                    else:
+                        continue
+                    if len(heap) >= k:
+                        bound2 = -heap[0][0]
+                # 已删除的点过半时压缩格子，避免反复扫描
+                if dead * 2 > len(members):
+                    cells[key] = [i for i in members if alive[i]]
+
+
+class SpatialGrid:
+    """
+    自适应网格空间索引，支持最近邻查询和删除点
+
+    顶层是均匀网格，点数超过 MAX_CELL_POINTS 的格子在格内按这些点的
+    范围再建一层细网格，端点高度聚集时查询也不会退化为逐点扫描。
+    """
+
+    def __init__(self, points, cell_size=None):
+        """
+        Args:
+            points: 点坐标数组 (N, 2)
+            cell_size: 顶层网格边长，默认按平均每格约 2 个点估算
+        """
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        # 逐点查询在 Python 列表上进行，避免 NumPy 标量索引的开销
+        self._xs = self.points[:, 0].tolist()
+        self._ys = self.points[:, 1].tolist()
+        self.alive = [True] * len(self.points)
+        self.num_alive = len(self.points)
+        self._build(cell_size)
+
+    def _build(self, cell_size=None):
+        """按当前存活的点重建网格"""
+        idx = np.flatnonzero(self.alive)
+        self._built_alive = len(idx)
+        if cell_size is None:
+            if len(idx):
+                lo = self.points[idx].min(axis=0)
+                hi = self.points[idx].max(axis=0)
+                area = max(float(np.prod(hi - lo + 1.0)), 1.0)
+                cell_size = math.sqrt(2.0 * area / len(idx))
+            else:
+                cell_size = 1.0
+        # 每个点所在的最内层网格，删除时沿父层更新存活计数
+        self._owner = [None] * len(self.points)
+        self._root = _GridLevel(self, idx, cell_size)
+
+    def remove(self, i):
+        """删除一个点（惰性删除，存活点过少时重建网格）"""
+        if not self.alive[i]:
+            return
+        self.alive[i] = False
+        self.num_alive -= 1
+        level = self._owner[i]
+        while level is not None:
+            level.num_alive -= 1
+            level = level.parent
+        if self.num_alive and self.num_alive * 4 < self._built_alive:
+            self._build()
+
+    def nearest(self, x, y, max_dist=math.inf):
+        """
+        查询距离 (x, y) 最近的存活点
+
+        Args:
+            x, y: 查询坐标
+            max_dist: 最大搜索距离
+
+        Returns:
+            (index, distance)，找不到时返回 (-1, inf)
+        """
+        if self.num_alive == 0:
+            return -1, math.inf
+        heap = []
+        self._root.search(self, x, y, 1, heap, max_dist * max_dist)
+        if not heap:
+            return -1, math.inf
+        d2, i = heap[0]
+        return -i, math.sqrt(-d2)
+
+    def k_nearest(self, x, y, k):
+        """
+        查询距离 (x, y) 最近的 k 个存活点
+
+        Returns:
+            按距离升序的点序号列表
+        """
+        if self.num_alive == 0 or k <= 0:
+            return []
+        heap = []
+        self._root.search(self, x, y, k, heap, math.inf)
+        return [-i for _, i in sorted(heap, reverse=True)]
@@ -0,0 +1,101 @@
+import hashlib
+import time
+
+
+class Stage:
+    """流水线中的一个阶段：由上游阶段的输出和自身参数计算输出"""
+
+    def __init__(self, name, func, inputs=(), params=(), fingerprint=None):
+        """
+        Args:
+            name: 阶段名称
+            func: 计算函数 func(*上游输出, **参数)
+            inputs: 上游阶段名称列表，按顺序作为位置参数传入
+            params: 本阶段使用的参数名列表，作为关键字参数传入
+            fingerprint: 可选函数 fingerprint(**参数)，返回额外的缓存键内容
+                         （例如输入文件的修改时间和大小，文件变化时重新计算）
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        self.fingerprint = fingerprint
+
+
+class StagePipeline:
+    """
+    按阶段缓存的流水线（有向无环图）
+
+    每个阶段的缓存键由上游阶段的缓存键和本阶段参数的取值组成，只保留每个阶段
+    最近一次的输出。修改某个参数后重新运行时，只有使用该参数的阶段及其下游阶段
+    重新计算，其余阶段直接复用上次的输出。
+    """
+
+    def __init__(self, stages, defaults=None):
+        """
+        Args:
+            stages: Stage 列表
+            defaults: 参数默认值 {参数名: 取值}
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.defaults = dict(defaults or {})
+        self._cache = {}
+        self.last_timings = []
+
+    def run(self, target, **params):
+        """
+        计算目标阶段的输出，参数未给出的取默认值
+
+        Args:
+            target: 目标阶段名称
+            **params: 覆盖默认值的参数
+
+        Returns:
+            目标阶段的输出
+        """
+        values = dict(self.defaults)
+        values.update(params)
+        self.last_timings = []
+        resolved = {}
+
+        def compute(name):
+            if name in resolved:
+                return resolved[name]
+            stage = self.stages[name]
+            upstream = [compute(dep) for dep in stage.inputs]
+            kwargs = {param: values[param] for param in stage.params}
+            digest = hashlib.sha1(name.encode('utf-8'))
+            for key, _ in upstream:
+                digest.update(key.encode('utf-8'))
+            digest.update(repr(sorted(kwargs.items())).encode('utf-8'))
+            if stage.fingerprint is not None:
+                digest.update(repr(stage.fingerprint(**kwargs)).encode('utf-8'))
+            key = digest.hexdigest()
+
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == key:
+                self.last_timings.append((name, None))
+                resolved[name] = cached
+                return cached
+            start = time.perf_counter()
+            output = stage.func(*[value for _, value in upstream], **kwargs)
+            self.last_timings.append((name, time.perf_counter() - start))
+            self._cache[name] = (key, output)
+            resolved[name] = (key, output)
+            return resolved[name]
+
+        return compute(target)[1]
+
+    def invalidate(self, name=None):
+        """丢弃指定阶段（None 表示全部）的缓存输出"""
+        if name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(name, None)
+
+    def timing_summary(self):
+        """最近一次 run 各阶段的复用/耗时情况"""
+        parts = []
+        for name, seconds in self.last_timings:
+            parts.append(f"{name}=复用" if seconds is None else f"{name}={seconds * 1000:.0f}ms")
+        return ", ".join(parts)
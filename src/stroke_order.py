@@ -0,0 +1,284 @@
+import math
+import time
+import numpy as np
+from .spatial_grid import SpatialGrid
+
+
+def stroke_endpoints(paths):
+    """
+    取出每条笔画的起点和终点
+
+    Args:
+        paths: 路径列表
+
+    Returns:
+        (starts, ends)，均为 float 数组 (N, 2)
+    """
+    starts = np.array([path[0] for path in paths], dtype=np.float64).reshape(-1, 2)
+    ends = np.array([path[-1] for path in paths], dtype=np.float64).reshape(-1, 2)
+    return starts, ends
+
+
+def pen_up_distance(paths, start_point=None):
+    """
+    计算按当前顺序绘制时的抬笔移动总距离
+
+    Args:
+        paths: 路径列表
+        start_point: 绘制前的笔位置，None 表示不计第一段
+
+    Returns:
+        总距离
+    """
+    if not paths:
+        return 0.0
+    starts, ends = stroke_endpoints(paths)
+    total = float(np.hypot(*(starts[1:] - ends[:-1]).T).sum())
+    if start_point is not None:
+        total += math.hypot(starts[0][0] - start_point[0], starts[0][1] - start_point[1])
+    return total
+
+
+def nearest_neighbor_order(starts, ends, start_point):
+    """
+    最近邻贪心：每次走向距离当前笔位置最近的未绘制笔画端点
+
+    Args:
+        starts, ends: 笔画起点/终点数组 (N, 2)
+        start_point: 初始笔位置
+
+    Returns:
+        (order, reverse) 两个列表
+    """
+    n = len(starts)
+    # 端点编号：i 为第 i 条笔画的起点，n + i 为终点
+    grid = SpatialGrid(np.concatenate([starts, ends]))
+    order = []
+    reverse = []
+    x, y = start_point
+    for _ in range(n):
+        hit, _ = grid.nearest(x, y)
+        stroke = hit % n
+        flipped = hit >= n
+        grid.remove(stroke)
+        grid.remove(stroke + n)
+        order.append(stroke)
+        reverse.append(flipped)
+        x, y = starts[stroke] if flipped else ends[stroke]
+    return order, reverse
+
+
+def refine_order(starts, ends, order, reverse, start_point, time_limit=0.5, neighbors=8):
+    """
+    在时间限制内用 2-opt 和 Or-opt 改进笔画顺序
+
+    候选移动只在空间近邻之间产生（每个端点取 neighbors 个近邻），
+    每轮代价为 O(n * neighbors)。2-opt 把一段笔画整体倒序并翻转方向，
+    Or-opt 把单条笔画挪到近邻笔画的前后并可翻转方向。
+
+    Args:
+        starts, ends: 笔画起点/终点数组 (N, 2)
+        order, reverse: 初始顺序和方向
+        start_point: 初始笔位置
+        time_limit: 时间限制（秒）
+        neighbors: 每个端点的候选近邻数量
+
+    Returns:
+        (order, reverse) 两个列表
+    """
+    n = len(order)
+    if n < 3 or time_limit <= 0:
+        return list(order), list(reverse)
+    deadline = time.perf_counter() + time_limit
+
+    sx, sy = starts[:, 0].tolist(), starts[:, 1].tolist()
+    ex, ey = ends[:, 0].tolist(), ends[:, 1].tolist()
+    ox, oy = float(start_point[0]), float(start_point[1])
+    seq = list(order)
+    flip = [bool(r) for r in reverse]
+    pos = [0] * n
+    for t, s in enumerate(seq):
+        pos[s] = t
+    hypot = math.hypot
+
+    def head(t):
+        s = seq[t]
+        return (ex[s], ey[s]) if flip[t] else (sx[s], sy[s])
+
+    def tail(t):
+        if t < 0:
+            return ox, oy
+        s = seq[t]
+        return (sx[s], sy[s]) if flip[t] else (ex[s], ey[s])
+
+    def link(t):
+        """第 t 条笔画之前的抬笔距离，t == n 时为 0"""
+        if t >= n:
+            return 0.0
+        (ax, ay), (bx, by) = tail(t - 1), head(t)
+        return hypot(ax - bx, ay - by)
+
+    def try_reverse(i, j):
+        """尝试倒序 [i, j]，新连接为 tail(i-1)-tail(j) 与 head(i)-head(j+1)"""
+        if i < 0 or j >= n or i > j:
+            return False
+        (ax, ay), (bx, by) = tail(i - 1), tail(j)
+        gain_new = hypot(ax - bx, ay - by)
+        if j + 1 < n:
+            (cx, cy), (dx, dy) = head(i), head(j + 1)
+            gain_new += hypot(cx - dx, cy - dy)
+        if gain_new - link(i) - link(j + 1) >= -1e-9:
+            return False
+        seq[i:j + 1] = seq[i:j + 1][::-1]
+        flip[i:j + 1] = [not f for f in flip[i:j + 1][::-1]]
+        for t in range(i, j + 1):
+            pos[seq[t]] = t
+        return True
+
+    def try_move(t, u, flipped):
+        """尝试把第 t 条笔画移到第 u 条之前（u == n 表示末尾），flipped 表示翻转方向"""
+        if u == t or u == t + 1 or u < 0 or u > n:
+            return False
+        removed = link(t) + link(t + 1)
+        if t + 1 < n:
+            (px, py), (qx, qy) = tail(t - 1), head(t + 1)
+            removed -= hypot(px - qx, py - qy)
+        h, e = head(t), tail(t)
+        if flipped:
+            h, e = e, h
+        (ax, ay) = tail(u - 1)
+        added = hypot(ax - h[0], ay - h[1])
+        if u < n:
+            bx, by = head(u)
+            added += hypot(e[0] - bx, e[1] - by) - link(u)
+        if added - removed >= -1e-9:
+            return False
+        s, f = seq.pop(t), flip.pop(t)
+        target = u if u < t else u - 1
+        seq.insert(target, s)
+        flip.insert(target, f != flipped)
+        for k in range(min(t, target), max(t, target) + 1):
+            pos[seq[k]] = k
+        return True
+
+    grid = SpatialGrid(np.concatenate([starts, ends]))
+    checks = 0
+    improved = True
+    while improved:
+        improved = False
+        for t in range(-1, n):
+            checks += 1
+            if checks % 8 == 0 and time.perf_counter() > deadline:
+                return seq, flip
+            # 2-opt：让 tail(t) 与近邻笔画的 tail 相连，再让 head(t) 与近邻笔画的 head 相连
+            px, py = tail(t)
+            for hit in grid.k_nearest(px, py, neighbors):
+                u = pos[hit % n]
+                if u == t:
+                    continue
+                p, q = min(t, u), max(t, u)
+                if try_reverse(p + 1, q):
+                    improved = True
+                    px, py = tail(t)
+            if t < 0:
+                continue
+            px, py = head(t)
+            for hit in grid.k_nearest(px, py, neighbors):
+                u = pos[hit % n]
+                if u == t:
+                    continue
+                p, q = min(t, u), max(t, u)
+                if try_reverse(p, q - 1):
+                    improved = True
+                    px, py = head(t)
+            # Or-opt：把第 t 条笔画挪到近邻笔画的前面或后面
+            px, py = head(t)
+            for hit in grid.k_nearest(px, py, neighbors):
+                u = pos[hit % n]
+                if u == t:
+                    continue
+                if (try_move(t, u, False) or try_move(t, u, True)
+                        or try_move(t, u + 1, False) or try_move(t, u + 1, True)):
+                    improved = True
+                    break
+    return seq, flip
+
+
+def order_strokes(paths, start_point=None, time_limit=0.5, neighbors=8):
+    """
+    选择笔画的绘制顺序和方向，减少抬笔移动距离
+
+    先用网格索引做最近邻贪心（O(n log n) 量级），再在时间限制内用
+    2-opt / Or-opt 局部改进。
+
+    Args:
+        paths: 路径列表
+        start_point: 初始笔位置，默认取所有端点的左上角
+        time_limit: 局部改进的时间限制（秒），0 表示只做最近邻
+        neighbors: 局部改进时每个端点的候选近邻数量
+
+    Returns:
+        (order, reverse)：笔画下标顺序以及每条笔画是否倒序绘制
+    """
+    if not paths:
+        return [], []
+    starts, ends = stroke_endpoints(paths)
+    if start_point is None:
+        both = np.concatenate([starts, ends])
+        start_point = (both[:, 0].min(), both[:, 1].min())
+    order, reverse = nearest_neighbor_order(starts, ends, start_point)
+    return refine_order(starts, ends, order, reverse, start_point, time_limit, neighbors)
+
+
+def order_strokes_grouped(paths, groups, start_point=None, time_limit=0.5, neighbors=8):
+    """
+    分组排序：按分组键升序依次绘制各组，组内按空间顺序排列
+
+    用于画笔档位分批：每个档位只切换一次画笔，组内仍然缩短抬笔移动。
+    下一组从上一组最后一条笔画的终点出发，时间限制按笔画数分配给各组。
+
+    Args:
+        paths: 路径列表
+        groups: 每条路径的分组键
+        start_point: 初始笔位置，默认取所有端点的左上角
+        time_limit: 局部改进的总时间限制（秒）
+        neighbors: 局部改进时每个端点的候选近邻数量
+
+    Returns:
+        (order, reverse)
+    """
+    if not paths:
+        return [], []
+    if start_point is None:
+        starts, ends = stroke_endpoints(paths)
+        both = np.concatenate([starts, ends])
+        start_point = (both[:, 0].min(), both[:, 1].min())
+    order = []
+    reverse = []
+    for group in sorted(set(groups)):
+        members = [i for i, g in enumerate(groups) if g == group]
+        subset = [paths[i] for i in members]
+        sub_order, sub_reverse = order_strokes(subset, start_point,
+                                               time_limit * len(members) / len(paths), neighbors)
+        order.extend(members[i] for i in sub_order)
+        reverse.extend(sub_reverse)
+        last = subset[sub_order[-1]]
+        start_point = last[0] if sub_reverse[-1] else last[-1]
+    return order, reverse
+
+
+def apply_order(paths, order, reverse, *columns):
+    """
+    按 order_strokes 的结果重排路径（需要时倒序），并同步重排附带的列
+
+    Args:
+        paths: 路径列表
+        order, reverse: order_strokes 的返回值
+        columns: 与路径一一对应的其他列表（如笔画宽度）
+
+    Returns:
+        (paths, *columns)
+    """
+    ordered = [paths[i][::-1] if rev else paths[i] for i, rev in zip(order, reverse)]
+    reordered = [[column[i] for i in order] for column in columns]
+    return (ordered, *reordered)
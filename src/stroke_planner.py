@@ -0,0 +1,275 @@
+import numpy as np
+from .spatial_grid import SpatialGrid
+
+
+def pair_odd_vertices(points):
+    """
+    贪心配对：按空间顺序依次为每个未配对点匹配最近的未配对点
+
+    Args:
+        points: 点坐标数组 (N, 2)，N 为偶数
+
+    Returns:
+        配对列表 [(i, j), ...]
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 2:
+        return []
+    grid = SpatialGrid(points)
+    order = np.lexsort((points[:, 0], points[:, 1])).tolist()
+    pairs = []
+    for i in order:
+        if not grid.alive[i]:
+            continue
+        grid.remove(i)
+        j, _ = grid.nearest(points[i, 0], points[i, 1])
+        if j < 0:
+            break
+        grid.remove(j)
+        pairs.append((i, j))
+    return pairs
+
+
+def plan_pen_routes(graph, edge_keys=None):
+    """
+    为骨架图规划最少抬笔的连续绘制路线（中国邮递员式）
+
+    每个连通分量中的奇度节点两两贪心配对，加入虚拟的抬笔边后所有节点
+    均为偶度，用 Hierholzer 算法求欧拉回路，再在虚拟边处断开。
+    含 2k 个奇度节点的分量得到 k 条路线，没有奇度节点的分量得到 1 条。
+    edge_keys 不同的边（例如不同画笔档位）不会合并到同一条路线。
+
+    Args:
+        graph: SkeletonGraph
+        edge_keys: 每条边的分组键，None 表示全部同组
+
+    Returns:
+        路线列表，每条路线是 [(edge_id, reversed), ...]
+    """
+    num_edges = graph.num_edges
+    if num_edges == 0:
+        return []
+    if edge_keys is None:
+        edge_keys = np.zeros(num_edges, dtype=np.int64)
+    edge_keys = np.asarray(edge_keys)
+
+    # 按 (分组键, 节点) 重新编号顶点，不同分组在同一交叉点互不相连
+    _, key_ids = np.unique(edge_keys, return_inverse=True)
+    key_ids = key_ids.reshape(-1)
+    stacked = np.stack([key_ids, key_ids]).T * graph.num_nodes + graph.edge_nodes
+    vertex_keys, ends = np.unique(stacked.ravel(), return_inverse=True)
+    ends = ends.reshape(-1, 2)
+    num_vertices = len(vertex_keys)
+    vertex_xy = graph.node_xy[vertex_keys % graph.num_nodes]
+
+    # 奇度顶点配对，作为虚拟边追加在真实边之后
+    degree = np.bincount(ends.ravel(), minlength=num_vertices)
+    odd = np.flatnonzero(degree % 2 == 1)
+    pairs = pair_odd_vertices(vertex_xy[odd])
+    ends_list = ends.tolist()
+    for i, j in pairs:
+        ends_list.append([int(odd[i]), int(odd[j])])
+
+    adjacency = [[] for _ in range(num_vertices)]
+    for e, (a, b) in enumerate(ends_list):
+        adjacency[a].append(e)
+        if b != a:
+            adjacency[b].append(e)
+    pointer = [0] * num_vertices
+    used = [False] * len(ends_list)
+
+    def euler_circuit(start):
+        """迭代式 Hierholzer，返回 [(vertex, 到达该顶点所走的边), ...]"""
+        stack = [(start, -1)]
+        circuit = []
+        while stack:
+            v, _ = stack[-1]
+            edges_v = adjacency[v]
+            while pointer[v] < len(edges_v) and used[edges_v[pointer[v]]]:
+                pointer[v] += 1
+            if pointer[v] == len(edges_v):
+                circuit.append(stack.pop())
+            else:
+                e = edges_v[pointer[v]]
+                used[e] = True
+                a, b = ends_list[e]
+                stack.append((b if a == v else a, e))
+        circuit.reverse()
+        return circuit
+
+    routes = []
+    # 先从奇度顶点出发，保证每条路线从虚拟边之后开始
+    starts = odd.tolist() + list(range(num_vertices))
+    for start in starts:
+        if pointer[start] >= len(adjacency[start]):
+            continue
+        circuit = euler_circuit(start)
+        steps = []
+        prev = circuit[0][0]
+        for v, e in circuit[1:]:
+            steps.append((e, ends_list[e][0] != prev))
+            prev = v
+        if not steps:
+            continue
+
+        # 在虚拟边处切开闭合回路
+        virtual = [k for k, (e, _) in enumerate(steps) if e >= num_edges]
+        if virtual:
+            first = virtual[0]
+            steps = steps[first + 1:] + steps[:first + 1]
+        route = []
+        for e, rev in steps:
+            if e >= num_edges:
+                if route:
+                    routes.append(route)
+                route = []
+            else:
+                route.append((e, rev))
+        if route:
+            routes.append(route)
+    return routes
+
+
+def routes_to_paths(graph, routes):
+    """
+    按路线把边拼接成连续折线，相接处重复的像素只保留一个
+
+    Args:
+        graph: SkeletonGraph
+        routes: plan_pen_routes 返回的路线列表
+
+    Returns:
+        折线列表，每条是 int32 数组 (k, 2)
+    """
+    paths = []
+    for route in routes:
+        pieces = []
+        for e, rev in route:
+            piece = graph.edges[e][::-1] if rev else graph.edges[e]
+            if pieces and np.array_equal(piece[0], pieces[-1][-1]):
+                piece = piece[1:]
+            pieces.append(piece)
+        paths.append(np.concatenate(pieces) if len(pieces) > 1 else pieces[0])
+    return paths
+
+
+def close_point_pairs(points, radius):
+    """
+    用均匀网格哈希向量化查找距离不超过 radius 的所有点对
+
+    网格边长取 radius，每个点只需与自身格子及 4 个“前向”相邻格子比较，
+    同一对不会重复出现。
+
+    Args:
+        points: 点坐标数组 (N, 2)
+        radius: 距离阈值
+
+    Returns:
+        (i, j, dist) 三个数组，每对点只出现一次
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    empty = np.zeros(0, dtype=np.int64)
+    if len(points) < 2 or radius <= 0:
+        return empty, empty, np.zeros(0)
+    cell = np.floor(points / radius).astype(np.int64)
+    cell -= cell.min(axis=0)
+    span = int(cell[:, 1].max()) + 3
+    keys = cell[:, 0] * span + cell[:, 1]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    pairs_i = []
+    pairs_j = []
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        target = keys + dx * span + dy
+        lo = np.searchsorted(sorted_keys, target, side='left')
+        hi = np.searchsorted(sorted_keys, target, side='right')
+        counts = hi - lo
+        if counts.sum() == 0:
+            continue
+        i = np.repeat(np.arange(len(points)), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(lo, counts) + within]
+        if dx == 0 and dy == 0:
+            mask = i < j
+            i, j = i[mask], j[mask]
+        pairs_i.append(i)
+        pairs_j.append(j)
+    if not pairs_i:
+        return empty, empty, np.zeros(0)
+    i = np.concatenate(pairs_i)
+    j = np.concatenate(pairs_j)
+    dist = np.hypot(*(points[i] - points[j]).T)
+    mask = dist <= radius
+    return i[mask], j[mask], dist[mask]
+
+
+def bridge_gaps(paths, max_gap):
+    """
+    端点间隙桥接：端点距离不超过 max_gap 的笔画首尾相接成一条折线（必要时倒序）
+
+    候选端点对由网格哈希一次性找出，按距离从近到远贪心连接；每个端点
+    至多连接一次，用并查集避免连成环。
+
+    Args:
+        paths: 折线列表，每条是坐标数组 (k, 2)
+        max_gap: 最大桥接距离
+
+    Returns:
+        (merged_paths, chains)：chains[i] 为第 i 条合并折线依次包含的 [(原下标, 是否倒序), ...]
+    """
+    n = len(paths)
+    if n < 2 or max_gap <= 0:
+        return list(paths), [[(i, False)] for i in range(n)]
+
+    # 端点编号：2i 为第 i 条的起点，2i + 1 为终点
+    points = np.empty((2 * n, 2))
+    points[0::2] = [path[0] for path in paths]
+    points[1::2] = [path[-1] for path in paths]
+    i, j, dist = close_point_pairs(points, max_gap)
+    mask = (i // 2) != (j // 2)
+    i, j, dist = i[mask], j[mask], dist[mask]
+    order = np.argsort(dist, kind='stable')
+
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    link = [-1] * (2 * n)
+    for p, q in zip(i[order].tolist(), j[order].tolist()):
+        if link[p] >= 0 or link[q] >= 0:
+            continue
+        a, b = find(p // 2), find(q // 2)
+        if a == b:
+            continue
+        parent[a] = b
+        link[p] = q
+        link[q] = p
+
+    # 从一端空闲的笔画出发沿连接走完整条链
+    used = [False] * n
+    merged = []
+    chains = []
+    for s in range(n):
+        if used[s]:
+            continue
+        if link[2 * s] >= 0 and link[2 * s + 1] >= 0:
+            continue
+        enter = 2 * s if link[2 * s] < 0 else 2 * s + 1
+        chain = []
+        while True:
+            stroke = enter // 2
+            used[stroke] = True
+            chain.append((stroke, enter % 2 == 1))
+            nxt = link[enter ^ 1]
+            if nxt < 0:
+                break
+            enter = nxt
+        pieces = [paths[k][::-1] if rev else paths[k] for k, rev in chain]
+        merged.append(np.concatenate([np.asarray(p) for p in pieces]) if len(pieces) > 1 else pieces[0])
+        chains.append(chain)
+    return merged, chains
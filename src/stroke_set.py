@@ -0,0 +1,223 @@
+import numpy as np
+
+
+class StrokeSet:
+    """
+    笔画集合：所有笔画的点连续存放在一个 (N, 2) 数组中，offsets 记录每条笔画的起止位置
+
+    第 i 条笔画为 points[offsets[i]:offsets[i + 1]]。每条笔画另有宽度、画笔档位两列
+    （可为 None），包围盒、坐标变换、裁剪、宽度采样等操作都对整个点数组向量化完成，
+    不再逐点循环 Python 元组。
+    """
+
+    def __init__(self, points, offsets, widths=None, tiers=None):
+        """
+        Args:
+            points: 点数组 (N, 2)，默认 int32
+            offsets: 起止位置数组 (M + 1,)，offsets[0] == 0，offsets[-1] == N
+            widths: 每条笔画的宽度 (M,)，可为 None
+            tiers: 每条笔画的画笔档位 (M,)，可为 None
+        """
+        self.points = points
+        self.offsets = offsets
+        self.widths = widths
+        self.tiers = tiers
+
+    @classmethod
+    def from_paths(cls, paths, widths=None, tiers=None, dtype=np.int32):
+        """
+        由折线列表构造
+
+        Args:
+            paths: 折线列表，每条是 [(x, y), ...] 或数组 (k, 2)
+            widths, tiers: 每条折线的宽度、画笔档位，可为 None
+            dtype: 点数组类型
+
+        Returns:
+            StrokeSet
+        """
+        lengths = np.fromiter((len(path) for path in paths), dtype=np.int64, count=len(paths))
+        offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        points = np.empty((offsets[-1], 2), dtype=dtype)
+        for path, start, end in zip(paths, offsets[:-1].tolist(), offsets[1:].tolist()):
+            if end > start:
+                points[start:end] = path
+        return cls(points, offsets, _column(widths), _column(tiers))
+
+    @classmethod
+    def concatenate(cls, sets):
+        """
+        按顺序拼接多个 StrokeSet（宽度、档位列都不为 None 时才保留）
+
+        Returns:
+            StrokeSet
+        """
+        sets = list(sets)
+        sizes = np.array([0] + [s.num_points for s in sets[:-1]], dtype=np.int64).cumsum()
+        offsets = np.concatenate([[0]] + [s.offsets[1:] + base for s, base in zip(sets, sizes)]).astype(np.int64)
+        points = (np.concatenate([s.points for s in sets]) if sets
+                  else np.zeros((0, 2), dtype=np.int32))
+        widths = tiers = None
+        if sets and all(s.widths is not None for s in sets):
+            widths = np.concatenate([np.asarray(s.widths) for s in sets])
+        if sets and all(s.tiers is not None for s in sets):
+            tiers = np.concatenate([np.asarray(s.tiers) for s in sets])
+        return cls(points, offsets, widths, tiers)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        """第 i 条笔画（点数组的视图）"""
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        return iter(self.to_paths())
+
+    def to_paths(self):
+        """拆为折线列表，每条是点数组的视图（不复制）"""
+        return np.split(self.points, self.offsets[1:-1])
+
+    @property
+    def lengths(self):
+        """每条笔画的点数"""
+        return np.diff(self.offsets)
+
+    @property
+    def num_points(self):
+        return len(self.points)
+
+    def stroke_index(self):
+        """每个点所属的笔画编号"""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def bounds(self):
+        """所有点的包围盒 (min_x, min_y, max_x, max_y)"""
+        lo = self.points.min(axis=0)
+        hi = self.points.max(axis=0)
+        return lo[0], lo[1], hi[0], hi[1]
+
+    def bboxes(self):
+        """
+        每条笔画的包围盒
+
+        Returns:
+            数组 (M, 4)：min_x, min_y, max_x, max_y（笔画不能为空）
+        """
+        starts = self.offsets[:-1]
+        return np.concatenate([np.minimum.reduceat(self.points, starts, axis=0),
+                               np.maximum.reduceat(self.points, starts, axis=0)], axis=1)
+
+    def stroke_mean(self, values):
+        """按笔画对逐点取值求平均，空笔画为 0"""
+        sums = np.bincount(self.stroke_index(), weights=values, minlength=len(self))
+        return sums / np.maximum(self.lengths, 1)
+
+    def sample(self, sampler):
+        """
+        逐点采样
+
+        Args:
+            sampler: 二维数组（按 [y, x] 取值）或函数 f(xs, ys)
+
+        Returns:
+            与点一一对应的取值数组
+        """
+        xs, ys = self.points[:, 0], self.points[:, 1]
+        if callable(sampler):
+            return np.asarray(sampler(xs, ys))
+        return sampler[ys, xs]
+
+    def sample_widths(self, radius_at):
+        """
+        按逐点半径估算每条笔画的平均宽度（直径取整后求平均，至少为 1），写入 widths 列
+
+        Args:
+            radius_at: 距离变换数组或函数 f(xs, ys)
+
+        Returns:
+            widths 数组 (M,)
+        """
+        diameters = (self.sample(radius_at) * 2).astype(np.int64)
+        self.widths = np.maximum(1, self.stroke_mean(diameters).astype(np.int64))
+        return self.widths
+
+    def select(self, index):
+        """
+        按下标或布尔掩码选取笔画（宽度、档位列随之选取）
+
+        Returns:
+            新的 StrokeSet
+        """
+        index = np.arange(len(self))[index]
+        lengths = self.lengths[index]
+        offsets = np.zeros(len(index) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(self.offsets[index] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return StrokeSet(self.points[gather], offsets,
+                         None if self.widths is None else self.widths[index],
+                         None if self.tiers is None else self.tiers[index])
+
+    def filter_short(self, min_points):
+        """去掉点数少于 min_points 的笔画"""
+        return self.select(self.lengths >= min_points)
+
+    def transform(self, scale, translate, pivot=(0, 0)):
+        """
+        仿射变换 (p - pivot) * scale + translate，得到浮点坐标
+
+        Args:
+            scale: 缩放因子（标量或 (sx, sy)）
+            translate: 平移 (tx, ty)
+            pivot: 缩放中心 (px, py)
+
+        Returns:
+            新的 StrokeSet（float64）
+        """
+        points = (self.points - np.asarray(pivot, dtype=np.float64)) * scale + np.asarray(translate, dtype=np.float64)
+        return StrokeSet(points, self.offsets, self.widths, self.tiers)
+
+    def astype(self, dtype):
+        """转换点类型（浮点转整数时向零取整）"""
+        return StrokeSet(self.points.astype(dtype), self.offsets, self.widths, self.tiers)
+
+    def clamp(self, lower, upper):
+        """把所有点限制在 [lower, upper] 矩形内"""
+        return StrokeSet(np.clip(self.points, lower, upper), self.offsets, self.widths, self.tiers)
+
+    def extend_short(self, threshold=7, target_length=6):
+        """
+        延长过短的笔画，与 PathProcessor.extend_short_path 逐条处理的结果一致
+
+        包围盒长边小于 threshold 且至少有 2 个点的笔画，首尾点沿起点到终点的方向
+        各向外移动 target_length / 2 倍的方向向量（首尾重合时取方向 (1, 1)）。
+
+        Returns:
+            新的 StrokeSet（float64）
+        """
+        points = self.points.astype(np.float64)
+        starts, ends = self.offsets[:-1], self.offsets[1:] - 1
+        lengths = self.lengths
+        nonempty = lengths > 0
+        short = np.zeros(len(self), dtype=bool)
+        if nonempty.any():
+            boxes = (self if nonempty.all() else self.select(nonempty)).bboxes()
+            span = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+            short[nonempty] = span < threshold
+        short &= lengths >= 2
+        if short.any():
+            first, last = starts[short], ends[short]
+            d = points[last] - points[first]
+            norm = np.hypot(d[:, 0], d[:, 1])
+            d[norm == 0] = 1.0
+            norm = np.hypot(d[:, 0], d[:, 1])
+            shift = d * (target_length / norm / 2)[:, None]
+            points[first] -= shift
+            points[last] += shift
+        return StrokeSet(points, self.offsets, self.widths, self.tiers)
+
+
+def _column(values):
+    """把每条笔画一个值的列表转为数组，None 保持 None"""
+    return None if values is None else np.asarray(values)
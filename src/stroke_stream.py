@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+
+# 队列结束标记
+_DONE = object()
+
+
+class StrokeStream:
+    """
+    后台生成、前台消费的笔画批次流
+
+    生产线程依次取出生成器产出的批次放入有界队列，消费方（鼠标注入）逐批取出
+    绘制。队列满时生产线程等待，提取和规划最多领先绘制 max_pending 个批次，
+    内存占用不随图像大小增长；生产线程中的异常在消费方取到该位置时重新抛出。
+    """
+
+    def __init__(self, batches, max_pending=4):
+        """
+        Args:
+            batches: 产出批次的可迭代对象（通常是生成器，在生产线程中迭代）
+            max_pending: 队列中最多等待的批次数
+        """
+        self._batches = batches
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._produce, name='stroke-stream', daemon=True)
+        self._started = False
+        self.finished = False
+        self.wait_time = 0.0
+
+    def start(self):
+        """启动生产线程（可提前调用，让提取在准备绘制期间就开始）"""
+        if not self._started:
+            self._started = True
+            self._thread.start()
+        return self
+
+    def __iter__(self):
+        """依次取出批次，生产结束后停止；wait_time 累计等待生产的时间（秒）"""
+        self.start()
+        while True:
+            start = time.perf_counter()
+            item = self._queue.get()
+            self.wait_time += time.perf_counter() - start
+            if item is _DONE:
+                self.finished = True
+                return
+            if isinstance(item, _Failure):
+                self.finished = True
+                raise item.error
+            yield item
+
+    def close(self):
+        """提前结束：通知生产线程停止并清空队列"""
+        self._cancelled.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._thread.join(timeout=1.0)
+
+    def _put(self, item):
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for batch in self._batches:
+                if not self._put(batch):
+                    return
+        except Exception as e:
+            self._put(_Failure(e))
+            return
+        self._put(_DONE)
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
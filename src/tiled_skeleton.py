@@ -0,0 +1,293 @@
+import math
+import cv2
+import numpy as np
+from .skeleton_backends import skeletonize_with_distance
+from .skeleton_graph import SkeletonGraph, trace_skeleton_tile, merge_degree_two_nodes
+from .stroke_planner import close_point_pairs
+
+# 处理一个分块（含重叠边）时每像素的峰值内存（字节），用 tracemalloc 在线稿图上实测
+TILE_BYTES_PER_PIXEL = 32
+
+# 分块之间的重叠宽度（像素），需大于最粗线条的半宽，接缝两侧的骨架才与整图骨架一致
+TILE_OVERLAP = 32
+
+
+class SparsePixelMap:
+    """只保存骨架像素处取值的稀疏图，代替整幅的距离变换"""
+
+    def __init__(self, keys, values, width):
+        """
+        Args:
+            keys: 像素键 y * width + x
+            values: 对应的取值
+            width: 图像宽度
+        """
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.values = values[order]
+        self.width = width
+
+    def lookup(self, xs, ys):
+        """按坐标取值，不在图中的像素返回 0"""
+        query = np.asarray(ys, dtype=np.int64) * self.width + np.asarray(xs, dtype=np.int64)
+        if len(self.keys) == 0:
+            return np.zeros(len(query), dtype=np.float32)
+        pos = np.minimum(np.searchsorted(self.keys, query), len(self.keys) - 1)
+        return np.where(self.keys[pos] == query, self.values[pos], 0).astype(np.float32)
+
+
+def tile_size_for_budget(memory_limit_mb, overlap=TILE_OVERLAP):
+    """
+    按内存预算（MB）计算分块核心区边长
+
+    预算只约束单个分块（含重叠边）处理时的中间结果；与骨架像素数成正比的输出
+    （骨架图和稀疏宽度图）随图像内容增长，不在预算之内，见 check_memory_budget。
+    """
+    side = int(math.sqrt(memory_limit_mb * 1024 * 1024 / TILE_BYTES_PER_PIXEL))
+    return max(64, side - 2 * overlap)
+
+
+def iter_tiles(height, width, tile_size):
+    """按行优先枚举分块核心区 (y0, y1, x0, x1)"""
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield y0, min(y0 + tile_size, height), x0, min(x0 + tile_size, width)
+
+
+def otsu_threshold(gray, rows=1024):
+    """
+    逐条带累计直方图计算 OTSU 阈值，与 cv2.THRESH_OTSU 对整幅图的结果一致
+
+    Args:
+        gray: 灰度图，可以是 np.memmap
+        rows: 每次读取的行数
+
+    Returns:
+        阈值（整数）
+    """
+    hist = np.zeros(256, dtype=np.float64)
+    for y in range(0, gray.shape[0], rows):
+        stripe = np.ascontiguousarray(gray[y:y + rows])
+        hist += cv2.calcHist([stripe], [0], None, [256], [0, 256]).ravel()
+    levels = np.arange(256)
+    omega = np.cumsum(hist)
+    mu = np.cumsum(hist * levels)
+    total = omega[-1]
+    between = (mu[-1] * omega / total - mu) ** 2
+    denom = omega * (total - omega)
+    between = np.divide(between * total, denom, out=np.zeros(256), where=denom > 0)
+    return int(np.argmax(between))
+
+
+def stitch_seams(seam_xy, seam_nodes, seam_tiles):
+    """
+    连接接缝两侧 8 邻接的骨架像素
+
+    同一分块内相邻的接缝像素先视为已连通，跨分块的候选连接按距离从近到远
+    加入，会形成局部小环的连接跳过（阶梯状跨缝时只保留一条）。
+
+    Args:
+        seam_xy: 接缝像素全局坐标 (M, 2)
+        seam_nodes: 每个接缝像素所属的全局节点编号
+        seam_tiles: 每个接缝像素所属的分块编号
+
+    Returns:
+        (edges, edge_nodes)：新增的两像素连接边及其端点节点
+    """
+    i, j, dist = close_point_pairs(seam_xy, 1.5)
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    same = seam_tiles[i] == seam_tiles[j]
+    for p, q in zip(seam_nodes[i[same]].tolist(), seam_nodes[j[same]].tolist()):
+        parent[find(p)] = find(q)
+
+    cross = np.flatnonzero(~same)
+    cross = cross[np.argsort(dist[cross], kind='stable')]
+    edges = []
+    edge_nodes = []
+    for k in cross.tolist():
+        a, b = int(seam_nodes[i[k]]), int(seam_nodes[j[k]])
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            continue
+        parent[ra] = rb
+        edges.append(np.array([seam_xy[i[k]], seam_xy[j[k]]], dtype=np.int32))
+        edge_nodes.append((a, b))
+    return edges, edge_nodes
+
+
+def extract_skeleton_tiled(gray, preprocess, tile_size=1024, overlap=TILE_OVERLAP, backend=None):
+    """
+    分块提取骨架图，中间结果的内存占用只与分块大小有关
+
+    峰值内存约为单个分块的处理开销（TILE_BYTES_PER_PIXEL × 分块面积）加上
+    与骨架像素数成正比的输出（骨架图和稀疏宽度图）。
+
+    每个分块连同四周 overlap 像素读入，做二值化、骨架化和距离变换后只保留
+    核心区的结果：核心区骨架追踪成图（接缝像素作为节点），骨架像素处的
+    距离变换值存入稀疏图。全部分块处理完后按接缝连接相邻分块的节点，再消去
+    度 2 节点，得到与整图追踪一致的骨架图。
+
+    Args:
+        gray: 灰度图，可以是 np.memmap
+        preprocess: 灰度分块 -> 二值分块（0/255 uint8）的函数
+        tile_size: 分块核心区边长
+        overlap: 分块重叠宽度
+        backend: 骨架化后端名称，None 表示默认
+
+    Returns:
+        (graph, radius)：SkeletonGraph（全局坐标）和骨架像素处距离变换值的 SparsePixelMap
+    """
+    h, w = gray.shape[:2]
+    node_xy, edges, edge_nodes = [], [], []
+    seam_xy, seam_nodes, seam_tiles = [], [], []
+    keys, radii = [], []
+    num_nodes = 0
+    for t, (y0, y1, x0, x1) in enumerate(iter_tiles(h, w, tile_size)):
+        ey0, ey1 = max(0, y0 - overlap), min(h, y1 + overlap)
+        ex0, ex1 = max(0, x0 - overlap), min(w, x1 + overlap)
+        binary = preprocess(np.ascontiguousarray(gray[ey0:ey1, ex0:ex1]))
+        if not binary.any():
+            continue
+        skeleton, dist = skeletonize_with_distance(binary, backend)
+        del binary
+
+        core = (slice(y0 - ey0, y1 - ey0), slice(x0 - ex0, x1 - ex0))
+        core_skeleton = np.ascontiguousarray(skeleton[core])
+        ys, xs = np.nonzero(core_skeleton)
+        keys.append((ys + y0).astype(np.int64) * w + (xs + x0))
+        radii.append(dist[core][ys, xs])
+        del skeleton, dist
+
+        seam = np.zeros(core_skeleton.shape, dtype=bool)
+        seam[0, :] |= y0 > 0
+        seam[-1, :] |= y1 < h
+        seam[:, 0] |= x0 > 0
+        seam[:, -1] |= x1 < w
+        graph, tile_seam_xy, tile_seam_nodes = trace_skeleton_tile(core_skeleton, seam)
+        del core_skeleton, seam
+
+        offset = np.array([x0, y0], dtype=np.int32)
+        node_xy.append(graph.node_xy + offset)
+        edges.extend(edge + offset for edge in graph.edges)
+        edge_nodes.append(graph.edge_nodes + num_nodes)
+        seam_xy.append(tile_seam_xy + offset)
+        seam_nodes.append(tile_seam_nodes + num_nodes)
+        seam_tiles.append(np.full(len(tile_seam_xy), t, dtype=np.int64))
+        num_nodes += graph.num_nodes
+
+    radius = SparsePixelMap(np.concatenate(keys) if keys else np.zeros(0, np.int64),
+                            np.concatenate(radii) if radii else np.zeros(0, np.float32), w)
+    if not node_xy:
+        empty = SkeletonGraph((h, w), np.zeros((0, 2), np.int32), [], np.zeros((0, 2), np.int64))
+        return empty, radius
+
+    link_edges, link_nodes = stitch_seams(np.concatenate(seam_xy), np.concatenate(seam_nodes),
+                                          np.concatenate(seam_tiles))
+    all_edge_nodes = np.concatenate(edge_nodes + [np.array(link_nodes, dtype=np.int64).reshape(-1, 2)])
+    graph = SkeletonGraph((h, w), np.concatenate(node_xy), edges + link_edges, all_edge_nodes)
+    print(f"🧩 分块提取: {t + 1} 个分块（核心 {tile_size}px，重叠 {overlap}px），接缝连接 {len(link_edges)} 处")
+    return merge_degree_two_nodes(graph), radius
+
+
+def synthetic_line_art(path, size=16384, lines=300, circles=150, seed=3, band=1024):
+    """
+    生成 size × size 的合成线稿灰度图（白底黑线的 .npy），按条带写入 memmap，不构造整幅图
+
+    Returns:
+        以 memmap 打开的灰度图
+    """
+    rng = np.random.default_rng(seed)
+    segments = [(rng.integers(0, size, 4), int(rng.integers(2, 12))) for _ in range(lines)]
+    rings = [(rng.integers(0, size, 2), int(rng.integers(50, 1500)), int(rng.integers(2, 10)))
+             for _ in range(circles)]
+    gray = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(size, size))
+    for y in range(0, size, band):
+        stripe = np.full((min(band, size - y), size), 255, np.uint8)
+        for (x0, y0, x1, y1), thickness in segments:
+            cv2.line(stripe, (int(x0), int(y0) - y), (int(x1), int(y1) - y), 0, thickness)
+        for (cx, cy), radius, thickness in rings:
+            cv2.circle(stripe, (int(cx), int(cy) - y), radius, 0, thickness)
+        gray[y:y + len(stripe)] = stripe
+    gray.flush()
+    del gray
+    return np.load(path, mmap_mode='r')
+
+
+def check_memory_budget(gray, budgets_mb, backend=None):
+    """
+    用 tracemalloc 测量不同内存预算下分块提取的内存占用
+
+    分别统计单个分块处理时新增的峰值（受预算约束）、整个提取的峰值，以及与骨架像素数
+    成正比的输出（骨架图和稀疏宽度图）。输出和分块全部处理完后的接缝连接、度 2 节点合并
+    随图像内容增长，不受预算约束。
+
+    Args:
+        gray: 灰度图（可以是 np.memmap，不计入测量）
+        budgets_mb: 要测量的内存预算列表（MB）
+        backend: 骨架化后端名称，None 表示默认
+
+    Returns:
+        {预算: (单个分块的最大峰值字节, 总峰值字节, 输出字节)}
+    """
+    import sys
+    import tracemalloc
+    from .draw_image import binarize_lines
+
+    threshold = otsu_threshold(gray)
+    results = {}
+    for budget in budgets_mb:
+        tile_size = tile_size_for_budget(budget)
+        tile_peaks = []
+        tile_base = []
+
+        def preprocess(tile):
+            # 每个分块开始时结算上一个分块的峰值（相对它开始时已占用的内存）
+            current, peak = tracemalloc.get_traced_memory()
+            if tile_base:
+                tile_peaks.append(peak - tile_base[-1])
+            tracemalloc.reset_peak()
+            tile_base.append(current)
+            return binarize_lines(tile, threshold)[1]
+
+        tracemalloc.start()
+        graph, radius = extract_skeleton_tiled(gray, preprocess, tile_size, backend=backend)
+        total_peak = tracemalloc.get_traced_memory()[1] if not tile_base else max(
+            tracemalloc.get_traced_memory()[1], max(tile_peaks, default=0) + tile_base[-1])
+        tracemalloc.stop()
+        output = (sum(edge.nbytes + sys.getsizeof(edge) for edge in graph.edges) + graph.node_xy.nbytes
+                  + graph.edge_nodes.nbytes + radius.keys.nbytes + radius.values.nbytes)
+        tile_peak = max(tile_peaks, default=0)
+        results[budget] = (tile_peak, total_peak, output)
+        mark = '✅' if tile_peak <= budget * 1024 * 1024 else '⚠️'
+        print(f"{mark} 预算 {budget:g}MB（分块 {tile_size}px）: 单个分块峰值 {tile_peak / 2 ** 20:.1f}MB，"
+              f"总峰值 {total_peak / 2 ** 20:.0f}MB，其中输出 {output / 2 ** 20:.0f}MB"
+              f"（{len(radius.keys)} 个骨架像素，不受预算约束）")
+        del graph, radius
+    return results
+
+
+if __name__ == "__main__":
+    import os
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description='用合成的超大线稿检查分块提取的峰值内存是否受预算约束')
+    parser.add_argument('--size', type=int, default=16384, help='合成图像边长（像素）')
+    parser.add_argument('--budgets', type=float, nargs='+', default=[16, 64, 256], help='内存预算列表（MB）')
+    parser.add_argument('--image', help='使用已有的 .npy 灰度图，不生成合成图像')
+    args = parser.parse_args()
+    if args.image:
+        check_memory_budget(np.load(args.image, mmap_mode='r'), args.budgets)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            print(f"🖼️ 生成 {args.size}x{args.size} 合成线稿...")
+            gray = synthetic_line_art(os.path.join(directory, 'line_art.npy'), args.size)
+            check_memory_budget(gray, args.budgets)
+            del gray
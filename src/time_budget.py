@@ -0,0 +1,219 @@
+import numpy as np
+from .stroke_set import StrokeSet
+from .plan_format import StrokePlan
+from .polyline import simplify_concatenated
+from .stroke_order import order_strokes_grouped, apply_order
+from .injection_scheduler import TimelineBuilder, default_pacing
+from .verification import sample_strokes
+
+
+class StrokeCostModel:
+    """
+    绘制时间的代价模型：每个事件的耗时为其后的名义间隔（Pacing）加上固定的调用开销
+
+    每条笔画的代价为 移到起点后的等待 + 落笔等待 + 笔画内各段移动间隔 + 抬笔后的等待，
+    再加上事件数 × event_overhead；切换画笔的等待与笔画顺序有关，整份计划的预计时间
+    由 TimelineBuilder 生成的时间线精确求和。
+    """
+
+    def __init__(self, pacing=None, slider_positions=None, event_overhead=0.0, startup_time=1.1):
+        """
+        Args:
+            pacing: Pacing，None 表示默认节奏
+            slider_positions: 画笔滑块 5 个档位的屏幕坐标，None 表示不切换画笔
+            event_overhead: 每个事件在名义间隔之外的耗时（秒），如输入后端调用本身的开销
+            startup_time: 绘制开始前的固定等待（秒），与 execute_stream 开始时的等待一致
+        """
+        self.pacing = pacing or default_pacing()
+        self.slider_positions = slider_positions
+        self.event_overhead = event_overhead
+        self.startup_time = startup_time
+
+    def stroke_costs(self, plan):
+        """
+        Returns:
+            每条笔画的预计耗时（秒），不含切换画笔（向量化）
+        """
+        strokes = plan.strokes
+        pacing = self.pacing
+        lengths = strokes.lengths
+        costs = np.zeros(len(strokes))
+        nonempty = lengths > 0
+        if not nonempty.any():
+            return costs
+        drawn = strokes if nonempty.all() else strokes.select(nonempty)
+        if pacing.velocity is not None:
+            intervals = pacing.velocity.intervals(drawn)
+            # 第 2 个点起的移动事件使用该点到下一个点的间隔（与 TimelineBuilder 一致）
+            intervals[drawn.offsets[:-1]] = 0.0
+            moves = np.add.reduceat(intervals, drawn.offsets[:-1])
+        else:
+            moves = (drawn.lengths - 1) * pacing.move_interval
+        widths = np.asarray(drawn.widths) if drawn.widths is not None else np.ones(len(drawn))
+        events = drawn.lengths + 3
+        costs[nonempty] = (pacing.travel_settle + pacing.down_settle + moves + pacing.stroke_gap(widths)
+                           + events * self.event_overhead)
+        return costs
+
+    def predict(self, plan):
+        """按计划实际生成的时间线（含切换画笔）预计绘制时间（秒）"""
+        builder = TimelineBuilder(self.slider_positions, self.pacing)
+        total = self.startup_time
+        for timeline in builder.build(plan):
+            total += timeline.duration + len(timeline) * self.event_overhead
+        return total
+
+
+def stroke_importance(plan, cell=2.0):
+    """
+    每条笔画的视觉重要性：长度 × 宽度 × 覆盖率
+
+    覆盖率为笔画经过的画布格子（边长 cell 像素）中只属于它的份额：一个格子被 k 条笔画
+    经过时每条各占 1/k。与其他笔画大量重叠的笔画去掉后画面变化小，重要性随之降低。
+
+    Returns:
+        每条笔画的重要性 (M,)，空笔画为 0
+    """
+    strokes = plan.strokes
+    importance = np.zeros(len(strokes))
+    nonempty = strokes.lengths > 0
+    if not nonempty.any():
+        return importance
+    drawn = strokes if nonempty.all() else strokes.select(nonempty)
+    samples, offsets = sample_strokes(drawn, step=cell / 2)
+    owner = np.repeat(np.arange(len(drawn)), np.diff(offsets))
+    grid = np.floor((samples - samples.min(axis=0)) / cell).astype(np.int64)
+    key = grid[:, 0] * (int(grid[:, 1].max()) + 1) + grid[:, 1]
+    # 每条笔画经过的格子（去掉同一笔画的重复取样），以及每个格子被几条笔画经过
+    pairs = np.unique(np.stack([owner, key], axis=1), axis=0)
+    _, inverse, sharing = np.unique(pairs[:, 1], return_inverse=True, return_counts=True)
+    share = np.bincount(pairs[:, 0], weights=1.0 / sharing[inverse.ravel()], minlength=len(drawn))
+    cells = np.bincount(pairs[:, 0], minlength=len(drawn))
+    coverage = share / np.maximum(cells, 1)
+
+    points = drawn.points.astype(np.float64)
+    step = np.hypot(*np.diff(points, axis=0).T)
+    step[drawn.offsets[1:-1] - 1] = 0.0
+    length = np.add.reduceat(np.append(step, 0.0), drawn.offsets[:-1])
+    widths = np.asarray(drawn.widths, dtype=np.float64) if drawn.widths is not None else np.ones(len(drawn))
+    importance[nonempty] = np.maximum(length, 1.0) * widths * coverage
+    return importance
+
+
+def select_within_budget(importance, costs, budget):
+    """
+    0-1 背包的贪心近似：按 重要性 / 代价 从高到低选取，放不下的跳过，继续尝试后面较小的笔画
+
+    Returns:
+        被选中笔画的布尔掩码
+    """
+    selected = np.zeros(len(costs), dtype=bool)
+    remaining = budget
+    ratio = importance / np.maximum(costs, 1e-9)
+    for i in np.argsort(-ratio, kind='stable').tolist():
+        if costs[i] <= remaining:
+            selected[i] = True
+            remaining -= costs[i]
+    return selected
+
+
+def _simplified(plan, tolerance):
+    strokes = plan.strokes
+    if tolerance is None or not len(strokes):
+        return plan
+    points, starts = simplify_concatenated(strokes.points, strokes.offsets[:-1], tolerance)
+    simplified = StrokeSet(points.astype(np.int32), np.append(starts, len(points)).astype(np.int64),
+                           strokes.widths, strokes.tiers)
+    return StrokePlan(simplified, plan.canvas_top_left, plan.canvas_size, plan.scale_factor, plan.tier_bounds)
+
+
+def _reordered(plan, start_point=None, time_limit=0.2):
+    """按画笔档位分组，组内重新排序以缩短抬笔移动（去掉部分笔画后原来的顺序不再紧凑）"""
+    strokes = plan.strokes
+    if len(strokes) < 2:
+        return plan
+    widths = np.asarray(strokes.widths) if strokes.widths is not None else np.ones(len(strokes), dtype=np.int64)
+    tiers = (np.searchsorted(plan.tier_bounds, widths, side='left') + 1).tolist()
+    order, reverse = order_strokes_grouped(strokes.to_paths(), tiers, start_point, time_limit=time_limit)
+    paths, ordered_widths, ordered_tiers = apply_order(strokes.to_paths(), order, reverse, widths.tolist(),
+                                                       tiers)
+    ordered = StrokeSet.from_paths(paths, ordered_widths, ordered_tiers)
+    return StrokePlan(ordered, plan.canvas_top_left, plan.canvas_size, plan.scale_factor, plan.tier_bounds)
+
+
+def fit_plan_to_budget(plan, budget, cost_model=None, tolerances=(None, 1.5, 2.5), min_importance=0.95,
+                       order_time_limit=0.2):
+    """
+    把计划裁剪到时间限制内
+
+    按重要性 / 代价贪心选取笔画（背包），切换画笔的等待按用到的档位数预留；保留的重要性
+    不足 min_importance 时改用更大的简化容差（减少移动事件）重新选取，都达不到时取保留
+    重要性最多的一组。去掉部分笔画后按档位分组重新排序，缩短抬笔移动；按时间线的预计
+    时间仍超出时重新选取，最后按 重要性 / 代价 从低到高去掉笔画。
+
+    Args:
+        plan: 屏幕坐标的 StrokePlan
+        budget: 绘制时间限制（秒，含开始前的等待）
+        cost_model: StrokeCostModel，None 表示默认节奏
+        tolerances: 依次尝试的简化容差（屏幕像素），None 表示保持计划原样
+        min_importance: 保留的重要性比例达到该值时不再尝试更大的简化容差
+        order_time_limit: 重新排序的时间限制（秒）
+
+    Returns:
+        (fitted_plan, summary)：summary 含预计时间 predicted、完整计划的预计时间 full_time、
+        保留的笔画比例 kept、保留的重要性比例 importance、使用的简化容差 tolerance
+    """
+    model = cost_model or StrokeCostModel()
+    full_time = model.predict(plan)
+    summary = {'full_time': full_time, 'kept': 1.0, 'importance': 1.0, 'tolerance': None}
+    if full_time <= budget or not len(plan):
+        summary['predicted'] = full_time
+        return plan, summary
+
+    importance = stroke_importance(plan)
+    total_importance = max(float(importance.sum()), 1e-9)
+    widths = np.asarray(plan.strokes.widths) if plan.strokes.widths is not None else np.ones(len(plan))
+    tiers_used = len(np.unique(np.searchsorted(plan.tier_bounds, widths, side='left')))
+    reserve = model.startup_time + (model.pacing.brush_settle * tiers_used if model.slider_positions else 0.0)
+    # 依次尝试简化容差，记下保留重要性最多的一组（达到 min_importance 即停止）
+    best = None
+    for tolerance in tolerances:
+        candidate = _simplified(plan, tolerance)
+        costs = model.stroke_costs(candidate)
+        selected = select_within_budget(importance, costs, max(0.0, budget - reserve))
+        kept = importance[selected].sum() / total_importance
+        if best is None or kept > best[0]:
+            best = (kept, tolerance, candidate, costs, selected)
+        if kept >= min_importance:
+            break
+    _, tolerance, candidate, costs, selected = best
+
+    def build(selected):
+        fitted = StrokePlan(candidate.strokes.select(selected), plan.canvas_top_left, plan.canvas_size,
+                            plan.scale_factor, plan.tier_bounds)
+        if len(fitted) < len(plan):
+            fitted = _reordered(fitted, time_limit=order_time_limit)
+        return fitted, model.predict(fitted)
+
+    # 切换画笔的次数取决于最终顺序，按时间线求得的预计时间仍超出时扣除超出部分重新选取
+    fitted, predicted = build(selected)
+    limit = budget - reserve
+    for _ in range(3):
+        if predicted <= budget:
+            break
+        limit -= predicted - budget
+        selected = select_within_budget(importance, costs, max(0.0, limit))
+        fitted, predicted = build(selected)
+    # 仍超出时按 重要性 / 代价 从低到高去掉笔画，直到去掉的代价抵消超出部分
+    while predicted > budget and selected.any():
+        chosen = np.nonzero(selected)[0]
+        drop = chosen[np.argsort(importance[chosen] / np.maximum(costs[chosen], 1e-9), kind='stable')]
+        count = int(np.searchsorted(np.cumsum(costs[drop]), predicted - budget)) + 1
+        selected = selected.copy()
+        selected[drop[:count]] = False
+        fitted, predicted = build(selected)
+    if predicted > budget:
+        print(f"⚠️ 即使不画任何笔画，预计时间 {predicted:.1f}s 仍超出时间限制 {budget:.1f}s")
+    summary.update(predicted=predicted, kept=int(selected.sum()) / len(plan),
+                   importance=float(importance[selected].sum() / total_importance), tolerance=tolerance)
+    return fitted, summary
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+class VelocityProfile:
+    """
+    落笔移动的速度规划：按局部曲率和线段长度给每段移动分配时长
+
+    每个顶点的限速由转角处的曲率决定（向心加速度 v²κ 不超过 max_accel），笔画两端
+    （起笔、收笔处多为交叉点）限速为 junction_speed；再按 max_accel 做前向、后向两遍
+    加减速限制，得到每个顶点的速度。线段时长为 长度 / 两端平均速度，限制在
+    [min_interval, max_interval] 之间：直线段以最短间隔快速通过，转角处放慢，
+    目标程序来得及采样到拐点，不会把转角抹平。
+    """
+
+    def __init__(self, max_speed=6000.0, junction_speed=600.0, max_accel=50000.0, min_interval=0.0003,
+                 max_interval=0.002):
+        """
+        Args:
+            max_speed: 直线段最高速度（像素/秒）
+            junction_speed: 笔画两端的速度（像素/秒）
+            max_accel: 最大加速度（像素/秒²），同时限制转角处的向心加速度和沿线的加减速
+            min_interval: 相邻移动事件的最短间隔（秒）
+            max_interval: 相邻移动事件的最长间隔（秒）
+        """
+        self.max_speed = float(max_speed)
+        self.junction_speed = float(junction_speed)
+        self.max_accel = float(max_accel)
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+
+    def vertex_speeds(self, strokes):
+        """
+        Args:
+            strokes: StrokeSet（笔画不能为空）
+
+        Returns:
+            每个点的速度（像素/秒），与 strokes.points 一一对应
+        """
+        points = strokes.points.astype(np.float64)
+        starts, ends = strokes.offsets[:-1], strokes.offsets[1:] - 1
+        n = len(points)
+        # length[i]: 点 i 到点 i+1 的长度（笔画最后一个点之后的位置无意义，置 0）
+        step = np.zeros((n, 2))
+        step[:-1] = points[1:] - points[:-1]
+        step[ends] = 0.0
+        length = np.hypot(step[:, 0], step[:, 1])
+
+        # 顶点转角和曲率：κ = 转角 / 相邻两段的平均长度
+        prev_step = np.zeros_like(step)
+        prev_step[1:] = step[:-1]
+        prev_length = np.zeros(n)
+        prev_length[1:] = length[:-1]
+        cross = prev_step[:, 0] * step[:, 1] - prev_step[:, 1] * step[:, 0]
+        dot = (prev_step * step).sum(axis=1)
+        turn = np.arctan2(np.abs(cross), dot)
+        span = 0.5 * (prev_length + length)
+        curvature = np.divide(turn, span, out=np.zeros(n), where=span > 0)
+        limit = np.full(n, self.max_speed)
+        bent = curvature > 0
+        limit[bent] = np.minimum(self.max_speed, np.sqrt(self.max_accel / curvature[bent]))
+        limit = np.maximum(limit, min(self.junction_speed, self.max_speed))
+        limit[starts] = self.junction_speed
+        limit[ends] = self.junction_speed
+
+        # 加减速限制（对速度平方）：u[i] <= u[i-1] + 2a·length[i-1]，前向、后向各做一遍
+        squared = limit ** 2
+        gain = 2.0 * self.max_accel * length
+        squared = _limited_ramp(squared, gain, starts, ends)
+        squared = _limited_ramp(squared[::-1], np.concatenate([[0.0], gain[:-1]])[::-1],
+                                (n - 1 - ends)[::-1], (n - 1 - starts)[::-1])[::-1]
+        return np.sqrt(squared)
+
+    def intervals(self, strokes):
+        """
+        Args:
+            strokes: StrokeSet（笔画不能为空）
+
+        Returns:
+            每个点到同一笔画下一个点的移动时长（秒），笔画最后一个点为 min_interval
+        """
+        points = strokes.points.astype(np.float64)
+        speeds = self.vertex_speeds(strokes)
+        result = np.full(len(points), self.min_interval)
+        if len(points) < 2:
+            return result
+        length = np.hypot(*(points[1:] - points[:-1]).T)
+        mean_speed = 0.5 * (speeds[1:] + speeds[:-1])
+        duration = np.divide(length, mean_speed, out=np.zeros(len(length)), where=mean_speed > 0)
+        result[:-1] = np.clip(duration, self.min_interval, self.max_interval)
+        result[strokes.offsets[1:] - 1] = self.min_interval
+        return result
+
+
+def _limited_ramp(squared, gain, starts, ends):
+    """
+    分段前向限速：u[i] = min(u[i], u[i-1] + gain[i-1])，每段（starts[k]..ends[k]）独立
+
+    令 S 为 gain 的段内前缀和，则 u[i] - S[i] 为段内 (limit - S) 的前缀最小值；
+    各段整体平移到前一段之下后一次 np.minimum.accumulate 完成全部分段。
+    """
+    n = len(squared)
+    if n == 0:
+        return squared
+    gain = gain.copy()
+    gain[ends] = 0.0
+    prefix = np.zeros(n)
+    np.cumsum(gain[:-1], out=prefix[1:])
+    prefix -= np.repeat(prefix[starts], ends - starts + 1)
+    shifted = squared - prefix
+    span = shifted.max() - shifted.min() + 1.0
+    level = np.repeat(np.arange(len(starts)) * span, ends - starts + 1)
+    return np.minimum.accumulate(shifted - level) + level + prefix
@@ -0,0 +1,168 @@
+import cv2
+import numpy as np
+from .stroke_set import StrokeSet
+from .plan_format import StrokePlan
+from .polyline import simplify_concatenated
+from .calibration import pyautogui_screenshot, INK_THRESHOLD
+
+# 目标程序画布的底色 #EEEEEE（与 window_detection.detect_gray_area_by_color 一致）
+CANVAS_BACKGROUND = 238
+
+
+def sample_strokes(strokes, step=2.0):
+    """
+    沿每条笔画按约 step 像素的间距取样（整体向量化）
+
+    Args:
+        strokes: StrokeSet（笔画不能为空）
+        step: 取样间距（像素）
+
+    Returns:
+        (samples, offsets)：取样点 (K, 2) 浮点数组，按笔画和笔画内顺序排列；
+        offsets 为每条笔画在 samples 中的起止位置 (M + 1,)
+    """
+    points = strokes.points.astype(np.float64)
+    ends = strokes.offsets[1:] - 1
+    # 每个点取样它到下一个点之间的线段，笔画最后一个点只取它自身
+    direction = np.zeros_like(points)
+    direction[:-1] = points[1:] - points[:-1]
+    direction[ends] = 0.0
+    counts = np.maximum(1, np.ceil(np.hypot(direction[:, 0], direction[:, 1]) / step)).astype(np.int64)
+    owner = np.repeat(np.arange(len(points)), counts)
+    first = np.cumsum(counts) - counts
+    fraction = (np.arange(counts.sum()) - first[owner]) / counts[owner]
+    samples = points[owner] + direction[owner] * fraction[:, None]
+    offsets = np.zeros(len(strokes) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)[ends]
+    return samples, offsets
+
+
+class PlanVerifier:
+    """
+    截图检查绘制结果，只为缺失的部分生成补画计划
+
+    截取画布区域，与计划笔画的中心线逐点比较：取样点附近 tolerance 像素内没有新笔迹
+    即为缺失。缺失的连续片段（两端各多取 pad 个取样点，与已画出的部分衔接）组成补画
+    计划，宽度和画笔档位沿用原笔画。比较前后都是整个数组运算，不逐笔画截图。
+    """
+
+    def __init__(self, canvas_top_left, canvas_size, screenshot=None, every=None, tolerance=2, step=2.0, pad=2,
+                 max_rounds=2, settle=0.3, simplify_tolerance=0.75):
+        """
+        Args:
+            canvas_top_left: 画布左上角屏幕坐标
+            canvas_size: 画布尺寸 (width, height)
+            screenshot: 截图函数 f((left, top, width, height)) -> RGB 数组，None 表示 pyautogui
+            every: 每绘制多少条笔画检查一次，None 表示只在全部绘制完成后检查
+            tolerance: 取样点与笔迹的容许距离（像素）
+            step: 中心线取样间距（像素）
+            pad: 补画片段两端额外包含的取样点数
+            max_rounds: 每次检查后最多补画几轮（每轮补画后再截图检查）
+            settle: 截图前等待目标程序刷新画面的时间（秒）
+            simplify_tolerance: 补画片段的折线简化容差（像素）
+        """
+        self.canvas_top_left = tuple(int(v) for v in canvas_top_left)
+        self.canvas_size = tuple(int(v) for v in canvas_size)
+        self.screenshot = screenshot or pyautogui_screenshot
+        self.every = every
+        self.tolerance = tolerance
+        self.step = step
+        self.pad = pad
+        self.max_rounds = max_rounds
+        self.settle = settle
+        self.simplify_tolerance = simplify_tolerance
+        self.baseline = None
+
+    def _grab(self):
+        image = np.asarray(self.screenshot((*self.canvas_top_left, *self.canvas_size)))
+        if image.ndim == 3:
+            image = image[..., :3].mean(axis=2)
+        return image.astype(np.int16)
+
+    def capture_baseline(self):
+        """绘制前截图，之后只把新出现的笔迹算作已绘制（没有基准时与画布底色比较）"""
+        self.baseline = self._grab()
+        return self.baseline
+
+    def capture(self):
+        """
+        Returns:
+            画布区域的笔迹掩码（已按 tolerance 膨胀），与画布同尺寸
+        """
+        background = self.baseline if self.baseline is not None else CANVAS_BACKGROUND
+        ink = (np.abs(self._grab() - background) > INK_THRESHOLD).astype(np.uint8)
+        if self.tolerance > 0:
+            size = 2 * self.tolerance + 1
+            ink = cv2.dilate(ink, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size)))
+        return ink.astype(bool)
+
+    def coverage(self, plan, ink=None):
+        """
+        Args:
+            plan: 屏幕坐标的 StrokePlan
+            ink: capture() 的结果，None 表示现在截图
+
+        Returns:
+            (samples, offsets, covered)：中心线取样点、每条笔画的取样范围、每个取样点是否已画出
+        """
+        if ink is None:
+            ink = self.capture()
+        strokes = plan.strokes
+        if (strokes.lengths == 0).any():
+            strokes = strokes.filter_short(1)
+        samples, offsets = sample_strokes(strokes, self.step)
+        local = np.rint(samples - self.canvas_top_left).astype(np.int64)
+        height, width = ink.shape
+        inside = (local[:, 0] >= 0) & (local[:, 0] < width) & (local[:, 1] >= 0) & (local[:, 1] < height)
+        # 画布外的取样点无法检查，视为已画出
+        covered = np.ones(len(samples), dtype=bool)
+        covered[inside] = ink[local[inside, 1], local[inside, 0]]
+        return samples, offsets, covered
+
+    def repair_plan(self, plan, ink=None):
+        """
+        Returns:
+            (repair, missing_ratio)：只包含缺失片段的 StrokePlan，以及缺失取样点的比例
+        """
+        strokes = plan.strokes
+        if (strokes.lengths == 0).any():
+            strokes = strokes.filter_short(1)
+        samples, offsets, covered = self.coverage(StrokePlan(strokes, plan.canvas_top_left, plan.canvas_size), ink)
+        missing = ~covered
+        ratio = float(missing.mean()) if len(missing) else 0.0
+        empty = StrokePlan(StrokeSet(np.zeros((0, 2), dtype=np.int32), np.zeros(1, dtype=np.int64),
+                                     np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)),
+                           plan.canvas_top_left, plan.canvas_size, plan.scale_factor, plan.tier_bounds)
+        if not missing.any():
+            return empty, ratio
+
+        # 缺失片段：连续的缺失取样点，不跨笔画
+        owner = np.repeat(np.arange(len(strokes)), np.diff(offsets))
+        is_first = np.zeros(len(samples), dtype=bool)
+        is_first[offsets[:-1]] = True
+        starts = np.nonzero(missing & (is_first | ~np.roll(missing, 1)))[0]
+        is_last = np.roll(is_first, -1)
+        is_last[-1] = True
+        stops = np.nonzero(missing & (is_last | ~np.roll(missing, -1)))[0] + 1
+        run_owner = owner[starts]
+        starts = np.maximum(starts - self.pad, offsets[run_owner])
+        stops = np.minimum(stops + self.pad, offsets[run_owner + 1])
+
+        # 同一笔画中加长后重叠的片段合并
+        new_run = np.ones(len(starts), dtype=bool)
+        new_run[1:] = (run_owner[1:] != run_owner[:-1]) | (starts[1:] > stops[:-1])
+        run_starts = starts[new_run]
+        run_stops = np.maximum.reduceat(stops, np.nonzero(new_run)[0])
+        run_owner = run_owner[new_run]
+
+        lengths = run_stops - run_starts
+        gather = np.repeat(run_starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths) + np.arange(lengths.sum())
+        points = np.rint(samples[gather]).astype(np.int32)
+        run_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        points, new_starts = simplify_concatenated(points, run_offsets[:-1], self.simplify_tolerance)
+        run_offsets = np.concatenate([new_starts, [len(points)]]).astype(np.int64)
+        widths = None if strokes.widths is None else np.asarray(strokes.widths)[run_owner]
+        tiers = None if strokes.tiers is None else np.asarray(strokes.tiers)[run_owner]
+        repair = StrokePlan(StrokeSet(points, run_offsets, widths, tiers), plan.canvas_top_left, plan.canvas_size,
+                            plan.scale_factor, plan.tier_bounds)
+        return repair, ratio
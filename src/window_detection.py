@@ -1,5 +1,11 @@
-import pygetwindow as gw
-import pyautogui
+try:
+    import pygetwindow as gw
+except Exception:  # pygetwindow 不支持 Linux，此时无法自动查找窗口
+    gw = None
+try:
+    import pyautogui
+except Exception:  # 无显示环境下不可用，截图需由调用方提供（如模拟画布）
+    pyautogui = None
 import time
 import os
 import sys
@@ -38,6 +44,9 @@ def get_target_window():
     Returns:
         pygetwindow.Window: 找到的目标窗口对象，如果未找到则返回None
     """
+    if gw is None:
+        print("⚠️ pygetwindow 不可用（不支持当前系统），无法查找目标窗口")
+        return None
     for title in ['定制喜贴', '喜茶GO']:
         windows = gw.getWindowsWithTitle(title)
         if windows:
@@ -71,19 +80,22 @@ def resize_and_position_window(win):
     return win
 
 
-def detect_gray_area_by_color(win):
+def detect_gray_area_by_color(win, screenshot=None):
     """
     通过颜色识别检测灰色区域
     
     Args:
-        win (pygetwindow.Window): 窗口对象
+        win (pygetwindow.Window): 窗口对象（或具有 left / top / width / height 的对象）
+        screenshot: 截图函数 screenshot(region=(left, top, width, height))，返回 RGB 图像，
+                    None 表示 pyautogui.screenshot；无显示环境下可传入模拟画布的 screenshot
         
     Returns:
         tuple: (left, top, width, height) 或 None
     """
     try:
         # 先截取整个窗口
-        window_screenshot = pyautogui.screenshot(region=(int(win.left), int(win.top), int(win.width), int(win.height)))
+        screenshot = screenshot or pyautogui.screenshot
+        window_screenshot = screenshot(region=(int(win.left), int(win.top), int(win.width), int(win.height)))
         
         # 将PIL图像转换为OpenCV格式
         img = cv2.cvtColor(np.array(window_screenshot), cv2.COLOR_RGB2BGR)